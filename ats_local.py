@@ -0,0 +1,348 @@
+"""
+Couverture ATS locale et déterministe des mots-clés d'une offre
+
+Les mots-clés sont extraits de l'offre (vocabulaire de compétences connu et
+termes techniques repérés par leur forme), puis recherchés dans le CV avec
+un automate d'Aho-Corasick sur le texte normalisé (sans accents ni
+majuscules), sous leurs formes strictement équivalentes du lexique (voir
+lexiques.py : AWS ne couvre pas Azure, ni Pandas Python ; "le reste" ne
+couvre pas REST). Présence, occurrences et taux de couverture sont calculés en
+quelques millisecondes, au format de claude_service.parse_ats_markdown :
+le modèle n'est plus sollicité que pour les recommandations.
+"""
+
+import re
+import unicodedata
+from collections import Counter, deque
+from typing import Dict, Any, List, Iterable, Callable
+
+# Compétences et outils recherchés dans toute offre (formes normalisables)
+VOCABULAIRE_ATS = [
+    # Développement
+    "Python", "Java", "JavaScript", "TypeScript", "PHP", "C++", "C#", ".NET", "Go", "Rust", "Kotlin", "Swift",
+    "React", "Angular", "Vue.js", "Node.js", "Django", "Flask", "Spring", "HTML", "CSS", "API REST", "GraphQL",
+    "SQL", "NoSQL", "PostgreSQL", "MySQL", "MongoDB", "Redis", "Git", "Linux", "Docker", "Kubernetes",
+    "CI/CD", "DevOps", "AWS", "Azure", "GCP", "Terraform", "Microservices", "Tests unitaires",
+    # Data
+    "Machine Learning", "Deep Learning", "Data Science", "Pandas", "NumPy", "Spark", "Hadoop", "Airflow",
+    "Power BI", "Tableau", "Excel", "Statistiques", "Big Data", "ETL", "TensorFlow", "PyTorch", "NLP",
+    # Marketing, vente, gestion
+    "SEO", "SEA", "Google Analytics", "Marketing digital", "Réseaux sociaux", "Content marketing", "CRM",
+    "Salesforce", "HubSpot", "Growth hacking", "Prospection", "Négociation", "Business development",
+    "Gestion de projet", "Management", "Budget", "Reporting", "SAP", "Comptabilité", "Contrôle de gestion",
+    "Figma", "Photoshop", "UX", "UI",
+    # Méthodes et savoir-être
+    "Agile", "Scrum", "Kanban", "Jira", "Communication", "Autonomie", "Rigueur", "Travail en équipe",
+    "Leadership", "Anglais", "Espagnol", "Allemand",
+]
+
+# Mots capitalisés qui ne sont pas des compétences (forme normalisée)
+MOTS_IGNORES = {
+    "nous", "vous", "notre", "votre", "nos", "vos", "le", "la", "les", "un", "une", "des", "de", "du", "et",
+    "en", "au", "aux", "pour", "par", "sur", "avec", "dans", "vos", "cdi", "cdd", "stage", "alternance",
+    "h f", "f h", "h", "f", "poste", "profil", "missions", "mission", "description", "entreprise", "paris",
+    "lyon", "france", "remote", "teletravail", "salaire", "avantages", "rejoignez", "qui", "quoi", "the",
+    "and", "we", "you", "our", "your", "rtt", "tickets", "mutuelle", "janvier", "fevrier", "mars", "avril",
+    "mai", "juin", "juillet", "aout", "septembre", "octobre", "novembre", "decembre",
+}
+
+# Marqueurs de priorité sur la ligne de l'offre où apparaît le mot-clé
+MARQUEURS_HAUTE_RE = re.compile(
+    r"requis|indispensable|obligatoire|maitrise|exige|imperati|necessaire|solide|must|required", re.IGNORECASE
+)
+MARQUEURS_BASSE_RE = re.compile(
+    r"apprecie|souhaite|un plus|bonus|ideal|atout|serait|nice to have", re.IGNORECASE
+)
+
+# Terme technique repéré par sa forme : mot capitalisé (accents compris),
+# acronyme, ou caractères +#./ (C++, Node.js, CI/CD)
+TERME_TECHNIQUE_RE = re.compile(r"(?<![\w.+#/])([A-ZÀ-ÖØ-Þ]\w*(?:[+#]+|(?:[./]\w+)+)?)(?![\w+#])")
+
+MAX_MOTS_CLES = 25
+
+
+def normaliser_texte(texte: str) -> str:
+    """
+    Normalise un texte pour la recherche de mots-clés
+
+    Minuscules, accents retirés, ponctuation remplacée par des espaces ;
+    seuls +, # et le point interne aux termes (C++, C#, Node.js, .NET) sont conservés.
+
+    Args:
+        texte: Texte brut (CV, offre ou mot-clé)
+
+    Returns:
+        str: Mots normalisés séparés par un espace
+    """
+    texte = unicodedata.normalize("NFKD", texte)
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).lower()
+    texte = re.sub(r"[^a-z0-9+#.]+", " ", texte)
+    texte = re.sub(r"\.(?![a-z0-9])", " ", texte)
+    return " ".join(texte.split())
+
+
+class AutomateAhoCorasick:
+    """
+    Recherche simultanée d'un ensemble de motifs en un seul passage sur le texte
+
+    Les motifs et le texte sont normalisés (voir normaliser_texte) et bordés
+    d'espaces : seuls des mots entiers sont reconnus. Les occurrences ne se
+    chevauchent pas : de gauche à droite, la forme la plus longue l'emporte
+    ("anglais courant" est compté une fois, pas aussi comme "anglais").
+    """
+
+    def __init__(self, motifs: Dict[str, str], normaliser: Callable[[str], str] = None):
+        """
+        Args:
+            motifs: Forme recherchée -> étiquette comptée quand elle est trouvée
+                (plusieurs formes peuvent partager une étiquette)
+            normaliser: Normalisation appliquée aux motifs et aux textes
+                (défaut : normaliser_texte ; voir aussi lexiques.normaliser_lexique)
+        """
+        self._normaliser = normaliser or normaliser_texte
+        self._transitions = [{}]
+        self._sorties = [[]]
+        for forme, etiquette in motifs.items():
+            forme = self._normaliser(forme)
+            if forme:
+                self._ajouter(f" {forme} ", etiquette)
+        self._echecs = self._lier_echecs()
+
+    def _ajouter(self, motif: str, etiquette: str):
+        etat = 0
+        for caractere in motif:
+            suivant = self._transitions[etat].get(caractere)
+            if suivant is None:
+                suivant = len(self._transitions)
+                self._transitions[etat][caractere] = suivant
+                self._transitions.append({})
+                self._sorties.append([])
+            etat = suivant
+        # Sortie : (étiquette, longueur du motif bordé d'espaces)
+        if (etiquette, len(motif)) not in self._sorties[etat]:
+            self._sorties[etat].append((etiquette, len(motif)))
+
+    def _lier_echecs(self) -> List[int]:
+        # Parcours en largeur : le repli d'un état est le plus long suffixe
+        # de son chemin qui soit aussi un préfixe de motif
+        echecs = [0] * len(self._transitions)
+        file = deque(self._transitions[0].values())
+        while file:
+            etat = file.popleft()
+            for caractere, suivant in self._transitions[etat].items():
+                file.append(suivant)
+                repli = echecs[etat]
+                while repli and caractere not in self._transitions[repli]:
+                    repli = echecs[repli]
+                echecs[suivant] = self._transitions[repli].get(caractere, 0)
+                # Les motifs reconnus par le repli le sont aussi par cet état
+                self._sorties[suivant] = self._sorties[suivant] + [
+                    sortie for sortie in self._sorties[echecs[suivant]] if sortie not in self._sorties[suivant]
+                ]
+        return echecs
+
+    def rechercher(self, texte: str, deja_normalise: bool = False) -> Counter:
+        """
+        Compte les occurrences de chaque étiquette dans le texte
+
+        Args:
+            texte: Texte à parcourir
+            deja_normalise: Le texte est déjà passé par la normalisation de l'automate
+
+        Returns:
+            Counter étiquette -> nombre d'occurrences
+        """
+        transitions, echecs, sorties = self._transitions, self._echecs, self._sorties
+        occurrences = []
+        etat = 0
+        for position, caractere in enumerate(f" {texte if deja_normalise else self._normaliser(texte)} "):
+            while etat and caractere not in transitions[etat]:
+                etat = echecs[etat]
+            etat = transitions[etat].get(caractere, 0)
+            for etiquette, longueur in sorties[etat]:
+                occurrences.append((position - longueur + 1, -longueur, position, etiquette))
+
+        # Plus longue occurrence d'abord, sans chevauchement : deux occurrences
+        # voisines ne partagent que l'espace qui les sépare ; une même forme
+        # peut porter plusieurs étiquettes
+        trouves = Counter()
+        retenue = (-1, 0)
+        for debut, _, position, etiquette in sorted(occurrences):
+            if debut >= retenue[1] or (debut, position) == retenue:
+                trouves[etiquette] += 1
+                retenue = (debut, position)
+        return trouves
+
+
+_automate_vocabulaire = None
+
+
+def _get_automate_vocabulaire() -> AutomateAhoCorasick:
+    global _automate_vocabulaire
+    if _automate_vocabulaire is None:
+        _automate_vocabulaire = AutomateAhoCorasick({mot: mot for mot in VOCABULAIRE_ATS})
+    return _automate_vocabulaire
+
+
+def _termes_techniques(ligne: str) -> Iterable[str]:
+    """
+    Termes d'une ligne de l'offre repérés par leur forme
+
+    Un simple mot capitalisé n'est retenu que s'il est un terme du lexique :
+    noms de villes et d'entreprises (Bordeaux, Airbus, Capgemini) et débuts
+    de phrase ne sont pas des compétences.
+    """
+    from lexiques import INDEX_GLOBAL
+
+    for correspondance in TERME_TECHNIQUE_RE.finditer(ligne):
+        terme = correspondance.group(1)
+        acronyme = terme.isupper() and len(terme) >= 2
+        forme_technique = any(c in terme for c in "+#./") or any(c.isdigit() for c in terme)
+        if not (acronyme or forme_technique) and INDEX_GLOBAL.canonique(terme) is None:
+            continue
+        if normaliser_texte(terme) in MOTS_IGNORES or len(normaliser_texte(terme)) < 2:
+            continue
+        yield terme
+
+
+def extraire_mots_cles(offre: str, max_mots_cles: int = MAX_MOTS_CLES) -> List[Dict[str, Any]]:
+    """
+    Extrait les mots-clés d'une offre avec leur priorité
+
+    Un mot-clé est HAUTE s'il est cité plusieurs fois ou sur une ligne
+    d'exigence ("requis", "maîtrise"...), BASSE sur une ligne de souhait
+    ("apprécié", "un plus"...), MOYENNE sinon.
+
+    Args:
+        offre: Texte de l'offre d'emploi
+        max_mots_cles: Nombre maximum de mots-clés retenus
+
+    Returns:
+        Liste de dicts {"mot", "priorite", "occurrences_offre"}, par priorité
+        puis ordre d'apparition
+    """
+    from lexiques import INDEX_GLOBAL
+
+    automate = _get_automate_vocabulaire()
+    mots = {}
+    for ligne in offre.splitlines() or [offre]:
+        ligne_normalisee = normaliser_texte(ligne)
+        if not ligne_normalisee:
+            continue
+        trouves = automate.rechercher(ligne_normalisee, deja_normalise=True)
+        connus = {normaliser_texte(mot) for mot in trouves}
+        for terme in _termes_techniques(ligne):
+            # Un terme déjà couvert par le vocabulaire n'est pas compté deux fois
+            if not any(f" {normaliser_texte(terme)} " in f" {connu} " for connu in connus):
+                trouves[terme] += 1
+
+        if MARQUEURS_HAUTE_RE.search(ligne_normalisee):
+            priorite_ligne = "HAUTE"
+        elif MARQUEURS_BASSE_RE.search(ligne_normalisee):
+            priorite_ligne = "BASSE"
+        else:
+            priorite_ligne = "MOYENNE"
+
+        for mot, nombre in trouves.items():
+            # "ML" et "Machine Learning" forment un seul mot-clé ; Python et Django,
+            # termes distincts du lexique, restent deux mots-clés (voir lexiques.py)
+            cle = normaliser_texte(INDEX_GLOBAL.canonique(mot) or mot)
+            entree = mots.setdefault(cle, {"mot": mot, "priorites": [], "occurrences_offre": 0, "rang": len(mots)})
+            entree["priorites"].append(priorite_ligne)
+            entree["occurrences_offre"] += nombre
+
+    ordre = {"HAUTE": 0, "MOYENNE": 1, "BASSE": 2}
+    resultats = []
+    for entree in mots.values():
+        if entree["occurrences_offre"] >= 2 or "HAUTE" in entree["priorites"]:
+            priorite = "HAUTE"
+        elif "MOYENNE" in entree["priorites"]:
+            priorite = "MOYENNE"
+        else:
+            priorite = "BASSE"
+        resultats.append({"mot": entree["mot"], "priorite": priorite, "occurrences_offre": entree["occurrences_offre"], "rang": entree["rang"]})
+
+    resultats.sort(key=lambda mot: (ordre[mot["priorite"]], mot["rang"]))
+    return [{cle: valeur for cle, valeur in mot.items() if cle != "rang"} for mot in resultats[:max_mots_cles]]
+
+
+def analyser_couverture(cv_text: str, offre: str, max_mots_cles: int = MAX_MOTS_CLES) -> Dict[str, Any]:
+    """
+    Calcule la couverture des mots-clés de l'offre par le CV
+
+    Args:
+        cv_text: Texte du CV extrait
+        offre: Texte de l'offre d'emploi
+        max_mots_cles: Nombre maximum de mots-clés de l'offre retenus
+
+    Returns:
+        Dict {"mots_cles_offre", "taux_couverture"} au format de
+        parse_ats_markdown ; chaque mot-clé a "mot", "priorite", "present"
+        et "occurrences" (dans le CV)
+    """
+    return analyser_couverture_offres(cv_text, [offre], max_mots_cles)[0]
+
+
+def analyser_couverture_offres(
+    cv_text: str, offres: List[str], max_mots_cles: int = MAX_MOTS_CLES
+) -> List[Dict[str, Any]]:
+    """
+    Calcule la couverture de plusieurs offres par un même CV, en un seul passage sur le CV
+
+    Les mots-clés de toutes les offres sont compilés dans un même automate ;
+    un mot-clé commun à plusieurs offres n'est compté qu'une fois.
+
+    Args:
+        cv_text: Texte du CV extrait
+        offres: Textes des offres d'emploi
+        max_mots_cles: Nombre maximum de mots-clés retenus par offre
+
+    Returns:
+        Liste des couvertures (voir analyser_couverture), dans l'ordre des offres
+    """
+    from lexiques import FORMES_EXACTES, INDEX_GLOBAL, est_forme_exacte, normaliser_lexique
+
+    def cle(mot: str) -> str:
+        return normaliser_texte(INDEX_GLOBAL.canonique(mot) or mot)
+
+    mots_cles_offres = [extraire_mots_cles(offre, max_mots_cles) for offre in offres]
+
+    # Un mot-clé est aussi reconnu sous ses formes équivalentes du lexique
+    # (synonymes, abréviations, pluriels) : "ML" dans le CV couvre "Machine Learning"
+    motifs = {}
+    for mots_cles in mots_cles_offres:
+        for mot in mots_cles:
+            for forme in INDEX_GLOBAL.formes_equivalentes(mot["mot"]):
+                motifs.setdefault(forme, cle(mot["mot"]))
+    # Acronymes et formes courtes, y compris ceux propres à l'offre ("SAFe"), reconnus tels quels
+    formes_exactes = FORMES_EXACTES | {forme for forme in motifs if est_forme_exacte(forme)}
+    occurrences = AutomateAhoCorasick(
+        motifs, normaliser=lambda texte: normaliser_lexique(texte, formes_exactes)
+    ).rechercher(cv_text) if motifs else Counter()
+
+    couvertures = []
+    for mots_cles in mots_cles_offres:
+        mots_cles_offre = [
+            {
+                "mot": mot["mot"],
+                "priorite": mot["priorite"],
+                "present": occurrences[cle(mot["mot"])] > 0,
+                "occurrences": occurrences[cle(mot["mot"])]
+            }
+            for mot in mots_cles
+        ]
+        presents = sum(1 for mot in mots_cles_offre if mot["present"])
+        couvertures.append({
+            "mots_cles_offre": mots_cles_offre,
+            "taux_couverture": f"{round(presents * 100 / len(mots_cles_offre))}%" if mots_cles_offre else "0%"
+        })
+    return couvertures
+
+
+def formater_couverture(couverture: Dict[str, Any]) -> str:
+    """Résume la couverture calculée pour la consigne envoyée au modèle"""
+    lignes = [f"Taux de couverture des mots-clés de l'offre : {couverture['taux_couverture']}"]
+    for mot in couverture["mots_cles_offre"]:
+        etat = f"présent {mot['occurrences']} fois" if mot["present"] else "absent"
+        lignes.append(f"- {mot['mot']} | {mot['priorite']} | {etat}")
+    return "\n".join(lignes)
@@ -0,0 +1,356 @@
+"""
+Backends d'appel au modèle : API Anthropic ou générateur local déterministe
+(benchmarks et tests de charge sans clé API)
+"""
+
+import hashlib
+import json
+import random
+import time
+from typing import Optional, Dict, Any, Callable, List, Protocol
+
+import anthropic
+
+import prompts
+from budget_tokens import estimer_tokens
+
+
+def detail_tokens(usage) -> Dict[str, int]:
+    """Détaille les tokens d'une réponse, y compris l'écriture et la lecture du cache"""
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0
+    }
+
+
+class BackendLLM(Protocol):
+    """Envoie un prompt système et des messages, retourne le texte et l'usage"""
+
+    # Origine des réponses, dans la clé du cache des réponses : une réponse
+    # synthétique n'est jamais servie à la place d'une réponse du modèle
+    nom: str
+
+    def envoyer(
+        self,
+        modele: str,
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+        on_texte: Optional[Callable[[str], None]] = None,
+        timeout: Optional[float] = None,
+        contexte: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Args:
+            modele: Identifiant du modèle
+            system: Blocs du prompt système
+            messages: Messages de la conversation
+            max_tokens: Nombre maximum de tokens générés
+            temperature: Température d'échantillonnage
+            on_texte: Callback appelé avec chaque fragment ; la réponse est
+                alors lue en streaming
+            timeout: Durée maximale de l'appel en secondes (TimeoutError au-delà)
+            contexte: Entrées dont la requête est construite ("etape", "cv",
+                "offre", "niche") ; seuls les backends qui indexent les
+                requêtes les utilisent (voir cassettes.BackendCassette)
+
+        Returns:
+            Dict {"texte", "tokens_detail"}
+        """
+        ...
+
+
+class BackendAnthropic:
+    """Appels à l'API Anthropic via le client partagé (voir claude_service.get_client)"""
+
+    nom = "anthropic"
+
+    def __init__(self, client: anthropic.Anthropic):
+        self.client = client
+
+    def envoyer(
+        self,
+        modele: str,
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+        on_texte: Optional[Callable[[str], None]] = None,
+        timeout: Optional[float] = None,
+        contexte: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        if on_texte:
+            with self.client.messages.stream(
+                model=modele,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system,
+                messages=messages,
+                timeout=timeout
+            ) as stream:
+                for fragment in stream.text_stream:
+                    on_texte(fragment)
+                message = stream.get_final_message()
+        else:
+            message = self.client.messages.create(
+                model=modele,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=system,
+                messages=messages,
+                timeout=timeout
+            )
+
+        return {"texte": message.content[0].text, "tokens_detail": detail_tokens(message.usage)}
+
+
+# Contenu utilisé par le backend local pour remplir les formats attendus
+CRITERES_LOCAUX = [
+    "Structure et lisibilité",
+    "Pertinence du contenu",
+    "Compétences techniques",
+    "Réalisations quantifiées",
+    "Adéquation avec la niche",
+]
+SECTIONS_LOCALES = ["Profil", "Expériences", "Compétences", "Formation", "Projets"]
+MOTS_CLES_LOCAUX = ["Python", "SQL", "Docker", "Agile", "Git", "Communication", "Gestion de projet", "Anglais"]
+
+
+class BackendLocal:
+    """
+    Backend sans réseau qui synthétise des réponses bien formées au format de
+    chaque étape (analyse, améliorations, checklist, ATS, rapport complet,
+    réécriture, suggestions)
+
+    La réponse ne dépend que de la requête : deux requêtes identiques donnent
+    le même texte, ce qui rend les benchmarks reproductibles.
+    """
+
+    nom = "local"
+
+    def __init__(
+        self,
+        latence_premier_token: float = 0.0,
+        tokens_par_seconde: float = 0.0,
+        tokens_entree: Optional[int] = None,
+        tokens_sortie: Optional[int] = None,
+        taille_fragment: int = 8
+    ):
+        """
+        Args:
+            latence_premier_token: Délai avant le premier fragment (secondes)
+            tokens_par_seconde: Débit de génération simulé (0 : instantané)
+            tokens_entree: Tokens d'entrée rapportés (défaut : estimés sur la requête)
+            tokens_sortie: Tokens de sortie rapportés et simulés (défaut : estimés sur le texte)
+            taille_fragment: Nombre de caractères par fragment en streaming
+        """
+        self.latence_premier_token = latence_premier_token
+        self.tokens_par_seconde = tokens_par_seconde
+        self.tokens_entree = tokens_entree
+        self.tokens_sortie = tokens_sortie
+        self.taille_fragment = taille_fragment
+
+    def envoyer(
+        self,
+        modele: str,
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+        on_texte: Optional[Callable[[str], None]] = None,
+        timeout: Optional[float] = None,
+        contexte: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        requete = json.dumps({"system": system, "messages": messages}, sort_keys=True, ensure_ascii=False)
+        graine = int(hashlib.sha256(requete.encode("utf-8")).hexdigest()[:16], 16)
+        texte = self.generer(system, random.Random(graine))
+
+        tokens_sortie = self.tokens_sortie or estimer_tokens(texte)
+        debut = time.perf_counter()
+        if timeout is not None and self._duree_simulee(tokens_sortie) > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Backend local : réponse plus lente que le timeout ({timeout:.1f}s)")
+        if self.latence_premier_token:
+            time.sleep(self.latence_premier_token)
+
+        if on_texte:
+            # Fragments émis au rythme du débit simulé
+            for i in range(0, len(texte), self.taille_fragment):
+                on_texte(texte[i:i + self.taille_fragment])
+                self._attendre(debut, tokens_sortie * min(i + self.taille_fragment, len(texte)) / len(texte))
+        else:
+            self._attendre(debut, tokens_sortie)
+
+        return {
+            "texte": texte,
+            "tokens_detail": {
+                "input_tokens": self.tokens_entree or estimer_tokens(requete),
+                "output_tokens": tokens_sortie,
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0
+            }
+        }
+
+    def _duree_simulee(self, tokens_sortie: int) -> float:
+        return self.latence_premier_token + (tokens_sortie / self.tokens_par_seconde if self.tokens_par_seconde else 0.0)
+
+    def _attendre(self, debut: float, tokens_emis: float):
+        if not self.tokens_par_seconde:
+            return
+        echeance = debut + self.latence_premier_token + tokens_emis / self.tokens_par_seconde
+        restant = echeance - time.perf_counter()
+        if restant > 0:
+            time.sleep(restant)
+
+    def generer(self, system: List[Dict[str, Any]], rng: random.Random) -> str:
+        """Génère la réponse au format de l'étape reconnue dans le prompt système"""
+        prompt = system[-1]["text"] if system else ""
+
+        if prompts.RAPPORT_COMPLET_PROMPT in prompt:
+            sections = [self._analyse(rng), self._ameliorations(rng), self._checklist(rng), self._ats(rng)]
+            return "\n\n".join(
+                f"{prompts.marqueur_section(nom)}\n{texte}"
+                for nom, texte in zip(prompts.SECTIONS_RAPPORT, sections)
+            )
+        if prompts.AMELIORATIONS_SECTION_PROMPT in prompt:
+            return self._ameliorations(rng)
+        if prompts.CHECKLIST_ACTIONS_PROMPT in prompt:
+            return self._checklist(rng)
+        if prompts.ANALYSE_ATS_PROMPT in prompt:
+            return self._ats(rng)
+        if prompts.ANALYSE_ATS_QUALITATIF_PROMPT in prompt:
+            return self._ats_qualitatif(rng)
+        if prompts.SCORE_NICHE_PROMPT in prompt:
+            return self._score_niche(rng)
+        if prompts.REECRITURE_PROMPT in prompt:
+            return self._reecriture(rng)
+        if prompts.SUGGESTIONS_PROMPT in prompt:
+            return self._suggestions(rng)
+        return self._analyse(rng)
+
+    def _analyse(self, rng: random.Random) -> str:
+        scores = [rng.randint(8, 18) for _ in CRITERES_LOCAUX]
+        lignes = [f"**SCORE_GLOBAL:** {sum(scores)}", ""]
+        for nom, score in zip(CRITERES_LOCAUX, scores):
+            lignes += [
+                f"## CRITERE: {nom}",
+                f"**Score:** {score}",
+                "",
+                "### POINTS_FORTS",
+                f"- {nom} correctement traité",
+                "",
+                "### AMELIORATIONS",
+                f"- Renforcer : {nom.lower()}",
+                "",
+                "---",
+                ""
+            ]
+        lignes += [
+            "## ADEQUATION_OFFRE",
+            "Profil cohérent avec la cible, quelques mots-clés à ajouter.",
+            "",
+            "## RECOMMANDATIONS_GENERALES",
+            "- Quantifier les réalisations",
+            "- Mettre les compétences clés en avant"
+        ]
+        return "\n".join(lignes)
+
+    def _ameliorations(self, rng: random.Random) -> str:
+        lignes = []
+        for numero, section in enumerate(rng.sample(SECTIONS_LOCALES, 3), 1):
+            lignes += [
+                f"## AMELIORATION {numero}",
+                f"**Section:** {section}",
+                f"**Titre:** Rendre la section {section} plus percutante",
+                f"**Impact:** {rng.randint(3, 15)}",
+                "",
+                "### AVANT",
+                f"Contenu actuel de la section {section}.",
+                "",
+                "### APRES",
+                f"Contenu reformulé de la section {section}, avec résultats chiffrés.",
+                "",
+                "### POURQUOI",
+                "- Plus concret pour le recruteur",
+                "- Meilleure détection par les ATS",
+                "",
+                "---",
+                ""
+            ]
+        return "\n".join(lignes)
+
+    def _checklist(self, rng: random.Random) -> str:
+        score = rng.randint(40, 70)
+        lignes = [
+            f"**SCORE_ACTUEL:** {score}",
+            f"**SCORE_POTENTIEL:** {min(score + 30, 100)}",
+            "**TEMPS_TOTAL:** 45 min",
+            "",
+            "---",
+            ""
+        ]
+        for numero, priorite in enumerate(["URGENTE", "IMPORTANTE", "BONUS"], 1):
+            mot = rng.choice(MOTS_CLES_LOCAUX)
+            lignes += [
+                f"## ACTION {numero}",
+                f"**Priorite:** {priorite}",
+                f"**Titre:** Mettre en avant {mot}",
+                f"**Impact:** {rng.randint(3, 15)}",
+                f"**Temps:** {rng.choice([5, 10, 15])} min",
+                "",
+                "### DESCRIPTION",
+                f"{mot} est attendu mais peu visible dans le CV.",
+                "",
+                "### ACTION_CONCRETE",
+                f"Ajouter une ligne citant {mot} dans l'expérience la plus récente.",
+                "",
+                "---",
+                ""
+            ]
+        return "\n".join(lignes)
+
+    def _ats(self, rng: random.Random) -> str:
+        mots = rng.sample(MOTS_CLES_LOCAUX, 6)
+        presents, manquants = mots[:3], mots[3:]
+        lignes = [
+            f"**SCORE_ATS:** {rng.randint(40, 90)}",
+            f"**TAUX_COUVERTURE:** {len(presents) * 100 // len(mots)}%",
+            "",
+            "## MOTS_CLES_MANQUANTS"
+        ]
+        lignes += [f"- {mot} | HAUTE | 0 occurrences" for mot in manquants]
+        lignes += ["", "## MOTS_CLES_PRESENTS"]
+        lignes += [f"- {mot} | MOYENNE | {rng.randint(1, 4)} occurrences" for mot in presents]
+        lignes += ["", "## RECOMMANDATIONS"]
+        lignes += [f"- Ajouter {mot} dans les compétences" for mot in manquants]
+        lignes += ["", "## POINTS_FORTS", f"- {presents[0]} bien présent"]
+        return "\n".join(lignes)
+
+    def _ats_qualitatif(self, rng: random.Random) -> str:
+        mots = rng.sample(MOTS_CLES_LOCAUX, 4)
+        lignes = [f"**SCORE_ATS:** {rng.randint(40, 90)}", "", "## RECOMMANDATIONS"]
+        lignes += [f"- Ajouter {mot} dans les compétences" for mot in mots[:2]]
+        lignes += ["", "## POINTS_FORTS"] + [f"- {mot}" for mot in mots[2:]]
+        return "\n".join(lignes)
+
+    def _score_niche(self, rng: random.Random) -> str:
+        mots = rng.sample(MOTS_CLES_LOCAUX, 4)
+        lignes = [f"**SCORE_NICHE:** {rng.randint(35, 90)}", "**VERDICT:** Profil compatible avec cette niche", "", "## ATOUTS"]
+        lignes += [f"- {mot}" for mot in mots[:2]]
+        lignes += ["", "## MANQUES"] + [f"- {mot} absent" for mot in mots[2:]]
+        return "\n".join(lignes)
+
+    def _reecriture(self, rng: random.Random) -> str:
+        lignes = ["# Prénom Nom", "## Titre du poste visé", ""]
+        for section in SECTIONS_LOCALES:
+            lignes += [f"### {section}", f"- Élément de la section {section} reformulé", ""]
+        lignes.append(f"- Compétences : {', '.join(rng.sample(MOTS_CLES_LOCAUX, 4))}")
+        return "\n".join(lignes)
+
+    def _suggestions(self, rng: random.Random) -> str:
+        return "\n".join(
+            ["## Suggestions"] + [f"- Valoriser {mot} avec un exemple concret" for mot in rng.sample(MOTS_CLES_LOCAUX, 4)]
+        )
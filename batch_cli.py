@@ -0,0 +1,283 @@
+"""
+Traitement par lots de CV PDF en ligne de commande (écoles partenaires)
+
+Exemples :
+    python batch_cli.py cvs/ --niche alternance --sortie resultats.jsonl
+    python batch_cli.py manifeste.jsonl --niche tech_dev --offre-fichier offre.txt --pdf-dir rapports/
+
+Un manifeste JSONL contient une ligne par CV : {"pdf": "chemin.pdf"}, avec
+éventuellement "niche" et "offre" pour surcharger les options de la commande.
+Un même PDF peut figurer sur plusieurs lignes (autre niche, autre offre) : il
+est extrait une fois et analysé pour chaque ligne.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, Dict, Any, List
+
+from backends import BackendLocal
+from cassettes import BackendCassette, MODES_CASSETTE
+from claude_service import ClaudeService, creer_backend
+from metriques import demarrer_serveur_metriques
+from tracing import get_traceur
+from pdf_utils import extraire_textes_pdfs, markdown_to_pdf
+from prompts import NICHES
+
+
+def lire_entrees(entree: str, niche: str, offre: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    Liste les CV à traiter depuis un dossier ou un manifeste JSONL
+
+    Returns:
+        Liste de dicts {"pdf", "niche", "offre"}
+
+    Raises:
+        ValueError: Si une ligne du manifeste indique une niche inconnue
+    """
+    if os.path.isdir(entree):
+        return [
+            {"pdf": os.path.join(entree, nom), "niche": niche, "offre": offre}
+            for nom in sorted(os.listdir(entree))
+            if nom.lower().endswith(".pdf")
+        ]
+
+    entrees = []
+    dossier = os.path.dirname(os.path.abspath(entree))
+    with open(entree, encoding="utf-8") as f:
+        for numero, ligne in enumerate(f, 1):
+            if not ligne.strip():
+                continue
+            element = json.loads(ligne)
+            chemin = element["pdf"]
+            niche_ligne = element.get("niche", niche)
+            if niche_ligne not in NICHES:
+                raise ValueError(
+                    f"{entree}, ligne {numero} : niche inconnue « {niche_ligne} » "
+                    f"(niches : {', '.join(NICHES)})"
+                )
+            entrees.append({
+                "pdf": chemin if os.path.isabs(chemin) else os.path.join(dossier, chemin),
+                "niche": niche_ligne,
+                "offre": element.get("offre", offre)
+            })
+    return entrees
+
+
+def rapport_markdown(nom: str, results: Dict[str, Any]) -> str:
+    """Construit le rapport Markdown d'un CV (pour l'export PDF)"""
+    analysis = results.get("analysis", {})
+    checklist = results.get("checklist", {})
+    analyse_ats = results.get("analyse_ats", {})
+
+    lignes = [f"# {nom}", f"## Score global : {analysis.get('score_global', 0)}/100", ""]
+
+    lignes.append("### Critères")
+    for critere in analysis.get("criteres", []):
+        lignes.append(f"- **{critere.get('nom', '')}** : {critere.get('score', 0)}/20")
+    lignes.append("")
+
+    lignes.append("### Plan d'action")
+    for action in checklist.get("actions", []):
+        lignes.append(f"- **{action.get('titre', '')}** (+{action.get('impact_points', 0)} pts) : {action.get('action_concrete', '')}")
+    lignes.append("")
+
+    lignes.append("### Améliorations")
+    for amelioration in results.get("ameliorations", {}).get("ameliorations", []):
+        lignes.append(f"#### {amelioration.get('section', '')} : {amelioration.get('titre', '')}")
+        lignes.append(amelioration.get("apres", ""))
+        lignes.append("")
+
+    lignes.append(f"### ATS : {analyse_ats.get('score_ats', 0)}/100 (couverture {analyse_ats.get('taux_couverture', '0%')})")
+    for reco in analyse_ats.get("recommandations", []):
+        lignes.append(f"- {reco}")
+
+    return "\n".join(lignes)
+
+
+def traiter_lot(
+    entrees: List[Dict[str, Any]],
+    sortie: str,
+    service: ClaudeService,
+    concurrence: int = 4,
+    workers_extraction: Optional[int] = None,
+    pdf_dir: Optional[str] = None,
+    mode: str = "etapes",
+    delai_max: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Extrait les CV (pool de processus), les analyse (concurrence bornée)
+    et écrit chaque résultat en JSONL dès qu'il est disponible
+
+    Chaque PDF est extrait une fois, puis analysé pour chacune des entrées
+    qui le citent ; chaque ligne écrite porte l'indice de son entrée ("entree").
+
+    Returns:
+        Dict du bilan de débit
+    """
+    indices_par_chemin = {}
+    for indice, entree in enumerate(entrees):
+        indices_par_chemin.setdefault(entree["pdf"], []).append(indice)
+    debut = time.perf_counter()
+    bilan = {"cvs": len(entrees), "succes": 0, "echecs": 0, "tokens": 0}
+
+    if pdf_dir:
+        os.makedirs(pdf_dir, exist_ok=True)
+
+    def analyser(entree: Dict[str, Any], cv_text: str) -> Dict[str, Any]:
+        # Une trace par CV, dont l'identifiant est écrit dans le JSONL
+        with get_traceur().span("cv.analyse", **{"cv.fichier": entree["pdf"], "cv.niche": entree["niche"]}) as span:
+            resultat = service.optimiser_cv_complet(cv_text, entree["niche"], entree["offre"], mode=mode, delai_max=delai_max)
+            return {**resultat, "trace_id": span.trace_id}
+
+    with open(sortie, "w", encoding="utf-8") as f, ThreadPoolExecutor(max_workers=concurrence) as executor:
+
+        def ecrire(ligne: Dict[str, Any]):
+            f.write(json.dumps(ligne, ensure_ascii=False) + "\n")
+            f.flush()
+
+        # Chaque CV extrait part aussitôt à l'analyse, pour chaque entrée qui le cite
+        futures = {}
+        for chemin, cv_text, erreur in extraire_textes_pdfs(indices_par_chemin, workers_extraction):
+            for indice in indices_par_chemin[chemin]:
+                if erreur:
+                    bilan["echecs"] += 1
+                    ecrire({"entree": indice, "pdf": chemin, "success": False, "error": erreur})
+                    continue
+                futures[executor.submit(analyser, entrees[indice], cv_text)] = indice
+
+        for future in as_completed(futures):
+            indice = futures[future]
+            chemin = entrees[indice]["pdf"]
+            resultat = future.result()
+            ligne = {"entree": indice, "pdf": chemin, "niche": entrees[indice]["niche"], **resultat}
+
+            # Les tokens des étapes réussies d'une analyse partielle sont aussi consommés
+            bilan["tokens"] += resultat.get("total_tokens", 0)
+            if resultat["success"]:
+                bilan["succes"] += 1
+                if pdf_dir:
+                    nom = os.path.splitext(os.path.basename(chemin))[0]
+                    if len(indices_par_chemin[chemin]) > 1:
+                        nom = f"{nom}_{indice + 1}"
+                    chemin_pdf = os.path.join(pdf_dir, f"{nom}_rapport.pdf")
+                    try:
+                        with get_traceur().span("cv.rapport_pdf", trace_id=resultat["trace_id"]), open(chemin_pdf, "wb") as pdf:
+                            pdf.write(markdown_to_pdf(rapport_markdown(nom, resultat["results"])))
+                        ligne["pdf_rapport"] = chemin_pdf
+                    except Exception as e:
+                        ligne["pdf_erreur"] = str(e)
+            else:
+                bilan["echecs"] += 1
+
+            ecrire(ligne)
+            en_echec = resultat.get("etapes_en_echec")
+            print(
+                f"{'✅' if resultat['success'] else '❌'} {os.path.basename(chemin)}"
+                + (f" (étapes en échec : {', '.join(en_echec)})" if en_echec else ""),
+                file=sys.stderr
+            )
+
+    duree = time.perf_counter() - debut
+    bilan["duree"] = duree
+    bilan["cvs_par_minute"] = bilan["succes"] / duree * 60 if duree else 0.0
+    bilan["tokens_par_cv"] = bilan["tokens"] / bilan["succes"] if bilan["succes"] else 0.0
+    return bilan
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Analyse par lots de CV PDF avec Claude")
+    parser.add_argument("entree", help="Dossier de PDF ou manifeste JSONL")
+    parser.add_argument("--niche", required=True, choices=list(NICHES.keys()), help="Niche cible")
+    parser.add_argument("--offre", help="Texte de l'offre d'emploi")
+    parser.add_argument("--offre-fichier", help="Fichier texte contenant l'offre d'emploi")
+    parser.add_argument("--sortie", default="resultats.jsonl", help="Fichier JSONL de sortie")
+    parser.add_argument("--pdf-dir", help="Dossier où écrire un rapport PDF par CV")
+    parser.add_argument("--concurrence", type=int, default=4, help="CV analysés simultanément")
+    parser.add_argument("--workers-extraction", type=int, help="Processus d'extraction PDF")
+    parser.add_argument("--mode", choices=["etapes", "rapport_unique"], default="etapes", help="Stratégie d'appel")
+    parser.add_argument("--backend", choices=["anthropic", "local"], default="anthropic",
+                        help="local : réponses synthétiques sans clé API (mesure de débit hors ligne)")
+    parser.add_argument("--latence-locale", type=float, default=0.0, help="Backend local : délai avant le premier token (s)")
+    parser.add_argument("--debit-local", type=float, default=0.0, help="Backend local : tokens générés par seconde (0 : instantané)")
+    parser.add_argument("--cassette", help="Cassette (.jsonl.gz) où enregistrer ou d'où rejouer les réponses")
+    parser.add_argument("--cassette-mode", choices=list(MODES_CASSETTE), default="relecture", help="Mode de la cassette")
+    parser.add_argument("--cassette-stricte", action="store_true",
+                        help="Retrouve les réponses par l'empreinte de toute la requête (tout changement de prompt échoue)")
+    parser.add_argument("--vitesse-relecture", type=float, default=0.0,
+                        help="Relecture : 1 = rythme d'origine, 10 = dix fois plus vite, 0 = instantané")
+    parser.add_argument("--delai-max", type=float, help="Durée maximale de l'analyse d'un CV (secondes)")
+    parser.add_argument("--couverture", action="store_true",
+                        help="Duplique les appels plus lents que le p95 de leur étape")
+    parser.add_argument("--escalade", action="store_true", help="Relance sur un modèle plus puissant les réponses inexploitables")
+    parser.add_argument("--par-section", action="store_true",
+                        help="Génère les améliorations section par section, en parallèle")
+    parser.add_argument("--port-metriques", type=int,
+                        help="Expose les métriques Prometheus sur ce port pendant le lot (/metrics)")
+    args = parser.parse_args(argv)
+
+    offre = args.offre
+    if args.offre_fichier:
+        with open(args.offre_fichier, encoding="utf-8") as f:
+            offre = f.read()
+
+    try:
+        entrees = lire_entrees(args.entree, args.niche, offre)
+    except ValueError as e:
+        print(f"Manifeste invalide : {e}", file=sys.stderr)
+        return 1
+    if not entrees:
+        print("Aucun PDF à traiter", file=sys.stderr)
+        return 1
+
+    backend = None
+    if args.backend == "local":
+        backend = BackendLocal(latence_premier_token=args.latence_locale, tokens_par_seconde=args.debit_local)
+    if args.cassette:
+        if args.cassette_mode == "enregistrement" and backend is None:
+            backend = creer_backend(os.getenv("ANTHROPIC_API_KEY"))
+        backend = BackendCassette(
+            args.cassette, args.cassette_mode, backend,
+            vitesse=args.vitesse_relecture, stricte=args.cassette_stricte
+        )
+    demarrer_serveur_metriques(args.port_metriques)
+    service = ClaudeService(
+        escalade=args.escalade or None,
+        couverture=args.couverture or None,
+        ameliorations_par_section=args.par_section or None,
+        backend=backend
+    )
+    bilan = traiter_lot(
+        entrees,
+        args.sortie,
+        service,
+        concurrence=args.concurrence,
+        workers_extraction=args.workers_extraction,
+        pdf_dir=args.pdf_dir,
+        mode=args.mode,
+        delai_max=args.delai_max
+    )
+
+    print(
+        f"\n{bilan['succes']}/{bilan['cvs']} CV traités en {bilan['duree']:.1f}s "
+        f"({bilan['cvs_par_minute']:.1f} CV/min, {bilan['tokens_par_cv']:.0f} tokens/CV, "
+        f"{bilan['echecs']} échecs)",
+        file=sys.stderr
+    )
+    for etape, modeles in service.stats_etapes.stats().items():
+        for modele, stats in modeles.items():
+            print(
+                f"  {etape} [{modele}] : {stats['appels']} appels, p95 {stats['latence_p95']:.1f}s, "
+                f"max {stats['latence_max']:.1f}s, ${stats['cout_total']:.4f}, {stats['escalades']} escalades, "
+                f"{stats['couvertures']} couvertures (${stats['cout_couvertures']:.4f}), "
+                f"{stats['delais_depasses']} délais dépassés",
+                file=sys.stderr
+            )
+    return 0 if bilan["echecs"] == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Benchmark du score provisoire local sur un corpus de CV synthétiques
+
+Exemples :
+    python bench_score_local.py
+    python bench_score_local.py --cvs 2000 --niche data_ai --mots 600
+
+Mesure la latence d'un CV isolé (p50/p95, comme à l'upload dans l'interface)
+et le débit du calcul par lot (ScoreurLocal.scorer_lot).
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Optional, List
+
+import numpy as np
+
+from ats_local import VOCABULAIRE_ATS
+from prompts import NICHES
+from score_local import ScoreurLocal
+
+OFFRE_SYNTHETIQUE = """Nous recherchons un profil maîtrisant Python, SQL et Docker.
+Compétences requises : Machine Learning, Pandas, Git, méthodologies agiles.
+Une expérience en Kubernetes ou AWS serait un plus.
+Anglais courant, autonomie et rigueur."""
+
+MOTS_COURANTS = (
+    "projet équipe client développement mise en place gestion suivi analyse conception réalisation "
+    "amélioration outils processus données application service production qualité responsable"
+).split()
+TITRES = ["PROFIL", "EXPÉRIENCES PROFESSIONNELLES", "FORMATION", "COMPÉTENCES", "PROJETS", "LANGUES"]
+
+
+def generer_cv(rng: random.Random, mots: int) -> str:
+    """Génère un CV synthétique : sections, phrases, compétences et chiffres tirés au hasard"""
+    lignes = ["Prénom Nom", "prenom.nom@example.com - 06 00 00 00 00"]
+    par_section = max(1, mots // len(TITRES))
+    for titre in rng.sample(TITRES, rng.randint(3, len(TITRES))):
+        lignes.append(titre)
+        phrase = []
+        for _ in range(par_section):
+            tirage = rng.random()
+            if tirage < 0.15:
+                phrase.append(rng.choice(VOCABULAIRE_ATS))
+            elif tirage < 0.2:
+                phrase.append(f"{rng.randint(2, 95)}%")
+            else:
+                phrase.append(rng.choice(MOTS_COURANTS))
+            if len(phrase) >= 12:
+                lignes.append("- " + " ".join(phrase))
+                phrase = []
+        if phrase:
+            lignes.append("- " + " ".join(phrase))
+    return "\n".join(lignes)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark du score provisoire local")
+    parser.add_argument("--cvs", type=int, default=500, help="Nombre de CV synthétiques")
+    parser.add_argument("--mots", type=int, default=400, help="Nombre de mots par CV")
+    parser.add_argument("--niche", default="data_ai", choices=list(NICHES.keys()), help="Niche cible")
+    parser.add_argument("--sans-offre", action="store_true", help="Score sur le seul focus de la niche")
+    parser.add_argument("--graine", type=int, default=0, help="Graine du corpus synthétique")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.graine)
+    corpus = [generer_cv(rng, args.mots) for _ in range(args.cvs)]
+    offre = None if args.sans_offre else OFFRE_SYNTHETIQUE
+
+    debut = time.perf_counter()
+    scoreur = ScoreurLocal(args.niche, offre)
+    preparation = time.perf_counter() - debut
+
+    latences = []
+    for cv_text in corpus:
+        debut = time.perf_counter()
+        scoreur.scorer(cv_text)
+        latences.append(time.perf_counter() - debut)
+
+    debut = time.perf_counter()
+    scores = scoreur.scorer_lot(corpus)
+    duree_lot = time.perf_counter() - debut
+
+    latences_ms = np.array(latences) * 1000
+    print(f"Corpus : {args.cvs} CV de ~{args.mots} mots, niche {args.niche}, {len(scoreur.termes)} termes de requête")
+    print(f"Préparation de la requête : {preparation * 1000:.1f} ms")
+    print(
+        f"CV isolé : p50 {np.percentile(latences_ms, 50):.2f} ms, p95 {np.percentile(latences_ms, 95):.2f} ms, "
+        f"max {latences_ms.max():.2f} ms"
+    )
+    print(f"Lot : {duree_lot * 1000:.1f} ms ({args.cvs / duree_lot:.0f} CV/s)")
+    print(f"Scores : min {scores.min()}, moyenne {scores.mean():.1f}, max {scores.max()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+Estimation locale des tokens et réduction des entrées trop longues avant chaque appel
+"""
+
+import math
+import re
+from typing import Optional, Dict, Any, List, Tuple
+
+# Ratio moyen observé pour du texte français/anglais avec les tokenizers Claude
+CARACTERES_PAR_TOKEN = 3.5
+
+# Budget d'entrée (CV + offre) par étape, en tokens estimés. Les quatre étapes
+# de l'analyse partagent le même budget pour recevoir un texte identique et
+# conserver le préfixe commun du cache de prompt.
+BUDGETS_ENTREE = {
+    "analysis": 6000,
+    "ameliorations": 6000,
+    "checklist": 6000,
+    "analyse_ats": 6000,
+    "rapport": 6000,
+    "suggestions": 6000,
+    "score_niche": 6000,  # même budget que l'analyse : même bloc CV, donc même préfixe en cache
+    "reecriture": 10000,  # la réécriture doit conserver tout le CV
+}
+BUDGET_ENTREE_DEFAUT = 6000
+
+# Part maximale du budget laissée à l'offre quand il faut la tronquer
+PART_MAX_OFFRE = 0.35
+
+# Numéros de page et pieds de page répétés par l'extraction PDF
+PAGE_RE = re.compile(r'\bpage\s*\d{1,3}(?:\s*(?:/|sur|of)\s*\d{1,3})?\b', re.IGNORECASE)
+LIGNE_NUMERO_RE = re.compile(r'^[ \t]*\d{1,3}[ \t]*(?:/[ \t]*\d{1,3}[ \t]*)?$', re.MULTILINE)
+
+# Paragraphes génériques des offres (présentation, avantages, mentions légales)
+BOILERPLATE_OFFRE_RE = re.compile(
+    r"(?:à propos de nous|qui sommes[- ]nous|pourquoi nous rejoindre|nos avantages|avantages\s*:"
+    r"|ce que nous offrons|about us|why join us|benefits\s*:|equal opportunity|égalité des chances"
+    r"|conformément à|rgpd|données personnelles|handi-?accueillante|tous nos postes sont ouverts)",
+    re.IGNORECASE
+)
+
+
+def estimer_tokens(texte: Optional[str]) -> int:
+    """Estime le nombre de tokens d'un texte sans appel réseau"""
+    if not texte:
+        return 0
+    return math.ceil(len(texte) / CARACTERES_PAR_TOKEN)
+
+
+def normaliser_espaces(texte: str) -> str:
+    """Réduit les espaces et lignes vides répétés"""
+    texte = re.sub(r'[ \t ]+', ' ', texte)
+    texte = re.sub(r' *\n *', '\n', texte)
+    texte = re.sub(r'\n{3,}', '\n\n', texte)
+    return texte.strip()
+
+
+def _segments(texte: str) -> List[str]:
+    """Découpe en lignes, ou en phrases pour un texte déjà aplati par clean_text"""
+    if '\n' in texte:
+        return texte.split('\n')
+    return re.split(r'(?<=[.!?•|])\s+', texte)
+
+
+def supprimer_repetitions(texte: str) -> str:
+    """Supprime les numéros de page et les segments répétés (en-têtes de page dupliqués)"""
+    texte = LIGNE_NUMERO_RE.sub('', PAGE_RE.sub(' ', texte))
+    separateur = '\n' if '\n' in texte else ' '
+
+    vus = set()
+    conserves = []
+    for segment in _segments(texte):
+        cle = re.sub(r'\W+', ' ', segment).strip().lower()
+        if len(cle) >= 15 and cle in vus:
+            continue
+        vus.add(cle)
+        conserves.append(segment)
+
+    return normaliser_espaces(separateur.join(conserves))
+
+
+def supprimer_boilerplate(offre: str) -> str:
+    """Retire de l'offre les paragraphes de présentation, avantages et mentions légales"""
+    paragraphes = re.split(r'\n\s*\n', offre) if '\n' in offre else _segments(offre)
+    conserves = [p for p in paragraphes if not BOILERPLATE_OFFRE_RE.search(p)]
+    return ('\n\n' if '\n' in offre else ' ').join(conserves).strip() or offre
+
+
+def tronquer(texte: str, max_tokens: int) -> str:
+    """Tronque un texte à un nombre de tokens estimé, sur une fin de phrase si possible"""
+    max_caracteres = int(max_tokens * CARACTERES_PAR_TOKEN)
+    if len(texte) <= max_caracteres:
+        return texte
+    coupe = texte[:max_caracteres]
+    fin_phrase = max(coupe.rfind('. '), coupe.rfind('\n'))
+    if fin_phrase > max_caracteres * 0.8:
+        coupe = coupe[:fin_phrase + 1]
+    return coupe.rstrip() + " [...]"
+
+
+def ajuster_entrees(
+    etape: str,
+    cv_text: str,
+    offre: Optional[str] = None,
+    budget: Optional[int] = None
+) -> Tuple[str, Optional[str], Dict[str, Any]]:
+    """
+    Applique les réductions, de la moins à la plus coûteuse en information,
+    jusqu'à passer sous le budget de l'étape
+
+    Args:
+        etape: Nom de l'étape (voir BUDGETS_ENTREE)
+        cv_text: Texte du CV
+        offre: Texte de l'offre (optionnel)
+        budget: Budget en tokens (défaut : celui de l'étape)
+
+    Returns:
+        Tuple (cv_text, offre, rapport) ; le rapport liste les réductions
+        appliquées et les tokens gagnés par chacune
+    """
+    budget = budget or BUDGETS_ENTREE.get(etape, BUDGET_ENTREE_DEFAUT)
+    tokens_avant = estimer_tokens(cv_text) + estimer_tokens(offre)
+    rapport = {
+        "budget": budget,
+        "tokens_estimes_avant": tokens_avant,
+        "tokens_estimes_apres": tokens_avant,
+        "reductions": []
+    }
+
+    if tokens_avant <= budget:
+        return cv_text, offre, rapport
+
+    reductions = [
+        ("espaces", lambda cv, of: (normaliser_espaces(cv), normaliser_espaces(of) if of else of)),
+        ("repetitions", lambda cv, of: (supprimer_repetitions(cv), supprimer_repetitions(of) if of else of)),
+        ("boilerplate_offre", lambda cv, of: (cv, supprimer_boilerplate(of) if of else of)),
+        ("troncature_offre", lambda cv, of: (cv, tronquer(of, int(budget * PART_MAX_OFFRE)) if of else of)),
+        ("troncature_cv", lambda cv, of: (tronquer(cv, budget - estimer_tokens(of)), of)),
+    ]
+
+    total = tokens_avant
+    for nom, reduction in reductions:
+        nouveau_cv, nouvelle_offre = reduction(cv_text, offre)
+        nouveau_total = estimer_tokens(nouveau_cv) + estimer_tokens(nouvelle_offre)
+        if nouveau_total < total:
+            rapport["reductions"].append({"reduction": nom, "tokens_gagnes": total - nouveau_total})
+            cv_text, offre, total = nouveau_cv, nouvelle_offre, nouveau_total
+        if total <= budget:
+            break
+
+    rapport["tokens_estimes_apres"] = total
+    return cv_text, offre, rapport
@@ -0,0 +1,188 @@
+"""
+Cache des réponses Claude adressé par contenu (LRU en mémoire + SQLite)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+
+def calculer_cle(**elements) -> str:
+    """
+    Calcule l'empreinte d'une requête
+
+    Args:
+        **elements: Tout ce qui détermine la réponse (CV, niche, offre,
+            prompt système, modèle, température, max_tokens...)
+
+    Returns:
+        str: Empreinte SHA-256 hexadécimale
+    """
+    contenu = json.dumps(elements, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+class CacheResultats:
+    """Cache à deux niveaux : LRU en mémoire devant une base SQLite persistante"""
+
+    def __init__(
+        self,
+        chemin: Optional[str] = None,
+        ttl: float = 7 * 24 * 3600,
+        max_entrees_memoire: int = 256,
+        max_entrees_disque: int = 5000
+    ):
+        """
+        Initialise le cache
+
+        Args:
+            chemin: Fichier SQLite (None : cache uniquement en mémoire)
+            ttl: Durée de vie d'une entrée en secondes
+            max_entrees_memoire: Taille maximale du niveau mémoire
+            max_entrees_disque: Taille maximale du niveau SQLite
+        """
+        self.ttl = ttl
+        self.max_entrees_memoire = max_entrees_memoire
+        self.max_entrees_disque = max_entrees_disque
+        self._memoire = OrderedDict()  # cle -> (expire_le, valeur)
+        self._lock = threading.Lock()
+        self.compteurs = {
+            "hits_memoire": 0,
+            "hits_disque": 0,
+            "misses": 0,
+            "ecritures": 0,
+            "evictions": 0
+        }
+
+        self._db = None
+        if chemin:
+            dossier = os.path.dirname(chemin)
+            if dossier:
+                os.makedirs(dossier, exist_ok=True)
+            self._db = sqlite3.connect(chemin, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS resultats (
+                    cle TEXT PRIMARY KEY,
+                    valeur TEXT NOT NULL,
+                    expire_le REAL NOT NULL,
+                    dernier_acces REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_dernier_acces ON resultats (dernier_acces)")
+            self._db.commit()
+
+    def get(self, cle: str) -> Optional[Dict[str, Any]]:
+        """Retourne la valeur associée à la clé, ou None si absente ou expirée"""
+        maintenant = time.time()
+
+        with self._lock:
+            entree = self._memoire.get(cle)
+            if entree and entree[0] > maintenant:
+                self._memoire.move_to_end(cle)
+                self.compteurs["hits_memoire"] += 1
+                return entree[1]
+            if entree:
+                del self._memoire[cle]
+
+            if self._db:
+                ligne = self._db.execute(
+                    "SELECT valeur, expire_le FROM resultats WHERE cle = ?", (cle,)
+                ).fetchone()
+                if ligne and ligne[1] > maintenant:
+                    self._db.execute(
+                        "UPDATE resultats SET dernier_acces = ? WHERE cle = ?", (maintenant, cle)
+                    )
+                    self._db.commit()
+                    valeur = json.loads(ligne[0])
+                    self._stocker_memoire(cle, ligne[1], valeur)
+                    self.compteurs["hits_disque"] += 1
+                    return valeur
+
+            self.compteurs["misses"] += 1
+            return None
+
+    def set(self, cle: str, valeur: Dict[str, Any]):
+        """Enregistre une valeur (sérialisable en JSON) dans les deux niveaux"""
+        maintenant = time.time()
+        expire_le = maintenant + self.ttl
+
+        with self._lock:
+            self._stocker_memoire(cle, expire_le, valeur)
+            self.compteurs["ecritures"] += 1
+
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO resultats (cle, valeur, expire_le, dernier_acces) VALUES (?, ?, ?, ?)",
+                    (cle, json.dumps(valeur, ensure_ascii=False), expire_le, maintenant)
+                )
+                self._evincer_disque(maintenant)
+                self._db.commit()
+
+    def vider(self):
+        """Supprime toutes les entrées"""
+        with self._lock:
+            self._memoire.clear()
+            if self._db:
+                self._db.execute("DELETE FROM resultats")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs et la taille de chaque niveau"""
+        with self._lock:
+            stats = dict(self.compteurs)
+            stats["entrees_memoire"] = len(self._memoire)
+            stats["entrees_disque"] = (
+                self._db.execute("SELECT COUNT(*) FROM resultats").fetchone()[0] if self._db else 0
+            )
+        hits = stats["hits_memoire"] + stats["hits_disque"]
+        total = hits + stats["misses"]
+        stats["taux_hit"] = hits / total if total else 0.0
+        return stats
+
+    def _stocker_memoire(self, cle: str, expire_le: float, valeur: Dict[str, Any]):
+        self._memoire[cle] = (expire_le, valeur)
+        self._memoire.move_to_end(cle)
+        while len(self._memoire) > self.max_entrees_memoire:
+            self._memoire.popitem(last=False)
+            self.compteurs["evictions"] += 1
+
+    def _evincer_disque(self, maintenant: float):
+        # Entrées expirées, puis les moins récemment utilisées au-delà de la taille maximale
+        curseur = self._db.execute("DELETE FROM resultats WHERE expire_le <= ?", (maintenant,))
+        self.compteurs["evictions"] += max(curseur.rowcount, 0)
+        curseur = self._db.execute(
+            """
+            DELETE FROM resultats WHERE cle IN (
+                SELECT cle FROM resultats ORDER BY dernier_acces DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entrees_disque,)
+        )
+        self.compteurs["evictions"] += max(curseur.rowcount, 0)
+
+
+_cache_global = None
+_cache_global_lock = threading.Lock()
+
+
+def get_cache() -> CacheResultats:
+    """
+    Retourne le cache partagé par toutes les sessions du processus
+
+    Configuré par les variables d'environnement CV_CACHE_PATH (fichier
+    SQLite, vide pour désactiver la persistance) et CV_CACHE_TTL (secondes).
+    """
+    global _cache_global
+    with _cache_global_lock:
+        if _cache_global is None:
+            _cache_global = CacheResultats(
+                chemin=os.getenv("CV_CACHE_PATH", ".cache/resultats_claude.sqlite3") or None,
+                ttl=float(os.getenv("CV_CACHE_TTL", 7 * 24 * 3600))
+            )
+        return _cache_global
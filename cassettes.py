@@ -0,0 +1,229 @@
+"""
+Enregistrement et relecture des échanges avec le modèle (cassettes gzip JSONL)
+
+Une cassette enregistrée en production sert ensuite de corpus de régression :
+rejouée avec de nouveaux parsers, elle donne les mêmes réponses au caractère
+près, avec leur rythme d'origine ou accéléré, sans consommer de tokens.
+
+Chaque session d'enregistrement ajoute un seul flux gzip au fichier (vidé
+après chaque échange) : la compression porte sur toute la session, et les
+échanges déjà écrits restent lisibles si le processus s'arrête sans fermer
+la cassette.
+"""
+
+import atexit
+import gzip
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+from backends import BackendLLM
+from cache_resultats import calculer_cle
+
+MODES_CASSETTE = ("enregistrement", "relecture")
+# Entrées d'une requête qui forment sa clé sémantique (avec le modèle)
+ENTREES_SEMANTIQUES = ("etape", "cv", "offre", "niche")
+
+
+class CassetteManquante(Exception):
+    """Requête absente de la cassette en mode relecture"""
+
+
+class BackendCassette:
+    """
+    Backend qui enregistre les échanges d'un autre backend, ou les rejoue
+
+    Chaque entrée conserve le texte, l'usage et l'instant de chaque fragment
+    reçu. Elle est retrouvée par sa clé sémantique : étape, CV, offre, niche
+    et modèle (voir `contexte` de BackendLLM.envoyer), pour qu'une cassette
+    reste rejouable après une modification des prompts. En mode strict, la
+    clé est l'empreinte de toute la requête (modèle, prompt système, messages,
+    max_tokens, température) : tout changement de prompt est détecté.
+    """
+
+    def __init__(
+        self,
+        chemin: str,
+        mode: str = "relecture",
+        backend: Optional[BackendLLM] = None,
+        vitesse: float = 1.0,
+        stricte: bool = False
+    ):
+        """
+        Args:
+            chemin: Fichier de la cassette (.jsonl.gz)
+            mode: "enregistrement" (appelle `backend` et écrit) ou "relecture"
+            backend: Backend réel, requis en enregistrement
+            vitesse: Facteur d'accélération de la relecture (1 : rythme
+                d'origine, 10 : dix fois plus vite, 0 : instantané)
+            stricte: Retrouve les réponses par l'empreinte de toute la requête
+                plutôt que par ses entrées sémantiques
+        """
+        if mode not in MODES_CASSETTE:
+            raise ValueError(f"Mode de cassette inconnu : {mode}")
+        if mode == "enregistrement" and backend is None:
+            raise ValueError("Un backend réel est nécessaire pour enregistrer une cassette")
+
+        self.chemin = chemin
+        self.mode = mode
+        self.backend = backend
+        # En enregistrement, les réponses sont celles du backend réel
+        self.nom = backend.nom if mode == "enregistrement" else "cassette"
+        self.vitesse = vitesse
+        self.stricte = stricte
+        self._lock = threading.Lock()
+        self._flux = None
+        self._entrees, self._complete = self.charger(chemin) if os.path.exists(chemin) else ([], True)
+        # Pour une même clé, le dernier enregistrement l'emporte. Les entrées
+        # sans clé sémantique (cassettes antérieures) ne se rejouent qu'en mode strict.
+        self.entrees = {}
+        for entree in self._entrees:
+            cle = entree["cle"] if stricte else entree.get("cle_semantique")
+            if cle:
+                self.entrees[cle] = entree
+
+    @staticmethod
+    def charger(chemin: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Lit une cassette
+
+        Returns:
+            Tuple (entrées dans l'ordre d'enregistrement, False si le dernier
+            flux est tronqué, par exemple une session interrompue sans fermer
+            la cassette)
+        """
+        entrees = []
+        with gzip.open(chemin, "rt", encoding="utf-8") as f:
+            try:
+                for ligne in f:
+                    if ligne.strip():
+                        entrees.append(json.loads(ligne))
+            except (EOFError, zlib.error, json.JSONDecodeError):
+                return entrees, False
+        return entrees, True
+
+    def fermer(self):
+        """Termine le flux gzip de la session d'enregistrement"""
+        with self._lock:
+            if self._flux is not None:
+                self._flux.close()
+                self._flux = None
+
+    def _ecrire(self, entree: Dict[str, Any]):
+        """Ajoute une entrée au flux de la session (appelé sous verrou)"""
+        if self._flux is None:
+            if not self._complete:
+                # Un flux tronqué rendrait illisibles les flux ajoutés après lui :
+                # la cassette est réécrite avec les entrées qu'il a été possible de lire
+                with gzip.open(f"{self.chemin}.tmp", "wt", encoding="utf-8") as f:
+                    for ancienne in self._entrees:
+                        f.write(json.dumps(ancienne, ensure_ascii=False) + "\n")
+                os.replace(f"{self.chemin}.tmp", self.chemin)
+                self._complete = True
+            self._flux = gzip.open(self.chemin, "at", encoding="utf-8")
+            atexit.register(self.fermer)
+        self._flux.write(json.dumps(entree, ensure_ascii=False) + "\n")
+        # Vidage synchronisé (Z_SYNC_FLUSH) : l'entrée est lisible même si la
+        # session ne se termine pas, sans commencer un nouveau flux gzip
+        self._flux.flush()
+
+    def envoyer(
+        self,
+        modele: str,
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        max_tokens: int,
+        temperature: float,
+        on_texte: Optional[Callable[[str], None]] = None,
+        timeout: Optional[float] = None,
+        contexte: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        cle = calculer_cle(
+            model=modele,
+            system=system,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        # Sans contexte (appel direct du backend), seule la requête complète identifie la réponse
+        cle_semantique = calculer_cle(
+            model=modele, **{nom: contexte.get(nom) for nom in ENTREES_SEMANTIQUES}
+        ) if contexte else None
+        if self.mode == "relecture":
+            return self._rejouer(cle if self.stricte else cle_semantique, on_texte, timeout)
+        return self._enregistrer(
+            cle, cle_semantique, modele, system, messages, max_tokens, temperature, on_texte, timeout, contexte
+        )
+
+    def _enregistrer(
+        self, cle, cle_semantique, modele, system, messages, max_tokens, temperature, on_texte, timeout, contexte
+    ) -> Dict[str, Any]:
+        debut = time.perf_counter()
+        fragments = []
+
+        def recevoir(fragment: str):
+            fragments.append([round(time.perf_counter() - debut, 3), fragment])
+            on_texte(fragment)
+
+        reponse = self.backend.envoyer(
+            modele, system, messages, max_tokens, temperature,
+            on_texte=recevoir if on_texte else None,
+            timeout=timeout,
+            contexte=contexte
+        )
+        duree = time.perf_counter() - debut
+
+        entree = {
+            "cle": cle,
+            "cle_semantique": cle_semantique,
+            "etape": contexte.get("etape") if contexte else None,
+            "modele": modele,
+            "texte": reponse["texte"],
+            "tokens_detail": reponse["tokens_detail"],
+            "duree": round(duree, 3),
+            # Sans streaming, tout le texte arrive à la fin de l'appel
+            "fragments": fragments or [[round(duree, 3), reponse["texte"]]],
+            "enregistre_le": time.time()
+        }
+        with self._lock:
+            if cle_semantique or self.stricte:
+                self.entrees[cle if self.stricte else cle_semantique] = entree
+            self._ecrire(entree)
+            self._entrees.append(entree)
+
+        return reponse
+
+    def _rejouer(
+        self,
+        cle: Optional[str],
+        on_texte: Optional[Callable[[str], None]],
+        timeout: Optional[float]
+    ) -> Dict[str, Any]:
+        entree = self.entrees.get(cle) if cle else None
+        if entree is None:
+            raise CassetteManquante(
+                f"Requête absente de la cassette {self.chemin} ({cle[:12] if cle else 'sans contexte'})"
+            )
+        if timeout is not None and self.vitesse and entree["duree"] / self.vitesse > timeout:
+            # Une réponse enregistrée trop lente expire aussi à la relecture
+            time.sleep(timeout)
+            raise TimeoutError(f"Réponse rejouée plus lente que le timeout ({timeout:.1f}s)")
+
+        debut = time.perf_counter()
+        for instant, fragment in entree["fragments"]:
+            self._attendre(debut, instant)
+            if on_texte:
+                on_texte(fragment)
+        self._attendre(debut, entree["duree"])
+
+        return {"texte": entree["texte"], "tokens_detail": dict(entree["tokens_detail"])}
+
+    def _attendre(self, debut: float, instant: float):
+        if not self.vitesse:
+            return
+        restant = debut + instant / self.vitesse - time.perf_counter()
+        if restant > 0:
+            time.sleep(restant)
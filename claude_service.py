@@ -3,17 +3,219 @@ Service d'interaction avec l'API Claude d'Anthropic
 """
 
 import anthropic
+import hashlib
+import httpx
 import json
 import os
+import queue
 import re
-from typing import Optional, Dict, Any
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait
+from typing import Optional, Dict, Any, Callable, List, Tuple
 from dotenv import load_dotenv
 import prompts
+from ats_local import analyser_couverture, analyser_couverture_offres, formater_couverture
+from backends import BackendLLM, BackendAnthropic, BackendLocal
+from budget_tokens import ajuster_entrees, estimer_tokens
+from cassettes import BackendCassette
+from sections_cv import SECTIONS_AMELIORABLES, decouper_sections
+from coalescence import CoalescenceAppels, get_coalescence
+from metriques import JournalAppels, get_journal_appels
+from cache_resultats import CacheResultats, calculer_cle, get_cache
+from routage import ROUTAGE_ETAPES, StatsEtapes, calculer_cout, get_stats_etapes
+from score_local import ScoreurOffres, score_provisoire
+from tracing import get_traceur, propager, trace
+from relances import (
+    DelaiDepasse, PolitiqueRelance, MetriquesRelances, est_relancable,
+    executer_avec_relances, get_metriques_relances
+)
 
 # Chargement des variables d'environnement
 load_dotenv()
 
+# Étapes de l'analyse complète : clé du résultat -> méthode de ClaudeService
+# (les étapes sont indépendantes les unes des autres)
+ETAPES_ANALYSE = {
+    "analysis": "analyser_cv",
+    "ameliorations": "generer_ameliorations_sections",
+    "checklist": "generer_checklist_actions",
+    "analyse_ats": "analyser_ats",
+}
 
+# Entrées réellement utilisées par chaque étape : lors d'une réanalyse, seules
+# les étapes dont l'une de ces entrées a changé sont recalculées. Avec une
+# offre, l'analyse ATS se fonde sur les mots-clés de l'offre et ignore la niche.
+DEPENDANCES_ETAPES = {
+    "analysis": ("cv", "niche", "offre"),
+    "ameliorations": ("cv", "niche", "offre"),
+    "checklist": ("cv", "niche", "offre"),
+    "analyse_ats": ("cv", "offre"),
+}
+# Dépendances d'une étape quand aucune offre n'est fournie
+DEPENDANCES_SANS_OFFRE = {
+    "analyse_ats": ("cv", "niche"),
+}
+
+# Point d'arrêt du cache de prompt Anthropic
+CACHE_EPHEMERE = {"type": "ephemeral"}
+
+# Budgets de relance par étape (429/529 et erreurs transitoires)
+POLITIQUES_RELANCE = {
+    "analysis": PolitiqueRelance(max_tentatives=4, budget_attente=45.0),
+    "ameliorations": PolitiqueRelance(max_tentatives=4, budget_attente=45.0),
+    "checklist": PolitiqueRelance(max_tentatives=4, budget_attente=45.0),
+    "analyse_ats": PolitiqueRelance(max_tentatives=4, budget_attente=30.0),
+    "reecriture": PolitiqueRelance(max_tentatives=3, budget_attente=30.0),
+    "suggestions": PolitiqueRelance(max_tentatives=3, budget_attente=30.0),
+    "rapport": PolitiqueRelance(max_tentatives=3, budget_attente=60.0),
+}
+POLITIQUE_RELANCE_DEFAUT = PolitiqueRelance()
+
+# Timeout d'une tentative pour une étape sans "timeout" dans ROUTAGE_ETAPES
+TIMEOUT_DEFAUT = 60.0
+# Délai laissé aux étapes pour rendre leur erreur de timeout après l'échéance
+MARGE_ECHEANCE = 2.0
+
+# Couverture des requêtes lentes ("hedging") : un doublon part quand un appel
+# dépasse le p95 de son étape, une fois assez de latences mesurées
+MIN_ECHANTILLONS_COUVERTURE = 20
+
+# Améliorations par section : taille minimale d'une section envoyée seule
+# (caractères) et nombre de sections traitées simultanément
+LONGUEUR_MIN_SECTION = 40
+MAX_SECTIONS_SIMULTANEES = 4
+
+# Comparaison de plusieurs offres : offres les mieux classées localement
+# qui passent par analyser_ats, et nombre d'analyses simultanées
+OFFRES_AFFINEES = 3
+MAX_OFFRES_SIMULTANEES = 4
+
+# Balayage des niches : notes courtes envoyées simultanément
+MAX_NICHES_SIMULTANEES = 8
+
+# Pool de connexions HTTP partagé par toutes les sessions du processus
+POOL_MAX_CONNEXIONS = 32
+POOL_MAX_KEEPALIVE = 16
+POOL_KEEPALIVE_EXPIRY = 60.0  # secondes
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _http2_disponible() -> bool:
+    """HTTP/2 nécessite le paquet optionnel h2 (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_client(api_key: str, base_url: Optional[str] = None) -> anthropic.Anthropic:
+    """
+    Retourne le client Anthropic partagé pour une clé API
+    
+    Le client (et son pool de connexions keep-alive) est créé une seule fois
+    par processus puis réutilisé par toutes les sessions, ce qui évite une
+    nouvelle poignée de main TLS à chaque analyse. httpx.Client est thread-safe.
+    
+    Args:
+        api_key: Clé API Anthropic
+        base_url: URL de l'API (optionnel, ex: serveur local de test)
+        
+    Returns:
+        anthropic.Anthropic: Client partagé
+    """
+    with _clients_lock:
+        cle = (api_key, base_url)
+        if cle not in _clients:
+            http_client = anthropic.DefaultHttpxClient(
+                http2=_http2_disponible(),
+                limits=httpx.Limits(
+                    max_connections=POOL_MAX_CONNEXIONS,
+                    max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=POOL_KEEPALIVE_EXPIRY
+                )
+            )
+            # Les relances sont gérées par ClaudeService (voir relances.py)
+            _clients[cle] = anthropic.Anthropic(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=http_client,
+                max_retries=0
+            )
+        return _clients[cle]
+
+
+def creer_backend(api_key: Optional[str], base_url: Optional[str] = None) -> BackendLLM:
+    """
+    Construit le backend décrit par les variables d'environnement
+    
+    CV_BACKEND=local donne un BackendLocal, sinon l'API Anthropic est
+    utilisée (clé requise). Si CV_CASSETTE indique un fichier, les échanges
+    y sont enregistrés (CV_CASSETTE_MODE=enregistrement, défaut) ou rejoués
+    (relecture, sans clé API) à la vitesse CV_CASSETTE_VITESSE ;
+    CV_CASSETTE_STRICTE=1 retrouve les réponses par l'empreinte de toute la
+    requête (prompts compris) plutôt que par ses entrées.
+    
+    Raises:
+        ValueError: Si la clé API est nécessaire et absente
+    """
+    cassette = os.getenv("CV_CASSETTE")
+    mode_cassette = os.getenv("CV_CASSETTE_MODE", "enregistrement")
+    
+    backend = None
+    if os.getenv("CV_BACKEND", "").lower() == "local":
+        backend = BackendLocal()
+    elif not (cassette and mode_cassette == "relecture"):
+        if not api_key:
+            raise ValueError("Clé API Anthropic non trouvée. Vérifiez votre fichier .env")
+        backend = BackendAnthropic(get_client(api_key, base_url))
+    
+    if cassette:
+        backend = BackendCassette(
+            cassette,
+            mode_cassette,
+            backend,
+            vitesse=float(os.getenv("CV_CASSETTE_VITESSE", 1.0)),
+            stricte=os.getenv("CV_CASSETTE_STRICTE", "").lower() in ("1", "true", "oui")
+        )
+    return backend
+
+
+def parse_action_bloc(bloc: str) -> Optional[Dict[str, Any]]:
+    """Parse un bloc ## ACTION de la checklist (None si mal formé)"""
+    try:
+        action = {}
+        lignes = bloc.strip().split('\n')
+        
+        for ligne in lignes[:10]:
+            if '**Priorite:**' in ligne:
+                action['priorite'] = ligne.split('**Priorite:**')[1].strip()
+            elif '**Titre:**' in ligne:
+                action['titre'] = ligne.split('**Titre:**')[1].strip()
+            elif '**Impact:**' in ligne:
+                action['impact_points'] = int(re.search(r'\d+', ligne).group())
+            elif '**Temps:**' in ligne:
+                action['temps_estime'] = ligne.split('**Temps:**')[1].strip()
+        
+        texte_complet = '\n'.join(lignes)
+        
+        if '### DESCRIPTION' in texte_complet:
+            desc_section = texte_complet.split('### DESCRIPTION')[1].split('###')[0].strip()
+            action['description'] = desc_section
+        
+        if '### ACTION_CONCRETE' in texte_complet:
+            action_section = texte_complet.split('### ACTION_CONCRETE')[1].split('---')[0].strip()
+            action['action_concrete'] = action_section
+        
+        return action if action.get('titre') else None
+    except:
+        return None
+
+
+@trace("parse.checklist")
 def parse_checklist_markdown(text: str) -> Dict[str, Any]:
     """Parse le format Markdown de la checklist"""
     result = {
@@ -35,38 +237,14 @@ def parse_checklist_markdown(text: str) -> Dict[str, Any]:
     # Parse les actions
     blocs = text.split('## ACTION ')[1:]
     for bloc in blocs:
-        try:
-            action = {}
-            lignes = bloc.strip().split('\n')
-            
-            for ligne in lignes[:10]:
-                if '**Priorite:**' in ligne:
-                    action['priorite'] = ligne.split('**Priorite:**')[1].strip()
-                elif '**Titre:**' in ligne:
-                    action['titre'] = ligne.split('**Titre:**')[1].strip()
-                elif '**Impact:**' in ligne:
-                    action['impact_points'] = int(re.search(r'\d+', ligne).group())
-                elif '**Temps:**' in ligne:
-                    action['temps_estime'] = ligne.split('**Temps:**')[1].strip()
-            
-            texte_complet = '\n'.join(lignes)
-            
-            if '### DESCRIPTION' in texte_complet:
-                desc_section = texte_complet.split('### DESCRIPTION')[1].split('###')[0].strip()
-                action['description'] = desc_section
-            
-            if '### ACTION_CONCRETE' in texte_complet:
-                action_section = texte_complet.split('### ACTION_CONCRETE')[1].split('---')[0].strip()
-                action['action_concrete'] = action_section
-            
-            if action.get('titre'):
-                result['actions'].append(action)
-        except:
-            continue
+        action = parse_action_bloc(bloc)
+        if action:
+            result['actions'].append(action)
     
     return result
 
 
+@trace("parse.analyse_ats")
 def parse_ats_markdown(text: str) -> Dict[str, Any]:
     """Parse le format Markdown de l'analyse ATS"""
     result = {
@@ -129,6 +307,40 @@ def parse_ats_markdown(text: str) -> Dict[str, Any]:
     return result
 
 
+def parse_critere_bloc(bloc: str) -> Optional[Dict[str, Any]]:
+    """Parse un bloc ## CRITERE: de l'analyse principale (None si mal formé)"""
+    try:
+        critere = {}
+        lignes = bloc.strip().split('\n')
+        
+        # Nom du critère (première ligne)
+        critere['nom'] = lignes[0].strip().split('**Score:**')[0].strip()
+        
+        # Score
+        for ligne in lignes[:5]:
+            if '**Score:**' in ligne:
+                match = re.search(r'\d+', ligne)
+                if match:
+                    critere['score'] = int(match.group())
+        
+        texte_complet = '\n'.join(lignes)
+        
+        # Points forts
+        if '### POINTS_FORTS' in texte_complet:
+            section = texte_complet.split('### POINTS_FORTS')[1].split('###')[0]
+            critere['points_forts'] = [l.strip('- ').strip() for l in section.split('\n') if l.strip().startswith('-')]
+        
+        # Améliorations
+        if '### AMELIORATIONS' in texte_complet:
+            section = texte_complet.split('### AMELIORATIONS')[1].split('---')[0]
+            critere['ameliorations'] = [l.strip('- ').strip() for l in section.split('\n') if l.strip().startswith('-')]
+        
+        return critere if critere.get('nom') else None
+    except:
+        return None
+
+
+@trace("parse.analysis")
 def parse_analyse_markdown(text: str) -> Dict[str, Any]:
     """Parse le format Markdown de l'analyse principale"""
     result = {
@@ -148,36 +360,9 @@ def parse_analyse_markdown(text: str) -> Dict[str, Any]:
     # Parse les critères
     blocs_criteres = text.split('## CRITERE:')[1:]
     for bloc in blocs_criteres:
-        try:
-            critere = {}
-            lignes = bloc.strip().split('\n')
-            
-            # Nom du critère (première ligne)
-            critere['nom'] = lignes[0].strip().split('**Score:**')[0].strip()
-            
-            # Score
-            for ligne in lignes[:5]:
-                if '**Score:**' in ligne:
-                    match = re.search(r'\d+', ligne)
-                    if match:
-                        critere['score'] = int(match.group())
-            
-            texte_complet = '\n'.join(lignes)
-            
-            # Points forts
-            if '### POINTS_FORTS' in texte_complet:
-                section = texte_complet.split('### POINTS_FORTS')[1].split('###')[0]
-                critere['points_forts'] = [l.strip('- ').strip() for l in section.split('\n') if l.strip().startswith('-')]
-            
-            # Améliorations
-            if '### AMELIORATIONS' in texte_complet:
-                section = texte_complet.split('### AMELIORATIONS')[1].split('---')[0]
-                critere['ameliorations'] = [l.strip('- ').strip() for l in section.split('\n') if l.strip().startswith('-')]
-            
-            if critere.get('nom'):
-                result['criteres'].append(critere)
-        except:
-            continue
+        critere = parse_critere_bloc(bloc)
+        if critere:
+            result['criteres'].append(critere)
     
     # Adéquation offre
     if '## ADEQUATION_OFFRE' in text:
@@ -192,6 +377,67 @@ def parse_analyse_markdown(text: str) -> Dict[str, Any]:
     return result
 
 
+def parse_amelioration_bloc(bloc: str) -> Optional[Dict[str, Any]]:
+    """Parse un bloc ## AMELIORATION (None si mal formé)"""
+    try:
+        lignes = bloc.strip().split('\n')
+        amelioration = {}
+        
+        # Parse les métadonnées
+        for ligne in lignes[:10]:  # Les 10 premières lignes contiennent les métadonnées
+            if ligne.startswith('**Section:**'):
+                amelioration['section'] = ligne.replace('**Section:**', '').strip()
+            elif ligne.startswith('**Titre:**'):
+                amelioration['titre'] = ligne.replace('**Titre:**', '').strip()
+            elif ligne.startswith('**Impact:**'):
+                amelioration['impact_score'] = int(ligne.replace('**Impact:**', '').strip())
+        
+        # Parse AVANT, APRES, POURQUOI
+        texte_complet = '\n'.join(lignes)
+        
+        if '### AVANT' in texte_complet and '### APRES' in texte_complet:
+            avant_section = texte_complet.split('### AVANT')[1].split('### APRES')[0].strip()
+            amelioration['avant'] = avant_section
+        
+        if '### APRES' in texte_complet and '### POURQUOI' in texte_complet:
+            apres_section = texte_complet.split('### APRES')[1].split('### POURQUOI')[0].strip()
+            amelioration['apres'] = apres_section
+        
+        if '### POURQUOI' in texte_complet:
+            pourquoi_section = texte_complet.split('### POURQUOI')[1].split('---')[0].strip()
+            pourquoi_lignes = [l.strip('- ').strip() for l in pourquoi_section.split('\n') if l.strip().startswith('-')]
+            amelioration['pourquoi'] = pourquoi_lignes
+        
+        # Si on a au moins une section, on garde le bloc
+        return amelioration if amelioration.get('section') else None
+    except Exception as e:
+        # Skip les blocs mal formés
+        return None
+
+
+@trace("parse.score_niche")
+def parse_score_niche_markdown(text: str) -> Dict[str, Any]:
+    """Parse le format Markdown de la note d'adéquation à une niche"""
+    result = {"score": 0, "verdict": "", "atouts": [], "manques": []}
+    
+    for ligne in text.split('\n')[:10]:
+        if '**SCORE_NICHE:**' in ligne:
+            nombre = re.search(r'\d+', ligne.split('**SCORE_NICHE:**')[1])
+            result['score'] = int(nombre.group()) if nombre else 0
+        elif '**VERDICT:**' in ligne:
+            result['verdict'] = ligne.split('**VERDICT:**')[1].strip()
+    
+    for titre, cle in (('## ATOUTS', 'atouts'), ('## MANQUES', 'manques')):
+        if titre in text:
+            section = text.split(titre)[1].split('##')[0]
+            for ligne in section.split('\n'):
+                if ligne.strip().startswith('-'):
+                    result[cle].append(ligne.strip('- ').strip())
+    
+    return result
+
+
+@trace("parse.ameliorations")
 def parse_ameliorations_markdown(text: str) -> Dict[str, Any]:
     """Parse le format Markdown des améliorations et retourne un dict"""
     ameliorations = []
@@ -200,44 +446,282 @@ def parse_ameliorations_markdown(text: str) -> Dict[str, Any]:
     blocs = text.split('## AMELIORATION ')[1:]  # Ignore la partie avant le premier bloc
     
     for bloc in blocs:
-        try:
-            lignes = bloc.strip().split('\n')
-            amelioration = {}
-            
-            # Parse les métadonnées
-            for ligne in lignes[:10]:  # Les 10 premières lignes contiennent les métadonnées
-                if ligne.startswith('**Section:**'):
-                    amelioration['section'] = ligne.replace('**Section:**', '').strip()
-                elif ligne.startswith('**Titre:**'):
-                    amelioration['titre'] = ligne.replace('**Titre:**', '').strip()
-                elif ligne.startswith('**Impact:**'):
-                    amelioration['impact_score'] = int(ligne.replace('**Impact:**', '').strip())
-            
-            # Parse AVANT, APRES, POURQUOI
-            texte_complet = '\n'.join(lignes)
-            
-            if '### AVANT' in texte_complet and '### APRES' in texte_complet:
-                avant_section = texte_complet.split('### AVANT')[1].split('### APRES')[0].strip()
-                amelioration['avant'] = avant_section
-            
-            if '### APRES' in texte_complet and '### POURQUOI' in texte_complet:
-                apres_section = texte_complet.split('### APRES')[1].split('### POURQUOI')[0].strip()
-                amelioration['apres'] = apres_section
-            
-            if '### POURQUOI' in texte_complet:
-                pourquoi_section = texte_complet.split('### POURQUOI')[1].split('---')[0].strip()
-                pourquoi_lignes = [l.strip('- ').strip() for l in pourquoi_section.split('\n') if l.strip().startswith('-')]
-                amelioration['pourquoi'] = pourquoi_lignes
-            
-            if amelioration.get('section'):  # Si on a au moins une section, on ajoute
-                ameliorations.append(amelioration)
-        except Exception as e:
-            # Skip les blocs mal formés
-            continue
+        amelioration = parse_amelioration_bloc(bloc)
+        if amelioration:
+            ameliorations.append(amelioration)
     
     return {"ameliorations": ameliorations}
 
 
+# Étapes dont les blocs répétés sont émis pendant le streaming :
+# clé -> (délimiteur, parser d'un bloc, parser de l'en-tête)
+BLOCS_PROGRESSIFS = {
+    "analysis": ("## CRITERE:", parse_critere_bloc, parse_analyse_markdown),
+    "ameliorations": ("## AMELIORATION ", parse_amelioration_bloc, None),
+    "checklist": ("## ACTION ", parse_action_bloc, parse_checklist_markdown),
+}
+
+# Ligne '---' qui clôt un bloc
+SEPARATEUR_BLOC_RE = re.compile(r'^---[ \t]*\n', re.MULTILINE)
+
+
+class ParseurIncremental:
+    """
+    Parse au fil du streaming les blocs répétés d'une réponse (## CRITERE:, ## ACTION...)
+    
+    Un bloc est émis dès qu'il est clos par sa ligne '---' ou par le
+    délimiteur suivant, sans attendre la fin de la réponse. Le résultat
+    définitif reste celui du parser complet appliqué au texte final.
+    """
+    
+    def __init__(
+        self,
+        delimiteur: str,
+        parse_bloc: Callable[[str], Optional[Dict[str, Any]]],
+        parse_entete: Optional[Callable[[str], Dict[str, Any]]] = None,
+        on_bloc: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ):
+        """
+        Args:
+            delimiteur: Délimiteur de début de bloc
+            parse_bloc: Parser d'un bloc (retourne None si mal formé)
+            parse_entete: Parser du texte précédant le premier bloc (scores)
+            on_bloc: Callback (type_bloc, donnees) avec type_bloc "entete" ou "bloc"
+        """
+        self.delimiteur = delimiteur
+        self.parse_bloc = parse_bloc
+        self.parse_entete = parse_entete
+        self.on_bloc = on_bloc
+        self.texte = ""
+        self.debut_bloc = None
+        self.bloc_emis = False
+    
+    def ajouter(self, fragment: str) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Ajoute un fragment de texte reçu
+        
+        Returns:
+            Liste des éléments (type_bloc, donnees) complétés par ce fragment
+        """
+        self.texte += fragment
+        emis = []
+        
+        if self.debut_bloc is None:
+            debut = self.texte.find(self.delimiteur)
+            if debut < 0:
+                return emis
+            if self.parse_entete:
+                self._emettre(emis, "entete", self.parse_entete(self.texte[:debut]))
+            self.debut_bloc = debut + len(self.delimiteur)
+        
+        while True:
+            fin = self.texte.find(self.delimiteur, self.debut_bloc)
+            contenu = self.texte[self.debut_bloc:] if fin < 0 else self.texte[self.debut_bloc:fin]
+            
+            if not self.bloc_emis:
+                separateur = SEPARATEUR_BLOC_RE.search(contenu)
+                if separateur or fin >= 0:
+                    self._emettre(emis, "bloc", self.parse_bloc(contenu[:separateur.start()] if separateur else contenu))
+                    self.bloc_emis = True
+            
+            if fin < 0:
+                return emis
+            self.debut_bloc = fin + len(self.delimiteur)
+            self.bloc_emis = False
+    
+    def terminer(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Clôture la réponse et émet le dernier bloc s'il ne l'a pas été"""
+        emis = []
+        if self.debut_bloc is not None and not self.bloc_emis:
+            self._emettre(emis, "bloc", self.parse_bloc(self.texte[self.debut_bloc:]))
+            self.bloc_emis = True
+        return emis
+    
+    def _emettre(self, emis: list, type_bloc: str, donnees: Optional[Dict[str, Any]]):
+        if donnees:
+            emis.append((type_bloc, donnees))
+            if self.on_bloc:
+                self.on_bloc(type_bloc, donnees)
+
+
+# Délimiteur de section du rapport complet, reconnu une fois sa ligne terminée
+MARQUEUR_SECTION_RE = re.compile(r'^[ \t#*]*=+ *SECTION *: *([A-Z_]+) *=+[ \t*]*\n', re.MULTILINE)
+
+# Section du rapport complet -> (clé du résultat, parser Markdown)
+PARSEURS_RAPPORT = {
+    "ANALYSE": ("analysis", parse_analyse_markdown),
+    "AMELIORATIONS": ("ameliorations", parse_ameliorations_markdown),
+    "CHECKLIST": ("checklist", parse_checklist_markdown),
+    "ATS": ("analyse_ats", parse_ats_markdown),
+}
+
+
+class ParseurRapportComplet:
+    """Découpe au fil de l'eau un rapport complet en sections"""
+    
+    def __init__(self):
+        self.tampon = ""
+        self.section_courante = None
+        self.sections = {}
+    
+    def ajouter(self, fragment: str) -> List[Tuple[str, str]]:
+        """
+        Ajoute un fragment de texte reçu
+        
+        Args:
+            fragment: Morceau de la réponse (delta de streaming ou texte complet)
+            
+        Returns:
+            Liste des sections (nom, texte) terminées par ce fragment
+        """
+        self.tampon += fragment
+        terminees = []
+        
+        while True:
+            match = MARQUEUR_SECTION_RE.search(self.tampon)
+            if not match:
+                break
+            if self.section_courante:
+                terminees.append(self._cloturer(self.tampon[:match.start()]))
+            self.section_courante = match.group(1)
+            self.tampon = self.tampon[match.end():]
+        
+        return terminees
+    
+    def terminer(self) -> List[Tuple[str, str]]:
+        """Clôture la réponse et retourne les dernières sections terminées"""
+        terminees = self.ajouter("\n")
+        if self.section_courante:
+            terminees.append(self._cloturer(self.tampon))
+            self.section_courante = None
+            self.tampon = ""
+        return terminees
+    
+    def _cloturer(self, texte: str) -> Tuple[str, str]:
+        self.sections[self.section_courante] = texte.strip()
+        return self.section_courante, self.sections[self.section_courante]
+
+
+@trace("parse.rapport")
+def parse_rapport_complet(text: str) -> Dict[str, Any]:
+    """Parse un rapport complet et retourne les résultats des sections trouvées"""
+    parseur = ParseurRapportComplet()
+    parseur.ajouter(text)
+    parseur.terminer()
+    
+    results = {}
+    for nom, texte in parseur.sections.items():
+        if nom in PARSEURS_RAPPORT:
+            cle, parser = PARSEURS_RAPPORT[nom]
+            results[cle] = parser(texte)
+    return results
+
+
+def entrees_etape(etape: str, offre: Optional[str] = None) -> Tuple[str, ...]:
+    """Retourne les entrées (cv, niche, offre) dont dépend le résultat d'une étape"""
+    if not offre and etape in DEPENDANCES_SANS_OFFRE:
+        return DEPENDANCES_SANS_OFFRE[etape]
+    return DEPENDANCES_ETAPES.get(etape, ("cv", "niche", "offre"))
+
+
+def empreinte_entrees(etape: str, cv_text: str, niche: str, offre: Optional[str] = None) -> str:
+    """
+    Calcule l'empreinte des entrées utilisées par une étape
+    
+    Deux analyses de même empreinte pour une étape donnent le même résultat :
+    il peut être réutilisé sans nouvel appel (voir ClaudeService.reanalyser).
+    
+    Args:
+        etape: Clé de l'étape (voir ETAPES_ANALYSE)
+        cv_text: Texte du CV extrait
+        niche: Clé de la niche cible
+        offre: Texte de l'offre d'emploi (optionnel)
+        
+    Returns:
+        str: Empreinte SHA-256 hexadécimale
+    """
+    valeurs = {"cv": cv_text, "niche": niche, "offre": offre or ""}
+    utilisees = {nom: valeurs[nom] for nom in entrees_etape(etape, offre)}
+    return hashlib.sha256(json.dumps(utilisees, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def etapes_reutilisables(
+    cv_text: str,
+    niche: str,
+    offre: Optional[str] = None,
+    precedent: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Sélectionne les étapes d'une analyse précédente dont les entrées n'ont pas changé
+    
+    Args:
+        cv_text: Texte du CV extrait
+        niche: Clé de la niche cible
+        offre: Texte de l'offre d'emploi (optionnel)
+        precedent: Résultat d'un précédent optimiser_cv_complet ou
+            reanalyser ("results" et "empreintes")
+        
+    Returns:
+        Dict étape -> résultat réutilisable sans nouvel appel
+    """
+    precedent = precedent or {}
+    empreintes = precedent.get("empreintes", {})
+    return {
+        cle: donnees
+        for cle, donnees in (precedent.get("results") or {}).items()
+        if cle in ETAPES_ANALYSE and empreintes.get(cle) == empreinte_entrees(cle, cv_text, niche, offre)
+    }
+
+
+def sommer_tokens(resultats) -> Dict[str, int]:
+    """Additionne le détail des tokens d'une liste de résultats d'étapes"""
+    total = {}
+    for resultat in resultats:
+        for cle, valeur in resultat.get("tokens_detail", {}).items():
+            total[cle] = total.get(cle, 0) + valeur
+    return total
+
+
+def classer_offres_localement(cv_text: str, niche: str, offres: List[str]) -> List[Dict[str, Any]]:
+    """
+    Classe des offres pour un CV sans appel au modèle
+    
+    Score provisoire de toutes les offres en une opération matricielle
+    (score_local.ScoreurOffres) et couverture de leurs mots-clés en un seul
+    passage sur le CV (ats_local.analyser_couverture_offres).
+    
+    Args:
+        cv_text: Texte du CV extrait
+        niche: Clé de la niche cible
+        offres: Textes des offres d'emploi
+        
+    Returns:
+        Liste de dicts {"indice", "score_local", "taux_couverture",
+        "mots_cles_absents", "analyse_ats": None, "error": None}, par
+        couverture puis score local décroissants
+    """
+    if not offres:
+        return []
+    scores = ScoreurOffres(niche, offres).scorer(cv_text)["scores"]
+    couvertures = analyser_couverture_offres(cv_text, offres)
+    lignes = [
+        {
+            "indice": indice,
+            "score_local": int(scores[indice]),
+            "taux_couverture": couvertures[indice]["taux_couverture"],
+            "mots_cles_absents": [
+                mot["mot"] for mot in couvertures[indice]["mots_cles_offre"]
+                if not mot["present"] and mot["priorite"] == "HAUTE"
+            ],
+            "analyse_ats": None,
+            "error": None
+        }
+        for indice in range(len(offres))
+    ]
+    # La couverture des mots-clés d'abord : c'est ce que filtre un ATS
+    return sorted(lignes, key=lambda ligne: (-int(ligne["taux_couverture"].rstrip("%")), -ligne["score_local"]))
+
+
 def clean_json_string(text: str) -> str:
     """Nettoie une chaîne JSON de manière agressive pour éviter les erreurs de parsing"""
     # Enlève les blocs de code markdown
@@ -279,28 +763,538 @@ def clean_json_string(text: str) -> str:
     return '\n'.join(cleaned_lines)
 
 
+# Contrôle de structure d'une réponse : une réponse invalide déclenche
+# l'escalade vers un modèle plus puissant (voir ROUTAGE_ETAPES).
+# Clé -> (parser, contrôle de la structure parsée) ; sans parser, le contrôle
+# porte sur le texte. La structure parsée est conservée avec la réponse
+# ("donnees") pour que l'étape ne reparse pas le texte.
+STRUCTURES_VALIDES = {
+    "analysis": (parse_analyse_markdown, lambda donnees: bool(donnees["criteres"])),
+    "ameliorations": (parse_ameliorations_markdown, lambda donnees: bool(donnees["ameliorations"])),
+    "checklist": (parse_checklist_markdown, lambda donnees: bool(donnees["actions"])),
+    "analyse_ats": (
+        parse_ats_markdown, lambda donnees: bool(donnees["mots_cles_offre"] or donnees["recommandations"])
+    ),
+    "rapport": (parse_rapport_complet, lambda donnees: len(donnees) == len(PARSEURS_RAPPORT)),
+    "score_niche": (None, lambda texte: '**SCORE_NICHE:**' in texte),
+}
+
+
+# Couverture des requêtes lentes (voir ClaudeService._envoyer_couvert) : pool
+# des deux requêtes concurrentes, partagé par toutes les sessions du processus
+_executeur_couverture = ThreadPoolExecutor(max_workers=32, thread_name_prefix="couverture")
+
+
+class AppelAbandonne(Exception):
+    """Flux interrompu car la requête concurrente a répondu la première"""
+
+
 class ClaudeService:
     """Service pour interagir avec l'API Claude"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[CacheResultats] = None,
+        utiliser_cache: bool = True,
+        base_url: Optional[str] = None,
+        metriques_relances: Optional[MetriquesRelances] = None,
+        routage: Optional[Dict[str, Dict[str, Any]]] = None,
+        escalade: Optional[bool] = None,
+        stats_etapes: Optional[StatsEtapes] = None,
+        backend: Optional[BackendLLM] = None,
+        coalescence: Optional[CoalescenceAppels] = None,
+        couverture: Optional[bool] = None,
+        ameliorations_par_section: Optional[bool] = None,
+        ats_local: Optional[bool] = None,
+        journal: Optional[JournalAppels] = None
+    ):
         """
         Initialise le service Claude
         
         Args:
             api_key: Clé API Anthropic (optionnel, utilise .env par défaut)
+            cache: Cache des réponses (défaut : cache partagé du processus)
+            utiliser_cache: Désactive le cache des réponses si False
+            base_url: URL de l'API (optionnel, ex: faux serveur local de test)
+            metriques_relances: Compteurs de relances (défaut : partagés du processus)
+            routage: Surcharges de ROUTAGE_ETAPES par étape (ex: {"analysis": {"model": ...}})
+            escalade: Relance sur le modèle d'escalade quand la réponse n'a pas
+                la structure attendue (défaut : variable d'environnement CV_ESCALADE)
+            stats_etapes: Statistiques de latence, tokens, coût et issue du parsing
+                par étape (défaut : partagées du processus)
+            backend: Backend d'appel (défaut : voir creer_backend)
+            coalescence: Table des appels en cours (défaut : partagée du processus)
+            couverture: Duplique les appels plus lents que le p95 de leur étape
+                (défaut : variable d'environnement CV_COUVERTURE)
+            ameliorations_par_section: Génère les améliorations section par
+                section, en parallèle (défaut : variable d'environnement
+                CV_AMELIORATIONS_PAR_SECTION)
+            ats_local: Calcule localement la couverture des mots-clés de
+                l'offre (voir ats_local.py) au lieu de la demander au modèle
+                (défaut : activé, sauf si CV_ATS_LOCAL vaut 0)
+            journal: Journal JSONL des appels (défaut : celui de la variable
+                d'environnement CV_METRIQUES_JOURNAL, voir metriques.py)
         """
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
-        if not self.api_key:
-            raise ValueError("Clé API Anthropic non trouvée. Vérifiez votre fichier .env")
+        self.backend = backend or creer_backend(self.api_key, base_url)
+        if isinstance(self.backend, BackendCassette):
+            # Chaque requête doit passer par la cassette : une réponse servie par le
+            # cache ne serait pas enregistrée, puis manquerait à la relecture
+            utiliser_cache = False
+        self.routage = {
+            etape: {**route, **(routage or {}).get(etape, {})}
+            for etape, route in ROUTAGE_ETAPES.items()
+        }
+        if escalade is None:
+            escalade = os.getenv("CV_ESCALADE", "").lower() in ("1", "true", "oui")
+        self.escalade = escalade
+        if couverture is None:
+            couverture = os.getenv("CV_COUVERTURE", "").lower() in ("1", "true", "oui")
+        self.couverture = couverture
+        if ameliorations_par_section is None:
+            ameliorations_par_section = os.getenv("CV_AMELIORATIONS_PAR_SECTION", "").lower() in ("1", "true", "oui")
+        self.ameliorations_par_section = ameliorations_par_section
+        if ats_local is None:
+            ats_local = os.getenv("CV_ATS_LOCAL", "1").lower() not in ("0", "false", "non")
+        self.ats_local = ats_local
+        self.cache = (cache or get_cache()) if utiliser_cache else None
+        self.metriques_relances = metriques_relances or get_metriques_relances()
+        self.stats_etapes = stats_etapes or get_stats_etapes()
+        self.coalescence = coalescence or get_coalescence()
+        self.journal = journal or get_journal_appels()
+    
+    def _construire_requete(
+        self,
+        prompt_systeme: str,
+        consigne: str,
+        cv_text: str,
+        niche: Optional[str],
+        offre: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Construit le prompt système et le message utilisateur d'une étape
+        
+        Le CV et l'offre sont placés en tête, à l'identique pour toutes les
+        étapes, avec des points d'arrêt de cache : seules la niche, le prompt
+        de l'étape et la consigne finale varient d'un appel à l'autre. Le
+        cache n'est effectif qu'au-delà de la taille minimale cacheable du
+        modèle (2048 tokens pour Haiku).
+        
+        Args:
+            prompt_systeme: Prompt statique de l'étape (voir prompts.py)
+            consigne: Consigne finale envoyée comme message utilisateur
+            cv_text: Texte du CV extrait
+            niche: Clé de la niche cible (None : étape indépendante de la niche)
+            offre: Texte de l'offre d'emploi (optionnel)
+            
+        Returns:
+            Tuple (blocs du prompt système, messages)
+        """
+        system = [
+            {"type": "text", "text": f"CV du candidat :\n\n{cv_text}", "cache_control": CACHE_EPHEMERE}
+        ]
+        
+        if offre:
+            system.append(
+                {"type": "text", "text": f"Offre d'emploi cible :\n\n{offre}", "cache_control": CACHE_EPHEMERE}
+            )
+        
+        system.append({
+            "type": "text",
+            "text": f"{prompts.get_niche_context(niche)}\n\n{prompt_systeme}" if niche else prompt_systeme,
+            "cache_control": CACHE_EPHEMERE
+        })
         
-        self.client = anthropic.Anthropic(api_key=self.api_key)
-        self.model = "claude-3-haiku-20240307"  # Claude 3 Haiku - Rapide et économique
+        return system, [{"role": "user", "content": consigne}]
+    
+    def _appeler_claude(
+        self,
+        etape: str,
+        prompt_systeme: str,
+        consigne: str,
+        cv_text: str,
+        niche: str,
+        offre: Optional[str],
+        on_texte: Optional[Callable[[str], None]] = None,
+        echeance: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Envoie la requête d'une étape à l'API Claude
+        
+        Le modèle, max_tokens et la température viennent de la table de
+        routage de l'étape. Le CV et l'offre sont d'abord réduits s'ils
+        dépassent le budget d'entrée de l'étape (voir budget_tokens.BUDGETS_ENTREE).
+        Si l'escalade est activée et que la réponse n'a pas la structure
+        attendue (STRUCTURES_VALIDES), l'étape est relancée sur le modèle
+        d'escalade ; cette seconde réponse n'est pas transmise à `on_texte`.
+        
+        Args:
+            etape: Nom de l'étape (routage, politique de relance et métriques)
+            on_texte: Callback appelé avec chaque fragment de texte reçu ; la
+                réponse est alors lue en streaming
+            echeance: Instant limite (time.monotonic) : chaque tentative est
+                bornée par le timeout de l'étape et par le temps restant
+        
+        Returns:
+            Dict contenant le texte de la réponse, le total des tokens, leur
+            détail, le modèle utilisé et le rapport de budget d'entrée
+        """
+        route = self.routage.get(etape, self.routage["analysis"])
+        # Entrées de l'étape avant réduction, transmises au backend (clé des cassettes)
+        contexte = {"etape": etape, "cv": cv_text, "offre": offre, "niche": niche}
+        cv_text, offre, budget = ajuster_entrees(etape, cv_text, offre)
+        system, messages = self._construire_requete(prompt_systeme, consigne, cv_text, niche, offre)
+        
+        reponse = self._envoyer_mesure(
+            etape, route["model"], route, system, messages, on_texte, echeance=echeance, contexte=contexte
+        )
+        
+        if self.escalade and route.get("escalade") and reponse["structure_valide"] is False:
+            reponse_escalade = self._envoyer_mesure(
+                etape, route["escalade"], route, system, messages, escalade=True, echeance=echeance, contexte=contexte
+            )
+            tokens = sommer_tokens([reponse, reponse_escalade])
+            reponse = {
+                **reponse_escalade,
+                "tokens_used": reponse["tokens_used"] + reponse_escalade["tokens_used"],
+                "tokens_detail": tokens,
+                "escalade": True
+            }
+        
+        reponse["budget_entree"] = budget
+        return reponse
+    
+    def _envoyer_mesure(
+        self,
+        etape: str,
+        modele: str,
+        route: Dict[str, Any],
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        on_texte: Optional[Callable[[str], None]] = None,
+        escalade: bool = False,
+        echeance: Optional[float] = None,
+        contexte: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Envoie une requête (voir _envoyer) et l'enregistre dans les
+        statistiques d'étapes (et le journal des appels s'il est configuré)
+        
+        La réponse est parsée et sa structure contrôlée une fois
+        (STRUCTURES_VALIDES) : la structure parsée est ajoutée sous "donnees",
+        le résultat du contrôle sous "structure_valide" (None pour une étape
+        sans contrôle) ; il sert à l'issue enregistrée et à la décision d'escalade.
+        """
+        with get_traceur().span(
+            f"llm.{etape}", **{"gen_ai.request.model": modele, "cv.escalade": escalade or None}
+        ) as span:
+            debut = time.perf_counter()
+            try:
+                reponse = self._envoyer(
+                    etape, modele, route, system, messages, on_texte, echeance=echeance, contexte=contexte
+                )
+            except Exception:
+                self._enregistrer_appel(
+                    etape, modele, {}, time.perf_counter() - debut, "erreur", "echec_appel", escalade
+                )
+                raise
+            duree = time.perf_counter() - debut
+            
+            reponse["structure_valide"] = None
+            if etape in STRUCTURES_VALIDES:
+                parser, controler = STRUCTURES_VALIDES[etape]
+                if parser:
+                    reponse["donnees"] = parser(reponse["texte"])
+                reponse["structure_valide"] = controler(reponse["donnees"] if parser else reponse["texte"])
+            source = "cache" if reponse.get("cache_hit") else "regroupe" if reponse.get("regroupe") else "api"
+            issue = {True: "ok", False: "structure_invalide", None: "non_verifie"}[reponse["structure_valide"]]
+            self._enregistrer_appel(etape, modele, reponse["tokens_detail"], duree, source, issue, escalade)
+            tokens = reponse["tokens_detail"]
+            span.definir("gen_ai.usage.input_tokens", tokens.get("input_tokens"))
+            span.definir("gen_ai.usage.output_tokens", tokens.get("output_tokens"))
+            span.definir("cv.cache_read_input_tokens", tokens.get("cache_read_input_tokens"))
+            span.definir("cv.source", source)
+            span.definir("cv.issue", issue)
+            return reponse
+    
+    def _enregistrer_appel(
+        self,
+        etape: str,
+        modele: str,
+        tokens_detail: Dict[str, int],
+        duree: float,
+        source: str,
+        issue: str,
+        escalade: bool
+    ):
+        """Enregistre un appel dans les statistiques d'étapes et le journal"""
+        self.stats_etapes.enregistrer(etape, modele, duree, tokens_detail, source=source, issue=issue, escalade=escalade)
+        if self.journal:
+            self.journal.ecrire(etape, modele, tokens_detail, duree, source=source, issue=issue)
+    
+    def _envoyer(
+        self,
+        etape: str,
+        modele: str,
+        route: Dict[str, Any],
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        on_texte: Optional[Callable[[str], None]] = None,
+        echeance: Optional[float] = None,
+        contexte: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Envoie une requête construite à un modèle
+        
+        Une réponse déjà obtenue pour une requête identique (même backend, CV,
+        niche, offre, prompt, modèle et paramètres) est servie depuis le cache sans
+        appel ni token consommé. Les erreurs transitoires (429, 529...) sont
+        relancées selon la politique de l'étape (POLITIQUES_RELANCE). Les
+        requêtes identiques simultanées partagent un seul appel (voir
+        coalescence.py) ; seule la première compte des tokens. Si la
+        couverture est activée, une requête dupliquée part quand l'appel
+        dépasse le p95 de latence de l'étape (voir _envoyer_couvert).
+        `contexte` (étape, CV, offre, niche) est transmis au backend.
+        """
+        cle = calculer_cle(
+            backend=self.backend.nom,
+            model=modele,
+            system=system,
+            messages=messages,
+            max_tokens=route["max_tokens"],
+            temperature=route["temperature"]
+        )
+        
+        if self.cache:
+            en_cache = self.cache.get(cle)
+            if en_cache:
+                if on_texte:
+                    on_texte(en_cache["texte"])
+                tokens = {nom: 0 for nom in en_cache["tokens_detail"]}
+                return {
+                    "texte": en_cache["texte"],
+                    "tokens_used": 0,
+                    "tokens_detail": tokens,
+                    "modele": modele,
+                    "cache_hit": True
+                }
+        
+        def appeler(on_fragment: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+            texte_recu = []
+            
+            def recevoir(fragment: str):
+                if echeance is not None and time.monotonic() > echeance:
+                    # Interrompt le flux : le contexte de streaming ferme la connexion
+                    raise DelaiDepasse(f"Délai de l'analyse dépassé pendant l'étape {etape}")
+                texte_recu.append(fragment)
+                on_fragment(fragment)
+            
+            def envoyer():
+                timeout = self._timeout_appel(etape, route, echeance)
+                seuil = self._seuil_couverture(etape, modele)
+                if seuil is not None and seuil < timeout:
+                    return self._envoyer_couvert(
+                        etape, modele, route, system, messages,
+                        recevoir if on_fragment else None, timeout, seuil, contexte
+                    )
+                return self.backend.envoyer(
+                    modele,
+                    system,
+                    messages,
+                    route["max_tokens"],
+                    route["temperature"],
+                    on_texte=recevoir if on_fragment else None,
+                    timeout=timeout,
+                    contexte=contexte
+                )
+            
+            try:
+                reponse = executer_avec_relances(
+                    envoyer,
+                    POLITIQUES_RELANCE.get(etape, POLITIQUE_RELANCE_DEFAUT),
+                    etape,
+                    self.metriques_relances,
+                    # Un flux déjà partiellement transmis ne peut pas être rejoué
+                    relancable=lambda e: not texte_recu and est_relancable(e),
+                    echeance=echeance
+                )
+            except (TimeoutError, anthropic.APITimeoutError):
+                self.stats_etapes.compter(etape, modele, "delais_depasses")
+                raise
+            
+            tokens = reponse["tokens_detail"]
+            
+            if self.cache:
+                self.cache.set(cle, {"texte": reponse["texte"], "tokens_detail": tokens})
+            
+            return {
+                "texte": reponse["texte"],
+                "tokens_used": sum(tokens.values()),
+                "tokens_detail": tokens,
+                "modele": modele,
+                "couverture": reponse.get("couverture", False)
+            }
+        
+        # Une requête identique déjà en cours (autre session, double clic) est attendue plutôt que renvoyée
+        reponse, regroupe = self.coalescence.executer(cle, appeler, on_texte, echeance=echeance)
+        if regroupe:
+            tokens = {nom: 0 for nom in reponse["tokens_detail"]}
+            return {**reponse, "tokens_used": 0, "tokens_detail": tokens, "regroupe": True}
+        return reponse
+    
+    @staticmethod
+    def _attente_restante(echeance: Optional[float]) -> Optional[float]:
+        """Temps d'attente des étapes avant de les abandonner (None : sans limite)"""
+        if echeance is None:
+            return None
+        return max(0.0, echeance - time.monotonic()) + MARGE_ECHEANCE
+    
+    def _timeout_appel(self, etape: str, route: Dict[str, Any], echeance: Optional[float]) -> float:
+        """Timeout d'une tentative : celui de l'étape, borné par le temps restant avant l'échéance"""
+        timeout = route.get("timeout") or TIMEOUT_DEFAUT
+        if echeance is not None:
+            restant = echeance - time.monotonic()
+            if restant <= 0:
+                raise DelaiDepasse(f"Délai de l'analyse dépassé avant l'étape {etape}")
+            timeout = min(timeout, restant)
+        return timeout
+    
+    def _seuil_couverture(self, etape: str, modele: str) -> Optional[float]:
+        """Latence au-delà de laquelle une requête de couverture est envoyée (None : pas de couverture)"""
+        if not self.couverture:
+            return None
+        return self.stats_etapes.latence(etape, 0.95, modele, min_echantillons=MIN_ECHANTILLONS_COUVERTURE)
+    
+    def _envoyer_couvert(
+        self,
+        etape: str,
+        modele: str,
+        route: Dict[str, Any],
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        on_texte: Optional[Callable[[str], None]],
+        timeout: float,
+        seuil: float,
+        contexte: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Envoie la requête puis, si elle n'a pas répondu après `seuil`
+        secondes (p95 de l'étape), un doublon sans streaming ; la première
+        réponse obtenue est retenue et le flux perdant est interrompu
+        
+        Le doublon est facturé : la couverture échange des tokens contre une
+        latence de queue bornée. La requête retenue est enregistrée comme tout
+        appel (_envoyer_mesure) ; l'usage de la perdante, réel si elle va à son
+        terme ou estimé si son flux est interrompu, est compté en coût de
+        couverture (StatsEtapes.enregistrer_couverture).
+        """
+        abandon = threading.Event()
+        fragments_recus = []
+        
+        def recevoir(fragment: str):
+            fragments_recus.append(fragment)
+            if abandon.is_set():
+                raise AppelAbandonne()
+            on_texte(fragment)
+        
+        def lancer(callback, delai):
+            return self.backend.envoyer(
+                modele, system, messages, route["max_tokens"], route["temperature"],
+                on_texte=callback, timeout=delai, contexte=contexte
+            )
+        
+        debut = time.monotonic()
+        principal = _executeur_couverture.submit(propager(lancer), recevoir if on_texte else None, timeout)
+        try:
+            return principal.result(timeout=seuil)
+        except FuturesTimeout:
+            pass
+        
+        self.stats_etapes.compter(etape, modele, "couvertures")
+        
+        def enregistrer_perdante(future):
+            self._enregistrer_perdante(etape, modele, system, messages, future, fragments_recus)
+        
+        couverture = _executeur_couverture.submit(propager(lancer), None, timeout - seuil)
+        en_attente = {principal, couverture}
+        erreur = None
+        while en_attente:
+            termines, en_attente = wait(
+                en_attente, timeout=max(0.0, timeout - (time.monotonic() - debut)), return_when=FIRST_COMPLETED
+            )
+            if not termines:
+                abandon.set()
+                for future in en_attente:
+                    future.add_done_callback(enregistrer_perdante)
+                raise TimeoutError(f"Aucune réponse pour l'étape {etape} après {timeout:.0f}s")
+            for future in termines:
+                if future.exception() is None:
+                    abandon.set()
+                    for perdante in en_attente:
+                        perdante.add_done_callback(enregistrer_perdante)
+                    if future is couverture:
+                        self.stats_etapes.compter(etape, modele, "couvertures_gagnantes")
+                        return {**future.result(), "couverture": True}
+                    return future.result()
+                erreur = future.exception()
+        raise erreur
+    
+    def _enregistrer_perdante(
+        self,
+        etape: str,
+        modele: str,
+        system: List[Dict[str, Any]],
+        messages: List[Dict[str, Any]],
+        future,
+        fragments_recus: List[str]
+    ):
+        """
+        Enregistre l'usage d'une requête de couverture non retenue, une fois terminée
+        
+        Une réponse complète apporte son usage réel. Un flux interrompu
+        (AppelAbandonne) a consommé toute son entrée et les fragments déjà
+        reçus : son usage est estimé localement. Une requête en erreur n'est
+        pas facturée.
+        """
+        erreur = future.exception()
+        if erreur is None:
+            tokens_detail, issue = future.result()["tokens_detail"], "perdante"
+        elif isinstance(erreur, AppelAbandonne):
+            entree = "".join(bloc["text"] for bloc in system) + "".join(
+                message["content"] if isinstance(message["content"], str)
+                else "".join(bloc.get("text", "") for bloc in message["content"])
+                for message in messages
+            )
+            tokens_detail = {
+                "input_tokens": estimer_tokens(entree),
+                "output_tokens": estimer_tokens("".join(fragments_recus))
+            }
+            issue = "interrompue"
+        else:
+            return
+        self.stats_etapes.enregistrer_couverture(etape, modele, tokens_detail)
+        if self.journal:
+            self.journal.ecrire(etape, modele, tokens_detail, 0.0, source="couverture", issue=issue)
+    
+    def _parseur_progressif(
+        self,
+        cle: str,
+        on_bloc: Optional[Callable[[str, Dict[str, Any]], None]]
+    ) -> Optional[ParseurIncremental]:
+        """Retourne le parser incrémental d'une étape si un callback de blocs est fourni"""
+        if not on_bloc:
+            return None
+        delimiteur, parse_bloc, parse_entete = BLOCS_PROGRESSIFS[cle]
+        return ParseurIncremental(delimiteur, parse_bloc, parse_entete, on_bloc)
     
     def analyser_cv(
         self, 
         cv_text: str, 
         niche: str, 
-        offre: Optional[str] = None
+        offre: Optional[str] = None,
+        on_bloc: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        echeance: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Analyse un CV et retourne un score + recommandations
@@ -309,44 +1303,41 @@ class ClaudeService:
             cv_text: Texte du CV extrait
             niche: Clé de la niche cible (ex: 'tech_dev')
             offre: Texte de l'offre d'emploi (optionnel)
+            on_bloc: Callback (type_bloc, donnees) appelé pendant le streaming
+                à chaque bloc complété (voir ParseurIncremental)
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
             
         Returns:
             Dict contenant le score et l'analyse détaillée
         """
         try:
-            # Contexte de la niche
-            niche_context = prompts.get_niche_context(niche)
-            
-            # Construction du message utilisateur
-            user_message = f"{niche_context}\n\n"
-            user_message += f"CV à analyser :\n\n{cv_text}\n\n"
-            
-            if offre:
-                user_message += f"Offre d'emploi cible :\n\n{offre}\n\n"
-            
-            user_message += "Fournis ton analyse au format JSON spécifié dans les instructions."
+            parseur = self._parseur_progressif("analysis", on_bloc)
             
             # Appel à l'API Claude
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                temperature=0.3,  # Température basse pour cohérence
-                system=prompts.ANALYSE_PROMPT,
-                messages=[
-                    {"role": "user", "content": user_message}
-                ]
+            reponse = self._appeler_claude(
+                "analysis",
+                prompts.ANALYSE_PROMPT,
+                "Fournis ton analyse au format JSON spécifié dans les instructions.",
+                cv_text, niche, offre,
+                on_texte=parseur.ajouter if parseur else None,
+                echeance=echeance
             )
+            if parseur:
+                parseur.terminer()
             
             # Extraction de la réponse
-            response_text = message.content[0].text
+            response_text = reponse["texte"]
             
-            # Parse le Markdown au lieu du JSON
-            analysis = parse_analyse_markdown(response_text)
+            # Markdown parsé lors du contrôle de structure (voir _envoyer_mesure)
+            analysis = reponse["donnees"]
             
             return {
                 "success": True,
                 "analysis": analysis,
-                "tokens_used": message.usage.input_tokens + message.usage.output_tokens
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
             }
         
         except json.JSONDecodeError as e:
@@ -365,7 +1356,8 @@ class ClaudeService:
         self, 
         cv_text: str, 
         niche: str, 
-        offre: Optional[str] = None
+        offre: Optional[str] = None,
+        echeance: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Réécrit un CV de manière optimisée
@@ -374,36 +1366,23 @@ class ClaudeService:
             cv_text: Texte du CV extrait
             niche: Clé de la niche cible
             offre: Texte de l'offre d'emploi (optionnel)
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
             
         Returns:
             Dict contenant le CV réécrit en Markdown
         """
         try:
-            # Contexte de la niche
-            niche_context = prompts.get_niche_context(niche)
-            
-            # Construction du message utilisateur
-            user_message = f"{niche_context}\n\n"
-            user_message += f"CV à réécrire :\n\n{cv_text}\n\n"
-            
-            if offre:
-                user_message += f"Offre d'emploi cible :\n\n{offre}\n\n"
-            
-            user_message += "Réécris ce CV au format Markdown spécifié dans les instructions."
-            
             # Appel à l'API Claude
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                temperature=0.7,  # Température plus élevée pour créativité
-                system=prompts.REECRITURE_PROMPT,
-                messages=[
-                    {"role": "user", "content": user_message}
-                ]
+            reponse = self._appeler_claude(
+                "reecriture",
+                prompts.REECRITURE_PROMPT,
+                "Réécris ce CV au format Markdown spécifié dans les instructions.",
+                cv_text, niche, offre,
+                echeance=echeance
             )
             
             # Extraction de la réponse
-            cv_markdown = message.content[0].text.strip()
+            cv_markdown = reponse["texte"].strip()
             
             # Nettoie les balises markdown si présentes
             if cv_markdown.startswith("```markdown"):
@@ -416,7 +1395,10 @@ class ClaudeService:
             return {
                 "success": True,
                 "cv_markdown": cv_markdown.strip(),
-                "tokens_used": message.usage.input_tokens + message.usage.output_tokens
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
             }
         
         except Exception as e:
@@ -429,7 +1411,8 @@ class ClaudeService:
         self, 
         cv_text: str, 
         niche: str, 
-        offre: Optional[str] = None
+        offre: Optional[str] = None,
+        echeance: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Génère des suggestions d'amélioration pour un CV
@@ -438,41 +1421,31 @@ class ClaudeService:
             cv_text: Texte du CV extrait
             niche: Clé de la niche cible
             offre: Texte de l'offre d'emploi (optionnel)
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
             
         Returns:
             Dict contenant les suggestions en Markdown
         """
         try:
-            # Contexte de la niche
-            niche_context = prompts.get_niche_context(niche)
-            
-            # Construction du message utilisateur
-            user_message = f"{niche_context}\n\n"
-            user_message += f"CV à améliorer :\n\n{cv_text}\n\n"
-            
-            if offre:
-                user_message += f"Offre d'emploi cible :\n\n{offre}\n\n"
-            
-            user_message += "Fournis des suggestions concrètes et actionnables au format Markdown."
-            
             # Appel à l'API Claude
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=3072,
-                temperature=0.5,
-                system=prompts.SUGGESTIONS_PROMPT,
-                messages=[
-                    {"role": "user", "content": user_message}
-                ]
+            reponse = self._appeler_claude(
+                "suggestions",
+                prompts.SUGGESTIONS_PROMPT,
+                "Fournis des suggestions concrètes et actionnables au format Markdown.",
+                cv_text, niche, offre,
+                echeance=echeance
             )
             
             # Extraction de la réponse
-            suggestions_markdown = message.content[0].text.strip()
+            suggestions_markdown = reponse["texte"].strip()
             
             return {
                 "success": True,
                 "suggestions": suggestions_markdown,
-                "tokens_used": message.usage.input_tokens + message.usage.output_tokens
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
             }
         
         except Exception as e:
@@ -485,47 +1458,62 @@ class ClaudeService:
         self,
         cv_text: str,
         niche: str,
-        offre: Optional[str] = None
+        offre: Optional[str] = None,
+        on_bloc: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        echeance: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Génère des améliorations section par section avec format avant/après
         
+        Si ameliorations_par_section est activé et que le CV compte au moins
+        deux sections reconnues (voir sections_cv), chaque section est
+        traitée par son propre appel (voir _ameliorations_par_section).
+        
         Args:
             cv_text: Texte du CV extrait
             niche: Clé de la niche cible
             offre: Texte de l'offre d'emploi (optionnel)
+            on_bloc: Callback (type_bloc, donnees) appelé pendant le streaming
+                à chaque bloc complété (voir ParseurIncremental)
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
             
         Returns:
             Dict contenant les améliorations par section
         """
+        if self.ameliorations_par_section:
+            sections = [
+                section for section in decouper_sections(cv_text)
+                if section["cle"] in SECTIONS_AMELIORABLES and len(section["texte"]) >= LONGUEUR_MIN_SECTION
+            ]
+            if len(sections) >= 2:
+                return self._ameliorations_par_section(sections, niche, offre, on_bloc, echeance)
+        
         try:
-            niche_context = prompts.get_niche_context(niche)
-            
-            user_message = f"{niche_context}\n\n"
-            user_message += f"CV à analyser :\n\n{cv_text}\n\n"
-            
-            if offre:
-                user_message += f"Offre d'emploi cible :\n\n{offre}\n\n"
-            
-            user_message += "Fournis les améliorations section par section au format JSON spécifié."
-            
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                temperature=0.1,  # Très bas pour JSON strict
-                system=prompts.AMELIORATIONS_SECTION_PROMPT,
-                messages=[{"role": "user", "content": user_message}]
+            parseur = self._parseur_progressif("ameliorations", on_bloc)
+            
+            reponse = self._appeler_claude(
+                "ameliorations",
+                prompts.AMELIORATIONS_SECTION_PROMPT,
+                "Fournis les améliorations section par section au format JSON spécifié.",
+                cv_text, niche, offre,
+                on_texte=parseur.ajouter if parseur else None,
+                echeance=echeance
             )
+            if parseur:
+                parseur.terminer()
             
-            response_text = message.content[0].text
+            response_text = reponse["texte"]
             
-            # Parse le Markdown au lieu du JSON
-            ameliorations = parse_ameliorations_markdown(response_text)
+            # Markdown parsé lors du contrôle de structure (voir _envoyer_mesure)
+            ameliorations = reponse["donnees"]
             
             return {
                 "success": True,
                 "ameliorations": ameliorations,
-                "tokens_used": message.usage.input_tokens + message.usage.output_tokens
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
             }
         
         except json.JSONDecodeError as e:
@@ -540,11 +1528,100 @@ class ClaudeService:
                 "error": f"Erreur lors de la génération des améliorations : {str(e)}"
             }
     
+    def _ameliorations_par_section(
+        self,
+        sections: List[Dict[str, Any]],
+        niche: str,
+        offre: Optional[str] = None,
+        on_bloc: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        echeance: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Génère les améliorations de chaque section du CV en parallèle
+        
+        Chaque section est envoyée seule : sa requête, donc sa clé dans le
+        cache des réponses, ne dépend que de son contenu (avec la niche et
+        l'offre). Quand une ligne du CV change, seule sa section est
+        recalculée ; les autres sont relues depuis le cache.
+        
+        Args:
+            sections: Sections à traiter (voir sections_cv.decouper_sections)
+            niche: Clé de la niche cible
+            offre: Texte de l'offre d'emploi (optionnel)
+            on_bloc: Callback (type_bloc, donnees), appelé depuis les threads des sections
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
+            
+        Returns:
+            Dict au format de generer_ameliorations_sections, avec le détail
+            de chaque section ("sections") et celles en échec
+        """
+        def generer(section: Dict[str, Any]) -> Dict[str, Any]:
+            parseur = self._parseur_progressif("ameliorations", on_bloc)
+            reponse = self._appeler_claude(
+                "ameliorations",
+                prompts.AMELIORATIONS_SECTION_PROMPT,
+                f"Le CV fourni se limite à sa section « {section['nom']} ». Fournis les améliorations "
+                "de cette section uniquement, au format spécifié.",
+                section["texte"], niche, offre,
+                on_texte=parseur.ajouter if parseur else None,
+                echeance=echeance
+            )
+            if parseur:
+                parseur.terminer()
+            return reponse
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_SECTIONS_SIMULTANEES, len(sections))) as executor:
+            futures = [executor.submit(propager(generer), section) for section in sections]
+        
+        ameliorations, reponses, details, erreurs = [], [], [], {}
+        for section, future in zip(sections, futures):
+            try:
+                reponse = future.result()
+            except Exception as e:
+                erreurs[section["cle"]] = str(e)
+                continue
+            trouvees = reponse["donnees"]["ameliorations"]
+            ameliorations += trouvees
+            reponses.append(reponse)
+            details.append({
+                "cle": section["cle"],
+                "nom": section["nom"],
+                "empreinte": section["empreinte"],
+                "ameliorations": len(trouvees),
+                "cache_hit": reponse.get("cache_hit", False)
+            })
+        
+        if not reponses:
+            return {
+                "success": False,
+                "error": "Erreur lors de la génération des améliorations : "
+                         + "; ".join(f"{cle} : {erreur}" for cle, erreur in erreurs.items())
+            }
+        
+        budgets = [reponse["budget_entree"] for reponse in reponses]
+        return {
+            "success": True,
+            "ameliorations": {"ameliorations": ameliorations},
+            "sections": details,
+            "sections_en_echec": erreurs,
+            "tokens_used": sum(reponse["tokens_used"] for reponse in reponses),
+            "tokens_detail": sommer_tokens(reponses),
+            "budget_entree": {
+                "budget": budgets[0]["budget"],
+                "tokens_estimes_avant": sum(budget["tokens_estimes_avant"] for budget in budgets),
+                "tokens_estimes_apres": sum(budget["tokens_estimes_apres"] for budget in budgets),
+                "reductions": [reduction for budget in budgets for reduction in budget["reductions"]]
+            },
+            "modele": ", ".join(sorted({reponse["modele"] for reponse in reponses}))
+        }
+    
     def generer_checklist_actions(
         self,
         cv_text: str,
         niche: str,
-        offre: Optional[str] = None
+        offre: Optional[str] = None,
+        on_bloc: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        echeance: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Génère une checklist d'actions priorisées
@@ -553,38 +1630,39 @@ class ClaudeService:
             cv_text: Texte du CV extrait
             niche: Clé de la niche cible
             offre: Texte de l'offre d'emploi (optionnel)
+            on_bloc: Callback (type_bloc, donnees) appelé pendant le streaming
+                à chaque bloc complété (voir ParseurIncremental)
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
             
         Returns:
             Dict contenant la checklist d'actions
         """
         try:
-            niche_context = prompts.get_niche_context(niche)
-            
-            user_message = f"{niche_context}\n\n"
-            user_message += f"CV à analyser :\n\n{cv_text}\n\n"
-            
-            if offre:
-                user_message += f"Offre d'emploi cible :\n\n{offre}\n\n"
-            
-            user_message += "Génère une checklist d'actions concrètes au format JSON."
-            
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=3072,
-                temperature=0.1,  # Très bas pour JSON strict
-                system=prompts.CHECKLIST_ACTIONS_PROMPT,
-                messages=[{"role": "user", "content": user_message}]
+            parseur = self._parseur_progressif("checklist", on_bloc)
+            
+            reponse = self._appeler_claude(
+                "checklist",
+                prompts.CHECKLIST_ACTIONS_PROMPT,
+                "Génère une checklist d'actions concrètes au format JSON.",
+                cv_text, niche, offre,
+                on_texte=parseur.ajouter if parseur else None,
+                echeance=echeance
             )
+            if parseur:
+                parseur.terminer()
             
-            response_text = message.content[0].text
+            response_text = reponse["texte"]
             
-            # Parse le Markdown au lieu du JSON
-            checklist = parse_checklist_markdown(response_text)
+            # Markdown parsé lors du contrôle de structure (voir _envoyer_mesure)
+            checklist = reponse["donnees"]
             
             return {
                 "success": True,
                 "checklist": checklist,
-                "tokens_used": message.usage.input_tokens + message.usage.output_tokens
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
             }
         
         except json.JSONDecodeError as e:
@@ -603,47 +1681,63 @@ class ClaudeService:
         self,
         cv_text: str,
         niche: str,
-        offre: Optional[str] = None
+        offre: Optional[str] = None,
+        echeance: Optional[float] = None
     ) -> Dict[str, Any]:
         """
         Analyse l'optimisation ATS du CV
         
+        Avec une offre, l'analyse porte sur ses mots-clés et la niche n'est pas
+        envoyée : changer de niche ne change pas la requête (voir DEPENDANCES_ETAPES).
+        Si ats_local est activé, la présence et les occurrences des mots-clés
+        de l'offre sont calculées localement (voir ats_local.py) et le modèle
+        ne fournit plus que le score, les recommandations et les points forts.
+        
         Args:
             cv_text: Texte du CV extrait
             niche: Clé de la niche cible
             offre: Texte de l'offre d'emploi (optionnel)
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
             
         Returns:
             Dict contenant l'analyse ATS
         """
         try:
-            niche_context = prompts.get_niche_context(niche)
-            
-            user_message = f"{niche_context}\n\n"
-            user_message += f"CV à analyser :\n\n{cv_text}\n\n"
-            
-            if offre:
-                user_message += f"Offre d'emploi cible :\n\n{offre}\n\n"
-            
-            user_message += "Analyse l'optimisation ATS au format JSON."
-            
-            message = self.client.messages.create(
-                model=self.model,
-                max_tokens=2048,
-                temperature=0.1,  # Très bas pour JSON strict
-                system=prompts.ANALYSE_ATS_PROMPT,
-                messages=[{"role": "user", "content": user_message}]
+            couverture = analyser_couverture(cv_text, offre) if offre and self.ats_local else None
+            if couverture and couverture["mots_cles_offre"]:
+                prompt_systeme = prompts.ANALYSE_ATS_QUALITATIF_PROMPT
+                consigne = (
+                    f"{formater_couverture(couverture)}\n\n"
+                    "Fournis le score ATS, les recommandations et les points forts au format spécifié."
+                )
+            else:
+                couverture = None
+                prompt_systeme = prompts.ANALYSE_ATS_PROMPT
+                consigne = "Analyse l'optimisation ATS au format JSON."
+            
+            reponse = self._appeler_claude(
+                "analyse_ats",
+                prompt_systeme,
+                consigne,
+                cv_text, niche if "niche" in entrees_etape("analyse_ats", offre) else None, offre,
+                echeance=echeance
             )
             
-            response_text = message.content[0].text
+            response_text = reponse["texte"]
             
-            # Parse le Markdown au lieu du JSON
-            analyse_ats = parse_ats_markdown(response_text)
+            # Markdown parsé lors du contrôle de structure (voir _envoyer_mesure)
+            analyse_ats = reponse["donnees"]
+            if couverture:
+                # Comptage déterministe plutôt que celui du modèle
+                analyse_ats.update(couverture)
             
             return {
                 "success": True,
                 "analyse_ats": analyse_ats,
-                "tokens_used": message.usage.input_tokens + message.usage.output_tokens
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
             }
         
         except json.JSONDecodeError as e:
@@ -658,11 +1752,260 @@ class ClaudeService:
                 "error": f"Erreur lors de l'analyse ATS : {str(e)}"
             }
     
+    def evaluer_niche(
+        self,
+        cv_text: str,
+        niche: str,
+        offre: Optional[str] = None,
+        echeance: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Note en quelques lignes l'adéquation du CV à une niche (voir balayer_niches)
+        
+        Args:
+            cv_text: Texte du CV extrait
+            niche: Clé de la niche évaluée
+            offre: Texte de l'offre d'emploi (optionnel)
+            echeance: Instant limite de l'évaluation (time.monotonic), voir executer_etapes
+            
+        Returns:
+            Dict contenant la note ("score_niche" : score, verdict, atouts, manques)
+        """
+        try:
+            reponse = self._appeler_claude(
+                "score_niche",
+                prompts.SCORE_NICHE_PROMPT,
+                "Fournis la note d'adéquation au format spécifié.",
+                cv_text, niche, offre,
+                echeance=echeance
+            )
+            return {
+                "success": True,
+                "score_niche": parse_score_niche_markdown(reponse["texte"]),
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Erreur lors de l'évaluation de la niche : {str(e)}"
+            }
+    
+    @trace("analyse.rapport")
+    def generer_rapport_complet(
+        self,
+        cv_text: str,
+        niche: str,
+        offre: Optional[str] = None,
+        on_section_terminee: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        echeance: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Génère analyse, améliorations, checklist et ATS en un seul appel
+        
+        Le CV n'est envoyé qu'une fois au lieu de quatre. La réponse est lue
+        en streaming et chaque section est parsée dès que le délimiteur de la
+        suivante arrive.
+        
+        Args:
+            cv_text: Texte du CV extrait
+            niche: Clé de la niche cible
+            offre: Texte de l'offre d'emploi (optionnel)
+            on_section_terminee: Callback (cle, donnees) appelé à chaque
+                section parsée (depuis le thread appelant)
+            echeance: Instant limite de l'analyse (time.monotonic), voir executer_etapes
+            
+        Returns:
+            Dict contenant les résultats des quatre sections (en cas d'échec,
+            "results" garde les sections reçues avant l'erreur)
+        """
+        # Sections déjà parsées, conservées même si la suite échoue
+        results = {}
+        try:
+            parseur = ParseurRapportComplet()
+            
+            def traiter(sections: List[Tuple[str, str]]):
+                for nom, texte in sections:
+                    if nom not in PARSEURS_RAPPORT:
+                        continue
+                    cle, parser = PARSEURS_RAPPORT[nom]
+                    results[cle] = parser(texte)
+                    if on_section_terminee:
+                        on_section_terminee(cle, results[cle])
+            
+            reponse = self._appeler_claude(
+                "rapport",
+                prompts.RAPPORT_COMPLET_PROMPT,
+                "Fournis le rapport complet avec ses quatre sections au format spécifié.",
+                cv_text, niche, offre,
+                on_texte=lambda fragment: traiter(parseur.ajouter(fragment)),
+                echeance=echeance
+            )
+            traiter(parseur.terminer())
+            
+            if reponse.get("escalade") or reponse.get("couverture"):
+                # Le flux reçu ne correspond pas à la réponse retenue (escalade ou couverture) : on la reparse
+                results.clear()
+                parseur = ParseurRapportComplet()
+                traiter(parseur.ajouter(reponse["texte"]) + parseur.terminer())
+            
+            if offre and self.ats_local and "analyse_ats" in results:
+                couverture = analyser_couverture(cv_text, offre)
+                if couverture["mots_cles_offre"]:
+                    results["analyse_ats"].update(couverture)
+            
+            manquantes = [nom for nom, (cle, _) in PARSEURS_RAPPORT.items() if cle not in results]
+            if manquantes:
+                return {
+                    "success": False,
+                    "error": f"Sections manquantes dans le rapport : {', '.join(manquantes)}",
+                    "raw_response": reponse["texte"],
+                    "results": results,
+                    "tokens_used": reponse["tokens_used"],
+                    "tokens_detail": reponse["tokens_detail"]
+                }
+            
+            return {
+                "success": True,
+                "results": results,
+                "tokens_used": reponse["tokens_used"],
+                "tokens_detail": reponse["tokens_detail"],
+                "budget_entree": reponse["budget_entree"],
+                "modele": reponse["modele"]
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "error": f"Erreur lors de la génération du rapport complet : {str(e)}",
+                "results": results
+            }
+    
+    @trace("analyse.etapes")
+    def executer_etapes(
+        self,
+        cv_text: str,
+        niche: str,
+        offre: Optional[str] = None,
+        etapes: Optional[List[str]] = None,
+        max_workers: int = 4,
+        on_etape_terminee: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        prechauffer_cache: bool = False,
+        on_bloc: Optional[Callable[[str, str, Dict[str, Any]], None]] = None,
+        echeance: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Lance les étapes d'analyse en parallèle dans un pool de threads borné
+        
+        Les étapes étant indépendantes, la durée totale est celle de l'étape
+        la plus lente au lieu de la somme des quatre appels. Des appels
+        simultanés ne peuvent pas profiter du cache de prompt : avec
+        prechauffer_cache, la première étape est lancée seule pour écrire le
+        préfixe CV/offre, puis les suivantes le relisent en parallèle.
+        
+        Args:
+            cv_text: Texte du CV extrait
+            niche: Clé de la niche cible
+            offre: Texte de l'offre d'emploi (optionnel)
+            etapes: Clés des étapes à lancer (défaut : toutes, voir ETAPES_ANALYSE)
+            max_workers: Nombre maximum d'appels simultanés
+            on_etape_terminee: Callback (cle, resultat) appelé dans le thread
+                appelant à chaque fin d'étape (utilisable depuis Streamlit)
+            prechauffer_cache: Lance la première étape seule avant les autres
+            on_bloc: Callback (cle, type_bloc, donnees) appelé dans le thread
+                appelant à chaque bloc reçu en streaming (critère, action,
+                amélioration), pour un affichage progressif
+            echeance: Instant limite de l'analyse (time.monotonic), transmis à
+                chaque appel ; une étape encore en cours à l'échéance est
+                rendue en échec sans être attendue
+            
+        Returns:
+            Dict contenant le résultat de chaque étape (avec sa "duree" en
+            secondes) et la durée totale
+        """
+        etapes = etapes or list(ETAPES_ANALYSE.keys())
+        resultats = {}
+        evenements = queue.Queue()
+        debut = time.perf_counter()
+        
+        def lancer(cle: str):
+            debut_etape = time.perf_counter()
+            methode = getattr(self, ETAPES_ANALYSE[cle])
+            options = {"echeance": echeance}
+            if on_bloc and cle in BLOCS_PROGRESSIFS:
+                options["on_bloc"] = lambda type_bloc, donnees: evenements.put(("bloc", cle, (type_bloc, donnees)))
+            with get_traceur().span(f"etape.{cle}") as span:
+                try:
+                    resultat = methode(cv_text, niche, offre, **options)
+                except Exception as e:
+                    resultat = {"success": False, "error": f"Erreur lors de l'étape {cle} : {str(e)}"}
+                if not resultat.get("success", True):
+                    span.en_erreur(resultat.get("error", ""))
+            resultat["duree"] = time.perf_counter() - debut_etape
+            evenements.put(("fin", cle, resultat))
+        
+        def attendre(nombre: int, lancees: List[str]):
+            # Les callbacks sont appelés ici, dans le thread appelant
+            while nombre:
+                try:
+                    type_evenement, cle, donnees = evenements.get(timeout=self._attente_restante(echeance))
+                except queue.Empty:
+                    # Échéance dépassée : les étapes encore en cours sont abandonnées
+                    for cle in lancees:
+                        if cle not in resultats:
+                            resultats[cle] = {
+                                "success": False,
+                                "error": f"Délai de l'analyse dépassé pendant l'étape {cle}",
+                                "duree": time.perf_counter() - debut
+                            }
+                            if on_etape_terminee:
+                                on_etape_terminee(cle, resultats[cle])
+                    return
+                if cle in resultats:
+                    continue
+                if type_evenement == "bloc":
+                    on_bloc(cle, *donnees)
+                    continue
+                resultats[cle] = donnees
+                nombre -= 1
+                if on_etape_terminee:
+                    on_etape_terminee(cle, donnees)
+        
+        a_lancer = list(etapes)
+        executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(a_lancer))))
+        try:
+            if prechauffer_cache and len(a_lancer) > 1:
+                premiere = a_lancer.pop(0)
+                executor.submit(propager(lancer), premiere)
+                attendre(1, [premiere])
+            for cle in a_lancer:
+                executor.submit(propager(lancer), cle)
+            attendre(len(a_lancer), a_lancer)
+        finally:
+            # Sans attendre un appel bloqué au-delà de l'échéance
+            executor.shutdown(wait=False)
+        
+        return {
+            # Ordre des étapes conservé quel que soit l'ordre de fin
+            "etapes": {cle: resultats[cle] for cle in etapes},
+            "duree_totale": time.perf_counter() - debut
+        }
+    
     def optimiser_cv_complet(
         self, 
         cv_text: str, 
         niche: str, 
-        offre: Optional[str] = None
+        offre: Optional[str] = None,
+        parallele: bool = True,
+        prechauffer_cache: bool = False,
+        mode: str = "etapes",
+        delai_max: Optional[float] = None,
+        resultats_existants: Optional[Dict[str, Any]] = None,
+        on_etape_terminee: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        on_bloc: Optional[Callable[[str, str, Dict[str, Any]], None]] = None,
+        on_section_terminee: Optional[Callable[[str, Dict[str, Any]], None]] = None
     ) -> Dict[str, Any]:
         """
         Effectue l'optimisation complète : analyse + améliorations + checklist + ATS
@@ -671,46 +2014,288 @@ class ClaudeService:
             cv_text: Texte du CV extrait
             niche: Clé de la niche cible
             offre: Texte de l'offre d'emploi (optionnel)
+            parallele: Lance les quatre étapes simultanément (sinon l'une après l'autre)
+            prechauffer_cache: En mode parallèle, lance d'abord une étape seule
+                pour que les suivantes lisent le préfixe CV/offre depuis le cache
+            mode: "etapes" (un appel par étape) ou "rapport_unique" (un seul
+                appel, voir generer_rapport_complet)
+            delai_max: Durée maximale de l'analyse en secondes (None : sans limite)
+            resultats_existants: Résultats d'étapes déjà obtenus (reprise après
+                échec) : seules les étapes manquantes sont relancées, une par appel
+            on_etape_terminee: Callback (cle, resultat) à chaque fin d'étape
+                (mode "etapes", voir executer_etapes)
+            on_bloc: Callback (cle, type_bloc, donnees) à chaque bloc reçu en
+                streaming (mode "etapes" en parallèle, voir executer_etapes)
+            on_section_terminee: Callback (cle, donnees) à chaque section
+                parsée (mode "rapport_unique", voir generer_rapport_complet)
             
         Returns:
-            Dict contenant toutes les informations
+            Dict contenant toutes les informations, le détail des tokens
+            (dont lecture/écriture du cache), les réductions d'entrée et la
+            durée de chaque étape. En cas d'échec, "results" contient les
+            étapes réussies et "etapes_en_echec" celles à relancer.
+            "empreintes" donne l'empreinte des entrées de chaque étape (voir reanalyser).
         """
-        results = {}
+        echeance = time.monotonic() + delai_max if delai_max else None
+        resultats_existants = dict(resultats_existants or {})
         
-        # 1. Analyse globale
-        analysis_result = self.analyser_cv(cv_text, niche, offre)
-        if not analysis_result["success"]:
-            return analysis_result
-        results["analysis"] = analysis_result["analysis"]
-        
-        # 2. Améliorations section par section
-        ameliorations_result = self.generer_ameliorations_sections(cv_text, niche, offre)
-        if not ameliorations_result["success"]:
-            return ameliorations_result
-        results["ameliorations"] = ameliorations_result["ameliorations"]
-        
-        # 3. Checklist d'actions
-        checklist_result = self.generer_checklist_actions(cv_text, niche, offre)
-        if not checklist_result["success"]:
-            return checklist_result
-        results["checklist"] = checklist_result["checklist"]
-        
-        # 4. Analyse ATS
-        ats_result = self.analyser_ats(cv_text, niche, offre)
-        if not ats_result["success"]:
-            return ats_result
-        results["analyse_ats"] = ats_result["analyse_ats"]
-        
-        # Calcul des tokens totaux
-        total_tokens = (
-            analysis_result.get("tokens_used", 0) +
-            ameliorations_result.get("tokens_used", 0) +
-            checklist_result.get("tokens_used", 0) +
-            ats_result.get("tokens_used", 0)
-        )
+        if mode == "rapport_unique" and not resultats_existants:
+            debut = time.perf_counter()
+            rapport = self.generer_rapport_complet(
+                cv_text, niche, offre, on_section_terminee=on_section_terminee, echeance=echeance
+            )
+            duree = time.perf_counter() - debut
+            if not rapport["success"]:
+                results = rapport.get("results", {})
+                return {
+                    **rapport,
+                    "results": results,
+                    "empreintes": {cle: empreinte_entrees(cle, cv_text, niche, offre) for cle in results},
+                    "etapes_en_echec": [cle for cle in ETAPES_ANALYSE if cle not in results],
+                    "total_tokens": rapport.get("tokens_used", 0),
+                    "tokens_detail": sommer_tokens([rapport]),
+                    "budgets_entree": {},
+                    "durees": {"rapport": duree},
+                    "duree_totale": duree
+                }
+            return {
+                "success": True,
+                "results": rapport["results"],
+                "empreintes": {cle: empreinte_entrees(cle, cv_text, niche, offre) for cle in rapport["results"]},
+                "total_tokens": rapport["tokens_used"],
+                "tokens_detail": rapport["tokens_detail"],
+                "budgets_entree": {"rapport": rapport["budget_entree"]},
+                "durees": {"rapport": duree},
+                "duree_totale": duree
+            }
+        
+        a_lancer = [cle for cle in ETAPES_ANALYSE if cle not in resultats_existants]
+        if not a_lancer:
+            execution = {"etapes": {}, "duree_totale": 0.0}
+        elif parallele:
+            execution = self.executer_etapes(
+                cv_text, niche, offre,
+                etapes=a_lancer,
+                on_etape_terminee=on_etape_terminee,
+                prechauffer_cache=prechauffer_cache,
+                on_bloc=on_bloc,
+                echeance=echeance
+            )
+        else:
+            debut = time.perf_counter()
+            etapes = {}
+            for cle in a_lancer:
+                debut_etape = time.perf_counter()
+                etapes[cle] = getattr(self, ETAPES_ANALYSE[cle])(cv_text, niche, offre, echeance=echeance)
+                etapes[cle]["duree"] = time.perf_counter() - debut_etape
+                if on_etape_terminee:
+                    on_etape_terminee(cle, etapes[cle])
+            execution = {"etapes": etapes, "duree_totale": time.perf_counter() - debut}
+        
+        # Les étapes réussies sont conservées même si d'autres ont échoué
+        results = dict(resultats_existants)
+        echecs = {}
+        for cle, resultat in execution["etapes"].items():
+            if resultat["success"]:
+                results[cle] = resultat[cle]
+            else:
+                echecs[cle] = resultat
+        
+        bilan = {
+            "results": results,
+            "empreintes": {cle: empreinte_entrees(cle, cv_text, niche, offre) for cle in results},
+            "total_tokens": sum(resultat.get("tokens_used", 0) for resultat in execution["etapes"].values()),
+            "tokens_detail": sommer_tokens(execution["etapes"].values()),
+            "budgets_entree": {
+                cle: resultat["budget_entree"]
+                for cle, resultat in execution["etapes"].items() if "budget_entree" in resultat
+            },
+            "durees": {cle: resultat["duree"] for cle, resultat in execution["etapes"].items()},
+            "duree_totale": execution["duree_totale"]
+        }
         
+        if echecs:
+            # Première étape en échec (dans l'ordre du pipeline)
+            premier_echec = next(iter(echecs.values()))
+            return {
+                **bilan,
+                "success": False,
+                "error": premier_echec.get("error", "Erreur inconnue"),
+                "raw_response": premier_echec.get("raw_response"),
+                "etapes_en_echec": list(echecs),
+                "erreurs": {cle: resultat.get("error", "Erreur inconnue") for cle, resultat in echecs.items()}
+            }
+        
+        return {**bilan, "success": True}
+    
+    def reanalyser(
+        self,
+        cv_text: str,
+        niche: str,
+        offre: Optional[str] = None,
+        precedent: Optional[Dict[str, Any]] = None,
+        **options
+    ) -> Dict[str, Any]:
+        """
+        Relance l'analyse complète en ne recalculant que les étapes dont les entrées ont changé
+        
+        Typiquement, une nouvelle offre pour le même CV : toutes les étapes
+        dépendent de l'offre, mais un changement de niche seul conserve
+        l'analyse ATS (voir DEPENDANCES_ETAPES).
+        
+        Args:
+            cv_text: Texte du CV extrait
+            niche: Clé de la niche cible
+            offre: Texte de l'offre d'emploi (optionnel)
+            precedent: Résultat d'un précédent optimiser_cv_complet ou
+                reanalyser ("results" et "empreintes")
+            **options: Options transmises à optimiser_cv_complet (parallele,
+                mode, delai_max, callbacks d'affichage...)
+            
+        Returns:
+            Dict comme optimiser_cv_complet, avec la liste des "etapes_reutilisees"
+        """
+        reutilisables = etapes_reutilisables(cv_text, niche, offre, precedent)
+        resultat = self.optimiser_cv_complet(cv_text, niche, offre, resultats_existants=reutilisables, **options)
+        resultat["etapes_reutilisees"] = list(reutilisables)
+        return resultat
+    
+    @trace("analyse.niches")
+    def balayer_niches(
+        self,
+        cv_text: str,
+        offre: Optional[str] = None,
+        niches: Optional[List[str]] = None,
+        delai_max: Optional[float] = None,
+        on_niche: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Évalue le CV pour toutes les niches, pour aider à choisir la niche cible
+        
+        Seul le contexte de niche (dernier bloc du prompt système) change d'une
+        requête à l'autre : le CV et l'offre, en tête avec un cache_control,
+        forment un préfixe commun. La première niche est évaluée seule pour
+        écrire ce préfixe en cache, les autres partent ensuite en parallèle et
+        le relisent ; chacune ne coûte que sa note courte (voir ROUTAGE_ETAPES).
+        
+        Args:
+            cv_text: Texte du CV extrait
+            offre: Texte de l'offre d'emploi (optionnel)
+            niches: Clés des niches à évaluer (défaut : toutes, voir prompts.NICHES)
+            delai_max: Durée maximale du balayage (secondes)
+            on_niche: Callback (niche, ligne) appelé dès qu'une niche est évaluée
+            
+        Returns:
+            Dict {"success", "niches", "tokens_used", "tokens_detail", "cout"} ;
+            "niches" est trié par score décroissant, chaque ligne ayant "niche",
+            "nom", "score" (None en cas d'échec), "verdict", "atouts", "manques",
+            "score_local" (score provisoire, sans appel) et "error"
+        """
+        niches = list(niches or prompts.NICHES)
+        if not niches:
+            return {"success": False, "error": "Aucune niche à évaluer"}
+        echeance = time.monotonic() + delai_max if delai_max else None
+        
+        def evaluer(niche: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+            resultat = self.evaluer_niche(cv_text, niche, offre, echeance=echeance)
+            note = resultat.get("score_niche", {})
+            ligne = {
+                "niche": niche,
+                "nom": prompts.NICHES.get(niche, {}).get("nom", niche),
+                "score": note.get("score") if resultat["success"] else None,
+                "verdict": note.get("verdict", ""),
+                "atouts": note.get("atouts", []),
+                "manques": note.get("manques", []),
+                "score_local": score_provisoire(cv_text, niche, offre)["score"],
+                "error": resultat.get("error")
+            }
+            if on_niche:
+                on_niche(niche, ligne)
+            return ligne, resultat
+        
+        # La première niche seule met le préfixe (CV, offre) en cache pour les suivantes
+        evaluations = [evaluer(niches[0])]
+        if len(niches) > 1:
+            with ThreadPoolExecutor(max_workers=min(MAX_NICHES_SIMULTANEES, len(niches) - 1)) as executor:
+                evaluations += list(executor.map(propager(evaluer), niches[1:]))
+        
+        lignes = [ligne for ligne, _ in evaluations]
+        resultats = [resultat for _, resultat in evaluations]
+        reussis = [resultat for resultat in resultats if resultat["success"]]
+        lignes.sort(key=lambda ligne: (ligne["score"] is None, -(ligne["score"] or 0), -ligne["score_local"]))
+        
+        bilan = {
+            "success": bool(reussis),
+            "niches": lignes,
+            "tokens_used": sum(resultat.get("tokens_used", 0) for resultat in resultats),
+            "tokens_detail": sommer_tokens(resultats),
+            "cout": sum(calculer_cout(resultat["modele"], resultat["tokens_detail"]) for resultat in reussis)
+        }
+        if not reussis:
+            bilan["error"] = resultats[0].get("error", "Aucune niche évaluée")
+        return bilan
+    
+    @trace("analyse.offres")
+    def comparer_offres(
+        self,
+        cv_text: str,
+        niche: str,
+        offres: List[str],
+        top_k: int = OFFRES_AFFINEES,
+        delai_max: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Classe plusieurs offres pour un même CV
+        
+        Toutes les offres sont notées localement en un passage (score
+        provisoire matriciel et couverture des mots-clés, sans appel) ; seules
+        les top_k premières passent par analyser_ats. Le CV ouvre la requête
+        et porte un cache_control : le premier appel écrit le préfixe en
+        cache, les suivants, lancés ensuite en parallèle, le relisent.
+        
+        Args:
+            cv_text: Texte du CV extrait
+            niche: Clé de la niche cible
+            offres: Textes des offres d'emploi
+            top_k: Nombre d'offres analysées par le modèle (0 : classement local seul)
+            delai_max: Durée maximale de la comparaison (secondes)
+            
+        Returns:
+            Dict {"success", "offres", "tokens_used", "tokens_detail"} ;
+            "offres" est trié (offres analysées d'abord, par score ATS) et
+            chaque offre a "indice" (position dans offres), "score_local",
+            "taux_couverture", "mots_cles_absents", "analyse_ats" (ou None)
+            et "error"
+        """
+        if not offres:
+            return {"success": False, "error": "Aucune offre à comparer"}
+        echeance = time.monotonic() + delai_max if delai_max else None
+        
+        ordre = classer_offres_localement(cv_text, niche, offres)
+        retenues = ordre[:top_k]
+        
+        def affiner(ligne: Dict[str, Any]) -> Dict[str, Any]:
+            resultat = self.analyser_ats(cv_text, niche, offres[ligne["indice"]], echeance=echeance)
+            if resultat["success"]:
+                ligne["analyse_ats"] = resultat["analyse_ats"]
+            else:
+                ligne["error"] = resultat["error"]
+            return resultat
+        
+        resultats = []
+        if retenues:
+            # Le premier appel seul met le préfixe (CV) en cache pour les suivants
+            resultats.append(affiner(retenues[0]))
+            with ThreadPoolExecutor(max_workers=max(1, min(MAX_OFFRES_SIMULTANEES, len(retenues) - 1))) as executor:
+                resultats += list(executor.map(propager(affiner), retenues[1:]))
+        
+        classement = sorted(
+            ordre,
+            key=lambda ligne: (0, -ligne["analyse_ats"].get("score_ats", 0)) if ligne["analyse_ats"] else (1, 0)
+        )
         return {
             "success": True,
-            "results": results,
-            "total_tokens": total_tokens
+            "offres": classement,
+            "tokens_used": sum(resultat.get("tokens_used", 0) for resultat in resultats),
+            "tokens_detail": sommer_tokens(resultats)
         }
@@ -0,0 +1,130 @@
+"""
+Regroupement des requêtes identiques en cours ("single-flight")
+
+Quand plusieurs sessions envoient la même requête au même moment (double
+clic, deux onglets sur le même CV), un seul appel part vers l'API ; les
+autres attendent son résultat et reçoivent ses fragments au fil de l'eau.
+"""
+
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, Tuple
+
+
+class _AppelEnCours:
+    """Appel partagé : fragments reçus, résultat ou erreur finale"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.fragments = []
+        self.termine = False
+        self.resultat = None
+        self.erreur = None
+
+
+class CoalescenceAppels:
+    """Table des appels en cours, indexée par l'empreinte de la requête (partagée entre threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_cours = {}
+        self.compteurs = {"appels": 0, "regroupes": 0}
+
+    def executer(
+        self,
+        cle: str,
+        fonction: Callable[[Optional[Callable[[str], None]]], Dict[str, Any]],
+        on_texte: Optional[Callable[[str], None]] = None,
+        echeance: Optional[float] = None
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Exécute `fonction` une seule fois pour toutes les requêtes simultanées de même clé
+
+        Args:
+            cle: Empreinte de la requête
+            fonction: Appel réel ; reçoit le callback de fragments à utiliser
+                (None si l'appel n'est pas lu en streaming)
+            on_texte: Callback de fragments de l'appelant
+            echeance: Instant limite (time.monotonic) d'attente d'un suiveur
+
+        Returns:
+            Tuple (résultat, regroupe) ; regroupe vaut True si le résultat
+            vient de l'appel d'une autre requête
+
+        Raises:
+            L'erreur de l'appel partagé, pour le meneur comme pour les suiveurs ;
+            TimeoutError si un suiveur atteint son échéance avant la fin de l'appel
+        """
+        with self._lock:
+            appel = self._en_cours.get(cle)
+            meneur = appel is None
+            if meneur:
+                appel = self._en_cours[cle] = _AppelEnCours()
+                self.compteurs["appels"] += 1
+            else:
+                self.compteurs["regroupes"] += 1
+
+        if meneur:
+            return self._mener(cle, appel, fonction, on_texte), False
+        return self._suivre(appel, on_texte, echeance), True
+
+    def _mener(self, cle, appel: _AppelEnCours, fonction, on_texte) -> Dict[str, Any]:
+        def diffuser(fragment: str):
+            with appel.condition:
+                appel.fragments.append(fragment)
+                appel.condition.notify_all()
+            on_texte(fragment)
+
+        try:
+            appel.resultat = fonction(diffuser if on_texte else None)
+            return appel.resultat
+        except Exception as e:
+            appel.erreur = e
+            raise
+        finally:
+            with self._lock:
+                del self._en_cours[cle]
+            with appel.condition:
+                appel.termine = True
+                appel.condition.notify_all()
+
+    def _suivre(self, appel: _AppelEnCours, on_texte, echeance: Optional[float]) -> Dict[str, Any]:
+        lus = 0
+        while True:
+            with appel.condition:
+                restant = None if echeance is None else max(0.0, echeance - time.monotonic())
+                if not appel.condition.wait_for(lambda: appel.termine or len(appel.fragments) > lus, restant):
+                    raise TimeoutError("Délai dépassé en attendant une requête identique en cours")
+                nouveaux = appel.fragments[lus:]
+                termine = appel.termine
+            lus += len(nouveaux)
+            # Callbacks appelés hors du verrou pour ne pas ralentir le meneur
+            if on_texte:
+                for fragment in nouveaux:
+                    on_texte(fragment)
+            if termine:
+                break
+
+        if appel.erreur is not None:
+            raise appel.erreur
+        if on_texte and not lus:
+            # Le meneur n'était pas en streaming : texte transmis d'un bloc
+            on_texte(appel.resultat["texte"])
+        return appel.resultat
+
+    def stats(self) -> Dict[str, Any]:
+        """Retourne les compteurs et le nombre d'appels en cours"""
+        with self._lock:
+            stats = dict(self.compteurs)
+            stats["en_cours"] = len(self._en_cours)
+        total = stats["appels"] + stats["regroupes"]
+        stats["taux_regroupement"] = stats["regroupes"] / total if total else 0.0
+        return stats
+
+
+_coalescence_globale = CoalescenceAppels()
+
+
+def get_coalescence() -> CoalescenceAppels:
+    """Retourne la table des appels en cours partagée par toutes les sessions du processus"""
+    return _coalescence_globale
@@ -0,0 +1,467 @@
+"""
+Lexiques de mots-clés par niche, compilés au démarrage en automates
+
+Chaque niche de prompts.NICHES a son lexique : un terme canonique et ses
+équivalents stricts (synonymes, traductions, variantes d'écriture,
+abréviations comme ML pour Machine Learning). Un outil ou un terme plus
+précis n'est jamais un équivalent : Django, AWS ou PostgreSQL sont des
+termes à part entière, qui ne couvrent ni Python, ni Cloud, ni SQL. Les formes sont normalisées par normaliser_lexique
+(accents, casse, césures du texte extrait, racinisation légère des
+pluriels et suffixes courants) ; les acronymes et formes courtes (IA, REST,
+SQL) sont reconnus tels quels, à la casse près et sans racinisation, pour
+ne pas se confondre avec des mots courants ("j'ai", "le reste"). Les
+formes sont compilées une seule fois, à l'import,
+en automates d'Aho-Corasick (voir ats_local.AutomateAhoCorasick). Le
+couplage avec l'offre (ats_local) et le score provisoire (score_local)
+interrogent ces index en un passage sur le texte.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Optional, Dict, List, Iterable, Set
+
+from ats_local import AutomateAhoCorasick, normaliser_texte, VOCABULAIRE_ATS
+
+# Compétences communes à toutes les niches : canonique -> équivalents stricts
+LEXIQUE_COMMUN = {
+    "Gestion de projet": ["gestion de projets", "pilotage de projet", "project management"],
+    "Travail en équipe": ["travail d'équipe", "teamwork"],
+    "Communication": [],
+    "Anglais": ["english"],
+    "Autonomie": ["autonome"],
+    "Leadership": [],
+    "Management d'équipe": ["management d'équipes", "team management", "encadrement d'équipe"],
+    "Agile": ["méthodes agiles", "méthodologies agiles", "méthodologie agile", "agilité"],
+    "Scrum": [],
+    "Kanban": [],
+    "Excel": ["Microsoft Excel", "MS Excel"],
+}
+
+# Lexique propre à chaque niche (clés de prompts.NICHES)
+LEXIQUES_NICHES = {
+    "alternance": {
+        "Alternance": ["alternant", "alternante", "work-study"],
+        "Apprentissage": ["apprenti", "apprentie", "contrat d'apprentissage"],
+        "Contrat de professionnalisation": ["contrat pro"],
+        "Stage": ["stagiaire", "internship"],
+        "Projets académiques": ["projet académique", "projets universitaires", "projet universitaire"],
+        "PFE": ["projet de fin d'études"],
+        "Diplôme": ["diplômé", "diplômée"],
+        "Master": [],
+        "Licence": [],
+        "BTS": [],
+        "DUT": [],
+        "École d'ingénieur": ["école d'ingénieurs"],
+        "École de commerce": ["business school"],
+        "Motivation": ["motivé", "motivée"],
+        "Curiosité": ["curieux", "curieuse"],
+        "Associatif": ["vie associative", "association étudiante", "associations étudiantes"],
+        "Bénévolat": ["bénévole"],
+        "BDE": ["bureau des élèves"],
+        "Adaptabilité": ["capacité d'adaptation", "adaptable"],
+        "Polyvalence": ["polyvalent", "polyvalente"],
+    },
+    "tech_dev": {
+        "Python": [],
+        "Django": [],
+        "Flask": [],
+        "FastAPI": [],
+        "JavaScript": ["JS", "ECMAScript"],
+        "TypeScript": ["TS"],
+        "React": ["React.js", "ReactJS"],
+        "Node.js": ["NodeJS"],
+        "Express.js": ["ExpressJS"],
+        "Java": [],
+        "Jakarta EE": ["J2EE", "Java EE"],
+        "Spring Boot": [],
+        "Docker": [],
+        "Conteneurisation": ["conteneurs", "containers", "containerisation"],
+        "Kubernetes": ["K8s"],
+        "CI/CD": [
+            "intégration continue", "déploiement continu", "livraison continue",
+            "continuous integration", "continuous delivery", "continuous deployment"
+        ],
+        "GitHub Actions": [],
+        "GitLab CI": [],
+        "Jenkins": [],
+        "Git": [],
+        "GitHub": [],
+        "GitLab": [],
+        "Bitbucket": [],
+        "Cloud": ["cloud computing"],
+        "AWS": ["Amazon Web Services"],
+        "Azure": ["Microsoft Azure"],
+        "GCP": ["Google Cloud", "Google Cloud Platform"],
+        "API REST": ["REST API", "API RESTful", "RESTful API", "REST", "RESTful"],
+        "Tests": ["testing"],
+        "Tests unitaires": ["test unitaire", "unit tests", "unit testing"],
+        "Tests automatisés": ["automated testing", "tests automatiques"],
+        "TDD": ["test-driven development", "développement piloté par les tests"],
+        "Bases de données": ["base de données", "databases", "database", "SGBD"],
+        "SQL": [],
+        "PostgreSQL": ["Postgres"],
+        "MySQL": [],
+        "NoSQL": [],
+        "MongoDB": ["Mongo"],
+        "Développement web": ["développeur web", "web development", "web developer"],
+        "Front-end": ["frontend", "front end"],
+        "Back-end": ["backend", "back end"],
+        "Full-stack": ["fullstack", "full stack"],
+        "Certifications": ["certification", "certifié", "certifiée"],
+    },
+    "data_ai": {
+        "Machine Learning": ["ML", "apprentissage automatique"],
+        "Deep Learning": ["DL", "apprentissage profond"],
+        "Réseaux de neurones": ["réseau de neurones", "neural networks", "neural network"],
+        "Intelligence artificielle": ["IA", "AI", "artificial intelligence"],
+        "Traitement du langage": [
+            "NLP", "TAL", "natural language processing",
+            "traitement automatique du langage", "traitement automatique des langues"
+        ],
+        "LLM": ["large language models", "large language model", "grands modèles de langage"],
+        "Data Science": ["data scientist", "science des données"],
+        "Data Engineering": ["data engineer", "ingénieur données", "ingénierie des données"],
+        "Pipelines de données": ["pipeline de données", "data pipelines", "data pipeline"],
+        "ETL": ["extract transform load"],
+        "ELT": [],
+        "Python": [],
+        "Pandas": [],
+        "NumPy": [],
+        "TensorFlow": [],
+        "PyTorch": [],
+        "Keras": [],
+        "scikit-learn": ["sklearn", "scikit learn"],
+        "Big Data": ["données massives", "mégadonnées"],
+        "Spark": ["Apache Spark"],
+        "Hadoop": ["Apache Hadoop"],
+        "Databricks": [],
+        "Visualisation de données": ["dataviz", "data visualisation", "data visualization"],
+        "Power BI": ["PowerBI"],
+        "Statistiques": ["statistics", "statistique"],
+        "Économétrie": ["econometrics"],
+        "SQL": [],
+        "BigQuery": ["Google BigQuery"],
+        "Snowflake": [],
+        "MLOps": ["ML Ops"],
+        "MLflow": [],
+        "Kubeflow": [],
+        "Publications": ["publication scientifique", "article scientifique"],
+    },
+    "product_manager": {
+        "Product Manager": ["PM", "chef de produit", "product management"],
+        "Product Owner": ["PO"],
+        "Roadmap": ["feuille de route", "road map"],
+        "KPI": ["indicateurs clés de performance", "key performance indicators", "indicateurs clés", "indicateurs de performance"],
+        "OKR": ["objectives and key results"],
+        "User research": ["recherche utilisateur", "recherche utilisateurs"],
+        "Discovery": ["product discovery"],
+        "UX": ["expérience utilisateur", "user experience"],
+        "A/B testing": ["A/B test", "AB test", "AB testing", "tests A/B"],
+        "Priorisation": ["prioritisation", "prioritization"],
+        "Backlog": ["product backlog"],
+        "User stories": ["user story", "récits utilisateur"],
+        "Collaboration transverse": ["collaboration transversale", "cross-functional"],
+        "Go-to-market": ["GTM", "mise sur le marché"],
+        "Lancement produit": ["lancement de produit", "product launch"],
+        "Jira": [],
+        "Confluence": [],
+    },
+    "marketing_digital": {
+        "SEO": ["référencement naturel", "search engine optimization"],
+        "SEA": ["référencement payant", "search engine advertising"],
+        "Google Ads": ["AdWords", "Google AdWords"],
+        "Réseaux sociaux": ["social media"],
+        "Community management": ["community manager"],
+        "SMO": ["social media optimization"],
+        "Growth hacking": ["growth hacker"],
+        "Google Analytics": ["GA4"],
+        "Matomo": [],
+        "Emailing": ["e-mailing", "email marketing"],
+        "Newsletter": [],
+        "Marketing automation": [],
+        "Mailchimp": [],
+        "ROI": ["retour sur investissement", "return on investment"],
+        "ROAS": ["return on ad spend"],
+        "Campagnes": ["campagne", "campaign", "campaigns"],
+        "Content marketing": ["marketing de contenu"],
+        "Inbound marketing": [],
+        "Rédaction web": [],
+        "Copywriting": [],
+        "CRM": ["gestion de la relation client", "customer relationship management"],
+        "Salesforce": [],
+        "HubSpot": [],
+        "Conversion": ["taux de conversion", "conversion rate"],
+        "CRO": ["conversion rate optimization", "optimisation du taux de conversion"],
+    },
+    "commercial": {
+        "Prospection": ["prospecter"],
+        "Phoning": ["prospection téléphonique", "cold calling"],
+        "Génération de leads": ["lead generation"],
+        "Négociation": ["négocier", "negotiation"],
+        "Closing": [],
+        "Chiffre d'affaires": ["revenue"],
+        "Business development": ["business developer", "développement commercial", "bizdev", "biz dev"],
+        "Pipeline commercial": ["sales pipeline", "pipeline de ventes"],
+        "Forecast": ["sales forecast", "prévisions de ventes"],
+        "Grands comptes": ["key accounts", "key account", "comptes clés"],
+        "Key Account Manager": ["KAM"],
+        "Relation client": ["relations clients", "relation clients"],
+        "Customer success": [],
+        "Fidélisation": ["fidélisation client", "customer retention"],
+        "Account management": [],
+        "CRM": ["gestion de la relation client", "customer relationship management"],
+        "Salesforce": [],
+        "HubSpot": [],
+        "B2B": ["BtoB", "business to business"],
+        "B2C": ["BtoC", "business to consumer"],
+        "Objectifs commerciaux": ["objectifs de vente", "sales targets"],
+        "Quota": ["quotas"],
+        "SaaS": ["software as a service"],
+    },
+    "startup": {
+        "Polyvalence": ["polyvalent", "polyvalente", "couteau suisse", "multi-casquettes"],
+        "Croissance": ["growth"],
+        "Hypercroissance": ["hyper-croissance", "hypergrowth"],
+        "Scale-up": ["scaleup"],
+        "Environnement startup": ["startup", "start-up"],
+        "MVP": ["minimum viable product", "produit minimum viable"],
+        "POC": ["proof of concept", "preuve de concept"],
+        "Prototype": ["prototypage"],
+        "Levée de fonds": ["levées de fonds", "fundraising"],
+        "Série A": ["series A"],
+        "Ownership": [],
+        "Esprit entrepreneurial": ["entrepreneurial"],
+        "Prise d'initiative": ["esprit d'initiative"],
+        "Impact": [],
+    },
+    "finance": {
+        "CFA": ["Chartered Financial Analyst"],
+        "Modélisation financière": ["modèle financier", "financial modeling", "financial modelling"],
+        "Business plan": [],
+        "DCF": ["discounted cash flow"],
+        "LBO": ["leveraged buyout"],
+        "Réglementation": ["réglementaire", "regulatory"],
+        "Conformité": ["compliance"],
+        "Bâle III": ["Basel III", "Bâle 3"],
+        "MiFID": [],
+        "IFRS": [],
+        "KYC": ["Know Your Customer"],
+        "LCB-FT": ["lutte contre le blanchiment"],
+        "Analyse financière": ["financial analysis"],
+        "Analyse crédit": ["analyse de crédit", "credit analysis"],
+        "Due diligence": [],
+        "Audit": ["auditeur", "auditrice", "auditing"],
+        "Commissariat aux comptes": [],
+        "Big Four": ["Big 4"],
+        "Contrôle de gestion": ["contrôleur de gestion", "controlling"],
+        "FP&A": ["financial planning and analysis"],
+        "Comptabilité": ["comptable", "accounting"],
+        "Consolidation": ["consolidation des comptes"],
+        "Marchés financiers": ["financial markets", "capital markets"],
+        "Trading": [],
+        "Front office": [],
+        "Gestion d'actifs": ["asset management"],
+        "Gestion des risques": ["risk management"],
+        "VaR": ["Value at Risk"],
+        "VBA": ["Visual Basic for Applications"],
+        "Bloomberg": [],
+        "Refinitiv": ["Eikon"],
+    },
+}
+
+# Suffixes retirés par raciniser, du plus long au plus court (français puis anglais)
+SUFFIXES = (
+    "ements", "ement", "ations", "ation", "ateurs", "ateur", "atrices", "atrice", "euses", "euse",
+    "eurs", "eur", "ings", "ing", "ees", "ee", "es", "s", "e",
+)
+LONGUEUR_MIN_RACINE = 3
+
+# Au plus cette longueur, une forme est reconnue telle quelle (voir est_forme_exacte)
+LONGUEUR_MAX_FORME_EXACTE = 4
+
+# Mot coupé en fin de ligne par l'extraction PDF ("dévelop-\npement")
+CESURE_RE = re.compile(r"(\w)-\s*\n\s*(\w)")
+
+
+@lru_cache(maxsize=65536)
+def raciniser(mot: str) -> str:
+    """
+    Réduit un mot normalisé à une racine approximative
+
+    Racinisation volontairement légère (pluriels, féminins, -ement, -ation,
+    -eur, -ing) : "données" et "donnée", "tests" et "testing" se rejoignent.
+    Les termes techniques (chiffres, +, #, .) sont laissés intacts.
+
+    Args:
+        mot: Mot déjà passé par normaliser_texte
+
+    Returns:
+        str: Racine du mot
+    """
+    if any(c.isdigit() or c in "+#." for c in mot):
+        return mot
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= LONGUEUR_MIN_RACINE:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def est_forme_exacte(forme: str) -> bool:
+    """
+    Indique si une forme n'est reconnue que telle quelle : acronyme (IA,
+    CI/CD, LCB-FT) ou forme d'au plus LONGUEUR_MAX_FORME_EXACTE caractères
+    (REST, Java), sensible à la casse, sans racinisation et en mot entier
+    """
+    forme = forme.strip()
+    acronyme = any(c.isupper() for c in forme) and not any(c.islower() for c in forme)
+    return bool(forme) and (acronyme or len(forme) <= LONGUEUR_MAX_FORME_EXACTE)
+
+
+def _jeton_exact(forme: str) -> str:
+    # Jeton alphanumérique avec chiffres : intact après normaliser_texte et raciniser
+    return f" xx9{forme.strip().encode('utf-8').hex()} "
+
+
+@lru_cache(maxsize=256)
+def _motif_formes_exactes(formes: frozenset) -> Optional["re.Pattern"]:
+    if not formes:
+        return None
+    alternatives = "|".join(re.escape(forme) for forme in sorted(formes, key=len, reverse=True))
+    # Mot entier : ni lettre, ni chiffre, ni trait d'union ou +#./ collé ("Go-to-market", "C++")
+    return re.compile(rf"(?<![\w\-/.+#])(?:{alternatives})(?![\w\-/+#]|\.\w)")
+
+
+def normaliser_lexique(texte: str, formes_exactes: Optional[frozenset] = None) -> str:
+    """
+    Normalise un texte pour les lexiques : césures recollées, formes exactes
+    remplacées par un jeton propre, normaliser_texte et mots racinisés
+
+    Args:
+        texte: Texte brut ou issu de pdf_utils.clean_text
+        formes_exactes: Formes reconnues telles quelles (voir
+            est_forme_exacte ; défaut : celles des lexiques, FORMES_EXACTES)
+
+    Returns:
+        str: Racines séparées par un espace
+    """
+    texte = CESURE_RE.sub(r"\1\2", texte)
+    motif = _motif_formes_exactes(FORMES_EXACTES if formes_exactes is None else formes_exactes)
+    if motif:
+        texte = motif.sub(lambda correspondance: _jeton_exact(correspondance.group(0)), texte)
+    return " ".join(raciniser(mot) for mot in normaliser_texte(texte).split())
+
+
+class IndexLexique:
+    """
+    Lexique compilé : formes équivalentes -> terme canonique
+
+    Une forme partagée par deux entrées reste à la première (les termes
+    canoniques passent avant les équivalents).
+    """
+
+    def __init__(self, lexique: Dict[str, List[str]]):
+        """
+        Args:
+            lexique: Terme canonique -> équivalents (synonymes, abréviations)
+        """
+        self.lexique = lexique
+        self.termes = list(lexique)
+        self._canoniques = {}
+        for canonique in lexique:
+            self._canoniques.setdefault(normaliser_lexique(canonique), canonique)
+        for canonique, equivalents in lexique.items():
+            for forme in equivalents:
+                self._canoniques.setdefault(normaliser_lexique(forme), canonique)
+        # Mots des formes, formes exactes comprises sous leur forme normalisée ("ml")
+        self._mots = {}
+        for canonique, equivalents in lexique.items():
+            for forme in [canonique, *equivalents]:
+                self._mots.setdefault(canonique, set()).update(
+                    normaliser_lexique(forme).split() + normaliser_lexique(forme, frozenset()).split()
+                )
+        self._automate = AutomateAhoCorasick(
+            {forme: canonique for forme, canonique in self._canoniques.items() if forme},
+            normaliser=normaliser_lexique
+        )
+
+    def mots_des_formes(self, canoniques: Iterable[str]) -> Set[str]:
+        """Racines des mots de toutes les formes des termes canoniques donnés"""
+        return set().union(*(self._mots.get(canonique, ()) for canonique in canoniques))
+
+    def rechercher(self, texte: str) -> Counter:
+        """
+        Compte les termes canoniques cités dans un texte, sous toutes leurs formes
+
+        Args:
+            texte: CV, offre ou ligne de texte
+
+        Returns:
+            Counter terme canonique -> occurrences
+        """
+        return self._automate.rechercher(texte)
+
+    def canonique(self, mot: str) -> Optional[str]:
+        """Terme canonique dont mot est une forme, ou None"""
+        return self._canoniques.get(normaliser_lexique(mot))
+
+    def formes_equivalentes(self, mot: str) -> List[str]:
+        """
+        Formes équivalentes à un mot, lui compris
+
+        Args:
+            mot: Terme quelconque (mot-clé d'une offre, par exemple)
+
+        Returns:
+            Liste des formes du lexique pour le même terme canonique ([mot]
+            si le mot est inconnu du lexique)
+        """
+        canonique = self.canonique(mot)
+        if canonique is None:
+            return [mot]
+        return [mot, canonique] + [forme for forme in self.lexique[canonique] if forme != mot]
+
+
+def _fusionner(*lexiques: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """Fusionne des lexiques en regroupant les équivalents d'un même terme canonique"""
+    fusion = {}
+    for lexique in lexiques:
+        for canonique, equivalents in lexique.items():
+            formes = fusion.setdefault(canonique, [])
+            formes.extend(forme for forme in equivalents if forme not in formes)
+    return fusion
+
+
+# Compilation au démarrage : un index par niche (avec les compétences
+# communes) et un index global qui reprend aussi le vocabulaire ATS
+FORMES_EXACTES = frozenset(
+    forme
+    for lexique in [LEXIQUE_COMMUN, *LEXIQUES_NICHES.values(), {mot: [] for mot in VOCABULAIRE_ATS}]
+    for canonique, equivalents in lexique.items()
+    for forme in [canonique, *equivalents]
+    if est_forme_exacte(forme)
+)
+INDEX_NICHES = {
+    niche: IndexLexique(_fusionner(LEXIQUE_COMMUN, lexique)) for niche, lexique in LEXIQUES_NICHES.items()
+}
+_LEXIQUE_GLOBAL = _fusionner(LEXIQUE_COMMUN, *LEXIQUES_NICHES.values())
+_FORMES_CONNUES = {
+    normaliser_lexique(forme) for canonique, equivalents in _LEXIQUE_GLOBAL.items() for forme in [canonique, *equivalents]
+}
+# Un mot du vocabulaire déjà équivalent à un terme des lexiques (NLP) y reste rattaché
+INDEX_GLOBAL = IndexLexique(_fusionner(
+    _LEXIQUE_GLOBAL, {mot: [] for mot in VOCABULAIRE_ATS if normaliser_lexique(mot) not in _FORMES_CONNUES}
+))
+
+
+def get_index_lexique(niche: Optional[str] = None) -> IndexLexique:
+    """
+    Retourne l'index compilé d'une niche
+
+    Args:
+        niche: Clé de la niche (voir prompts.NICHES) ; None ou inconnue : index global
+
+    Returns:
+        IndexLexique
+    """
+    return INDEX_NICHES.get(niche, INDEX_GLOBAL)
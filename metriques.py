@@ -0,0 +1,233 @@
+"""
+Export des métriques des appels au modèle : journal JSONL et format Prometheus
+
+Les mesures elles-mêmes (tokens, coût, latence, issue du parsing) sont
+tenues par routage.StatsEtapes, seule source partagée avec la barre
+latérale et le bilan de batch_cli. Ce module les expose au format texte
+Prometheus (endpoint HTTP local /metrics : compteurs, histogrammes de
+latence et percentiles p50/p95/p99 par étape et modèle, relances de
+relances.MetriquesRelances) et journalise chaque appel en JSONL avec rotation.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any
+
+from relances import MetriquesRelances, get_metriques_relances
+from routage import BORNES_LATENCE, TYPES_TOKENS, StatsEtapes, calculer_cout, get_stats_etapes
+
+PERCENTILES = (0.5, 0.95, 0.99)
+
+# Journal JSONL : taille avant rotation (octets) et fichiers archivés conservés
+TAILLE_MAX_JOURNAL = 10_000_000
+JOURNAUX_CONSERVES = 3
+
+
+def _etiquettes(**valeurs: str) -> str:
+    """Étiquettes Prometheus ({cle="valeur",...}), valeurs échappées"""
+    echappees = (
+        f'{cle}="{str(valeur).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for cle, valeur in valeurs.items()
+    )
+    return "{" + ",".join(echappees) + "}"
+
+
+class JournalAppels:
+    """Journal JSONL des appels, archivé par taille (partagé entre threads)"""
+
+    def __init__(
+        self,
+        chemin: str,
+        taille_max: int = TAILLE_MAX_JOURNAL,
+        journaux_conserves: int = JOURNAUX_CONSERVES
+    ):
+        """
+        Args:
+            chemin: Fichier JSONL où écrire chaque appel
+            taille_max: Taille (octets) au-delà de laquelle le journal est archivé
+                en .1 (les archives précédentes décalées en .2, .3...)
+            journaux_conserves: Nombre d'archives conservées
+        """
+        self._lock = threading.Lock()
+        self.chemin = chemin
+        self.taille_max = taille_max
+        self.journaux_conserves = journaux_conserves
+        if os.path.dirname(chemin):
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+
+    def ecrire(
+        self,
+        etape: str,
+        modele: str,
+        tokens_detail: Dict[str, int],
+        latence: float,
+        source: str = "api",
+        issue: str = "ok"
+    ):
+        """Ajoute un appel au journal (mêmes arguments que StatsEtapes.enregistrer)"""
+        facture = source not in ("cache", "regroupe", "erreur")
+        self._ajouter({
+            "horodatage": datetime.now(timezone.utc).isoformat(),
+            "etape": etape,
+            "modele": modele,
+            "source": source,
+            "issue": issue,
+            "latence": round(latence, 4),
+            "tokens": {type_tokens: tokens_detail.get(type_tokens, 0) for type_tokens in TYPES_TOKENS},
+            "cout": calculer_cout(modele, tokens_detail) if facture else 0.0
+        })
+
+    def _ajouter(self, ligne: Dict[str, Any]):
+        with self._lock:
+            try:
+                if os.path.exists(self.chemin) and os.path.getsize(self.chemin) >= self.taille_max:
+                    for numero in range(self.journaux_conserves - 1, 0, -1):
+                        if os.path.exists(f"{self.chemin}.{numero}"):
+                            os.replace(f"{self.chemin}.{numero}", f"{self.chemin}.{numero + 1}")
+                    os.replace(self.chemin, f"{self.chemin}.1")
+                with open(self.chemin, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(ligne, ensure_ascii=False) + "\n")
+            except OSError:
+                # Un journal inaccessible ne doit pas faire échouer l'analyse
+                pass
+
+
+def exporter_prometheus(
+    stats_etapes: Optional[StatsEtapes] = None,
+    metriques_relances: Optional[MetriquesRelances] = None
+) -> str:
+    """
+    Exporte les métriques au format texte Prometheus (version 0.0.4)
+
+    Args:
+        stats_etapes: Statistiques exportées (défaut : partagées du processus)
+        metriques_relances: Compteurs de relances (défaut : partagés du processus)
+
+    Returns:
+        str: Compteurs d'appels, de tokens et de coût, histogramme de
+        latence par étape et modèle, percentiles de la fenêtre glissante et relances
+    """
+    stats = (stats_etapes or get_stats_etapes()).stats()
+    relances = (metriques_relances or get_metriques_relances()).stats()
+    modeles = sorted((etape, modele, valeurs) for etape, par_modele in stats.items() for modele, valeurs in par_modele.items())
+
+    lignes = [
+        "# HELP cv_appels_total Appels au modèle par étape, modèle, source et issue du parsing",
+        "# TYPE cv_appels_total counter"
+    ]
+    for etape, modele, valeurs in modeles:
+        for source_issue, nombre in sorted(valeurs["issues"].items()):
+            source, issue = source_issue.split("/", 1)
+            lignes.append(f"cv_appels_total{_etiquettes(etape=etape, modele=modele, source=source, issue=issue)} {nombre}")
+
+    lignes += ["# HELP cv_tokens_total Tokens facturés par étape, modèle et type", "# TYPE cv_tokens_total counter"]
+    for etape, modele, valeurs in modeles:
+        for type_tokens, nombre in valeurs["tokens"].items():
+            lignes.append(f"cv_tokens_total{_etiquettes(etape=etape, modele=modele, type=type_tokens)} {nombre}")
+
+    lignes += ["# HELP cv_cout_dollars_total Coût estimé des appels (dollars)", "# TYPE cv_cout_dollars_total counter"]
+    for etape, modele, valeurs in modeles:
+        lignes.append(f"cv_cout_dollars_total{_etiquettes(etape=etape, modele=modele)} {valeurs['cout_total']:.6f}")
+
+    lignes += [
+        "# HELP cv_cout_couvertures_dollars_total Coût des requêtes de couverture perdantes (dollars, inclus dans cv_cout_dollars_total)",
+        "# TYPE cv_cout_couvertures_dollars_total counter"
+    ]
+    for etape, modele, valeurs in modeles:
+        lignes.append(f"cv_cout_couvertures_dollars_total{_etiquettes(etape=etape, modele=modele)} {valeurs['cout_couvertures']:.6f}")
+
+    lignes += ["# HELP cv_latence_secondes Latence des appels réels", "# TYPE cv_latence_secondes histogram"]
+    for etape, modele, valeurs in modeles:
+        for borne, nombre in zip(BORNES_LATENCE, valeurs["histogramme"]):
+            lignes.append(f"cv_latence_secondes_bucket{_etiquettes(etape=etape, modele=modele, le=borne)} {nombre}")
+        lignes.append(f"cv_latence_secondes_bucket{_etiquettes(etape=etape, modele=modele, le='+Inf')} {valeurs['appels_reels']}")
+        lignes.append(f"cv_latence_secondes_sum{_etiquettes(etape=etape, modele=modele)} {valeurs['latence_somme']:.6f}")
+        lignes.append(f"cv_latence_secondes_count{_etiquettes(etape=etape, modele=modele)} {valeurs['appels_reels']}")
+
+    lignes += [
+        "# HELP cv_latence_percentile_secondes Percentiles de latence sur la fenêtre glissante",
+        "# TYPE cv_latence_percentile_secondes gauge"
+    ]
+    for etape, modele, valeurs in modeles:
+        for p in PERCENTILES:
+            valeur = valeurs[f"latence_p{round(p * 100)}"]
+            lignes.append(f"cv_latence_percentile_secondes{_etiquettes(etape=etape, modele=modele, quantile=p)} {valeur:.6f}")
+
+    lignes += ["# HELP cv_relances_total Relances après une erreur transitoire (429, 529...)", "# TYPE cv_relances_total counter"]
+    for etape, compteurs in sorted(relances.items()):
+        lignes.append(f"cv_relances_total{_etiquettes(etape=etape)} {compteurs['relances']}")
+    return "\n".join(lignes) + "\n"
+
+
+_journal_global = None
+_journal_lock = threading.Lock()
+
+
+def get_journal_appels() -> Optional[JournalAppels]:
+    """
+    Retourne le journal partagé par toutes les sessions du processus
+
+    Configuré par les variables d'environnement CV_METRIQUES_JOURNAL
+    (fichier JSONL ; absent : pas de journal) et CV_METRIQUES_JOURNAL_MAX
+    (taille en octets avant rotation).
+    """
+    global _journal_global
+    chemin = os.getenv("CV_METRIQUES_JOURNAL")
+    if not chemin:
+        return None
+    with _journal_lock:
+        if _journal_global is None:
+            _journal_global = JournalAppels(chemin, int(os.getenv("CV_METRIQUES_JOURNAL_MAX", TAILLE_MAX_JOURNAL)))
+        return _journal_global
+
+
+_serveur = None
+
+
+def demarrer_serveur_metriques(
+    port: Optional[int] = None,
+    hote: str = "127.0.0.1",
+    stats_etapes: Optional[StatsEtapes] = None
+) -> Optional[ThreadingHTTPServer]:
+    """
+    Démarre (une fois par processus) l'endpoint HTTP /metrics dans un thread
+
+    Args:
+        port: Port d'écoute (défaut : variable d'environnement CV_METRIQUES_PORT ;
+            absent : pas de serveur)
+        hote: Adresse d'écoute (locale par défaut)
+        stats_etapes: Statistiques exposées (défaut : partagées du processus)
+
+    Returns:
+        Le serveur démarré (ou déjà démarré), None si aucun port n'est configuré
+    """
+    global _serveur
+    if port is None:
+        port = int(os.getenv("CV_METRIQUES_PORT", "0")) or None
+    if not port:
+        return None
+
+    class GestionnaireMetriques(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            corps = exporter_prometheus(stats_etapes).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _journal_lock:
+        if _serveur is None:
+            _serveur = ThreadingHTTPServer((hote, port), GestionnaireMetriques)
+            _serveur.daemon_threads = True
+            threading.Thread(target=_serveur.serve_forever, name="metriques", daemon=True).start()
+        return _serveur
@@ -0,0 +1,231 @@
+"""
+Mode recruteur : classement de N CV pour une seule offre
+
+Les CV sont extraits en parallèle (pdf_utils.extraire_textes_pdfs), notés
+localement en une opération matricielle (score_local.ScoreurLocal.scorer_lot),
+puis seuls les top_k meilleurs passent par analyser_cv et analyser_ats, avec
+une concurrence bornée : le coût en tokens dépend de top_k, pas de N.
+
+Exemples :
+    python mode_recruteur.py candidats/ --offre-fichier offre.txt --niche tech_dev --top-k 10
+    python mode_recruteur.py candidats/ --offre-fichier offre.txt --niche data_ai --sortie classement.csv
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+
+from backends import BackendLocal
+from cassettes import BackendCassette, MODES_CASSETTE
+from claude_service import ClaudeService, creer_backend
+from pdf_utils import extraire_textes_pdfs
+from prompts import NICHES
+from score_local import get_scoreur
+from tracing import propager
+
+TOP_K = 10
+CONCURRENCE = 4
+
+COLONNES_CLASSEMENT = [
+    "rang", "candidat", "score_local", "score_global", "score_ats", "taux_couverture", "affine", "erreur"
+]
+
+
+def classer_candidats(
+    cv_textes: Dict[str, str],
+    offre: str,
+    niche: str,
+    service: Optional[ClaudeService] = None,
+    top_k: int = TOP_K,
+    concurrence: int = CONCURRENCE,
+    delai_max: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Classe des CV pour une offre : score local pour tous, analyse complète pour les top_k
+
+    Args:
+        cv_textes: Nom du candidat -> texte du CV extrait
+        offre: Texte de l'offre d'emploi
+        niche: Clé de la niche cible (voir prompts.NICHES)
+        service: Service utilisé pour les top_k (None : pas d'affinage)
+        top_k: Nombre de candidats analysés par le modèle
+        concurrence: Appels au modèle simultanés
+        delai_max: Durée maximale de l'analyse d'un candidat (secondes)
+
+    Returns:
+        Dict {"classement", "tokens", "appels", "duree_score_local", "duree_affinage"} ;
+        le classement est une liste de dicts (voir COLONNES_CLASSEMENT) : les
+        top_k affinés par score global (un échec d'analyse, signalé par
+        "erreur", garde son rang local), puis les autres par score local
+    """
+    noms = list(cv_textes)
+    debut = time.perf_counter()
+    scores = get_scoreur(niche, offre or None).scorer_lot([cv_textes[nom] for nom in noms])
+    ordre = np.argsort(-scores, kind="stable")
+    duree_score_local = time.perf_counter() - debut
+
+    lignes = {
+        noms[i]: {
+            "rang": None, "candidat": noms[i], "score_local": int(scores[i]), "score_global": None, "score_ats": None,
+            "taux_couverture": None, "affine": False, "erreur": None
+        }
+        for i in ordre
+    }
+    retenus = [noms[i] for i in ordre[:top_k]] if service else []
+    bilan = {"tokens": 0, "appels": 0}
+
+    debut = time.perf_counter()
+    if retenus:
+        with ThreadPoolExecutor(max_workers=concurrence) as executor:
+            def analyser(methode, nom: str) -> Dict[str, Any]:
+                # Échéance calculée au démarrage de l'appel, pas à sa mise en file :
+                # l'attente dans le pool ne consomme pas le délai du candidat
+                echeance = time.monotonic() + delai_max if delai_max else None
+                return methode(cv_textes[nom], niche, offre, echeance=echeance)
+
+            futures = {
+                nom: (
+                    executor.submit(propager(analyser), service.analyser_cv, nom),
+                    executor.submit(propager(analyser), service.analyser_ats, nom)
+                )
+                for nom in retenus
+            }
+
+            for nom, (future_analyse, future_ats) in futures.items():
+                analyse, ats = future_analyse.result(), future_ats.result()
+                ligne = lignes[nom]
+                bilan["appels"] += 2
+                bilan["tokens"] += analyse.get("tokens_used", 0) + ats.get("tokens_used", 0)
+                if analyse["success"]:
+                    ligne["score_global"] = analyse["analysis"].get("score_global", 0)
+                    ligne["affine"] = True
+                if ats["success"]:
+                    ligne["score_ats"] = ats["analyse_ats"].get("score_ats", 0)
+                    ligne["taux_couverture"] = ats["analyse_ats"].get("taux_couverture")
+                erreurs = [resultat["error"] for resultat in (analyse, ats) if not resultat["success"]]
+                ligne["erreur"] = " ; ".join(erreurs) or None
+
+    # Parmi les top_k, un échec d'analyse garde son rang au score local et les
+    # candidats affinés se répartissent les autres rangs, par score global puis
+    # score ATS ; les candidats non retenus suivent, par score local
+    affines = iter(sorted(
+        (lignes[nom] for nom in retenus if lignes[nom]["affine"]),
+        key=lambda ligne: (-ligne["score_global"], -(ligne["score_ats"] or 0))
+    ))
+    classement = [lignes[nom] if not lignes[nom]["affine"] else next(affines) for nom in retenus]
+    classement_retenus = set(retenus)
+    classement += [ligne for nom, ligne in lignes.items() if nom not in classement_retenus]
+    for rang, ligne in enumerate(classement, 1):
+        ligne["rang"] = rang
+
+    return {
+        "classement": classement,
+        "tokens": bilan["tokens"],
+        "appels": bilan["appels"],
+        "duree_score_local": duree_score_local,
+        "duree_affinage": time.perf_counter() - debut
+    }
+
+
+def extraire_candidats(dossier: str, workers_extraction: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Extrait les CV PDF d'un dossier (pool de processus)
+
+    Returns:
+        Dict {"cv_textes": {nom: texte}, "erreurs": {nom: message}}
+    """
+    chemins = [os.path.join(dossier, nom) for nom in sorted(os.listdir(dossier)) if nom.lower().endswith(".pdf")]
+    cv_textes, erreurs = {}, {}
+    for chemin, cv_text, erreur in extraire_textes_pdfs(chemins, workers_extraction):
+        nom = os.path.splitext(os.path.basename(chemin))[0]
+        if erreur:
+            erreurs[nom] = erreur
+        else:
+            cv_textes[nom] = cv_text
+    # Ordre du dossier, indépendant de l'ordre de fin d'extraction
+    return {"cv_textes": dict(sorted(cv_textes.items())), "erreurs": erreurs}
+
+
+def ecrire_classement(classement: List[Dict[str, Any]], sortie: str):
+    """Écrit le classement en CSV"""
+    with open(sortie, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLONNES_CLASSEMENT)
+        writer.writeheader()
+        for ligne in classement:
+            writer.writerow({colonne: ligne.get(colonne) for colonne in COLONNES_CLASSEMENT})
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Classement de CV PDF pour une offre (mode recruteur)")
+    parser.add_argument("dossier", help="Dossier des CV PDF des candidats")
+    parser.add_argument("--niche", required=True, choices=list(NICHES.keys()), help="Niche du poste")
+    parser.add_argument("--offre", help="Texte de l'offre d'emploi")
+    parser.add_argument("--offre-fichier", help="Fichier texte contenant l'offre d'emploi")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="Candidats analysés par le modèle (0 : score local seul)")
+    parser.add_argument("--concurrence", type=int, default=CONCURRENCE, help="Appels au modèle simultanés")
+    parser.add_argument("--workers-extraction", type=int, help="Processus d'extraction PDF")
+    parser.add_argument("--sortie", default="classement.csv", help="Fichier CSV du classement")
+    parser.add_argument("--delai-max", type=float, help="Durée maximale de l'analyse d'un candidat (secondes)")
+    parser.add_argument("--backend", choices=["anthropic", "local"], default="anthropic",
+                        help="local : réponses synthétiques sans clé API")
+    parser.add_argument("--cassette", help="Cassette (.jsonl.gz) où enregistrer ou d'où rejouer les réponses")
+    parser.add_argument("--cassette-mode", choices=list(MODES_CASSETTE), default="relecture", help="Mode de la cassette")
+    args = parser.parse_args(argv)
+
+    offre = args.offre
+    if args.offre_fichier:
+        with open(args.offre_fichier, encoding="utf-8") as f:
+            offre = f.read()
+    if not offre:
+        print("Une offre est requise (--offre ou --offre-fichier)", file=sys.stderr)
+        return 1
+
+    extraction = extraire_candidats(args.dossier, args.workers_extraction)
+    for nom, erreur in extraction["erreurs"].items():
+        print(f"❌ {nom} : {erreur}", file=sys.stderr)
+    if not extraction["cv_textes"]:
+        print("Aucun CV à classer", file=sys.stderr)
+        return 1
+
+    service = None
+    if args.top_k > 0:
+        backend = BackendLocal() if args.backend == "local" else None
+        if args.cassette:
+            if args.cassette_mode == "enregistrement" and backend is None:
+                backend = creer_backend(os.getenv("ANTHROPIC_API_KEY"))
+            backend = BackendCassette(args.cassette, args.cassette_mode, backend)
+        service = ClaudeService(backend=backend)
+
+    resultat = classer_candidats(
+        extraction["cv_textes"], offre, args.niche, service,
+        top_k=args.top_k, concurrence=args.concurrence, delai_max=args.delai_max
+    )
+    ecrire_classement(resultat["classement"], args.sortie)
+
+    print(f"{'Rang':>4}  {'Candidat':<30} {'Local':>5} {'Global':>6} {'ATS':>4}  Couverture", file=sys.stderr)
+    for ligne in resultat["classement"][:max(args.top_k, 10)]:
+        print(
+            f"{ligne['rang']:>4}  {ligne['candidat'][:30]:<30} {ligne['score_local']:>5} "
+            f"{ligne['score_global'] if ligne['score_global'] is not None else '-':>6} "
+            f"{ligne['score_ats'] if ligne['score_ats'] is not None else '-':>4}  "
+            f"{ligne['taux_couverture'] or '-'}"
+            + (f"  ⚠️ {ligne['erreur']}" if ligne["erreur"] else ""),
+            file=sys.stderr
+        )
+    print(
+        f"\n{len(resultat['classement'])} CV notés localement en {resultat['duree_score_local'] * 1000:.0f} ms, "
+        f"{resultat['appels']} appels au modèle ({resultat['tokens']} tokens) en {resultat['duree_affinage']:.1f}s "
+        f"-> {args.sortie}",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
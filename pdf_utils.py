@@ -11,11 +11,15 @@ from reportlab.lib.colors import HexColor
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, ListFlowable, ListItem
 from reportlab.pdfgen import canvas
 from io import BytesIO
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Iterable, Iterator, Tuple
 import re
 import markdown
 
+from tracing import trace
 
+
+@trace("pdf.extraction")
 def extract_text_from_pdf(pdf_file) -> str:
     """
     Extrait le texte d'un fichier PDF uploadé
@@ -43,6 +47,35 @@ def extract_text_from_pdf(pdf_file) -> str:
         raise Exception(f"Erreur lors de l'extraction du PDF : {str(e)}")
 
 
+def _extraire_texte_fichier(chemin: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """Extrait et nettoie le texte d'un PDF sur disque (exécuté dans un processus du pool)"""
+    try:
+        return chemin, clean_text(extract_text_from_pdf(chemin)), None
+    except Exception as e:
+        return chemin, None, str(e)
+
+
+def extraire_textes_pdfs(
+    chemins: Iterable[str],
+    max_workers: Optional[int] = None
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Extrait le texte de plusieurs PDF en parallèle dans un pool de processus
+    
+    Args:
+        chemins: Chemins des fichiers PDF
+        max_workers: Nombre de processus (défaut : nombre de CPU)
+        
+    Yields:
+        tuple: (chemin, texte nettoyé ou None, message d'erreur ou None),
+        dans l'ordre de fin d'extraction
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_extraire_texte_fichier, chemin) for chemin in chemins]
+        for future in as_completed(futures):
+            yield future.result()
+
+
 def clean_text(text: str) -> str:
     """
     Nettoie le texte extrait (suppression des espaces multiples, etc.)
@@ -53,13 +86,15 @@ def clean_text(text: str) -> str:
     Returns:
         str: Texte nettoyé
     """
-    # Supprime les espaces multiples
-    text = re.sub(r'\s+', ' ', text)
+    # Supprime les espaces multiples (les retours à la ligne délimitent les sections, voir sections_cv)
+    text = re.sub(r'[^\S\n]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
     # Supprime les lignes vides multiples
     text = re.sub(r'\n\s*\n', '\n\n', text)
     return text.strip()
 
 
+@trace("pdf.rendu")
 def markdown_to_pdf(markdown_content: str, output_filename: str = "cv_optimise.pdf") -> bytes:
     """
     Convertit du contenu Markdown en PDF avec un style professionnel
@@ -302,6 +337,7 @@ def clean_markdown(text: str) -> str:
 
 
 
+@trace("pdf.validation")
 def validate_pdf(pdf_file) -> tuple[bool, Optional[str]]:
     """
     Valide qu'un fichier est bien un PDF lisible
@@ -334,3 +334,80 @@ Format MARKDOWN structuré :
 Sans offre : analyse générale ATS (format, structure, mots-clés sectoriels).
 
 IMPORTANT : Respecte STRICTEMENT le format Markdown avec ## MOTS_CLES_MANQUANTS, ## MOTS_CLES_PRESENTS, ## RECOMMANDATIONS, ## POINTS_FORTS"""
+
+
+# Analyse ATS quand la couverture des mots-clés de l'offre est calculée localement (voir ats_local.py)
+ANALYSE_ATS_QUALITATIF_PROMPT = """Tu es un expert en ATS (Applicant Tracking Systems). Analyse un CV pour son optimisation ATS.
+
+Les mots-clés de l'offre ont déjà été extraits et comptés dans le CV par un outil : leur liste est fournie dans la consigne, ne les recompte pas. Appuie-toi dessus pour noter le CV et recommander où et comment intégrer les mots-clés absents.
+
+Format MARKDOWN structuré :
+
+**SCORE_ATS:** 65
+
+## RECOMMANDATIONS
+- Ajoutez React dans au moins 2 sections (experience + competences)
+- Mentionnez TypeScript dans vos projets recents
+
+## POINTS_FORTS
+- JavaScript
+- Git
+
+IMPORTANT : Respecte STRICTEMENT le format Markdown avec **SCORE_ATS:**, ## RECOMMANDATIONS, ## POINTS_FORTS"""
+
+
+# Balayage de toutes les niches : note courte d'adéquation à la niche dont le
+# contexte précède ce prompt (le CV, en tête de requête, reste en cache d'une niche à l'autre)
+SCORE_NICHE_PROMPT = """Tu es un expert en recrutement. Évalue l'adéquation du CV à la niche cible indiquée ci-dessus, en quelques lignes.
+
+Format MARKDOWN strict, sans autre texte :
+
+**SCORE_NICHE:** 72
+**VERDICT:** Profil solide pour cette niche, expériences techniques pertinentes
+
+## ATOUTS
+- Projets Python mis en production
+- Stack cloud maîtrisée
+
+## MANQUES
+- Aucune certification
+- Peu de résultats chiffrés
+
+IMPORTANT : au plus 2 ATOUTS et 2 MANQUES, une ligne chacun"""
+
+
+# Sections du rapport complet (mode un seul appel), dans l'ordre de génération
+SECTIONS_RAPPORT = ["ANALYSE", "AMELIORATIONS", "CHECKLIST", "ATS"]
+
+
+def marqueur_section(nom: str) -> str:
+    """Retourne le délimiteur d'une section du rapport complet"""
+    return f"===SECTION: {nom}==="
+
+
+# Prompt combiné : les quatre analyses en une seule réponse
+RAPPORT_COMPLET_PROMPT = f"""Tu es un expert en recrutement, coaching CV et ATS. Ta mission est de produire en UNE SEULE réponse un rapport complet sur le CV, composé de quatre sections.
+
+Chaque section commence par son délimiteur, seul sur sa ligne, dans cet ordre :
+{marqueur_section("ANALYSE")}
+{marqueur_section("AMELIORATIONS")}
+{marqueur_section("CHECKLIST")}
+{marqueur_section("ATS")}
+
+La longueur totale de la réponse est limitée : sois concis (4-5 améliorations, 4-5 actions, analyses courtes) pour que les quatre sections soient complètes.
+
+Consignes et format de chaque section :
+
+{marqueur_section("ANALYSE")}
+{ANALYSE_PROMPT}
+
+{marqueur_section("AMELIORATIONS")}
+{AMELIORATIONS_SECTION_PROMPT}
+
+{marqueur_section("CHECKLIST")}
+{CHECKLIST_ACTIONS_PROMPT}
+
+{marqueur_section("ATS")}
+{ANALYSE_ATS_PROMPT}
+
+IMPORTANT : Écris les quatre délimiteurs exactement comme ci-dessus, sans aucun texte avant le premier."""
@@ -0,0 +1,171 @@
+"""
+Relances des appels Claude : backoff exponentiel avec jitter et respect de retry-after
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict, Any, Callable
+
+import anthropic
+
+# Codes HTTP transitoires : limite de débit (429), API surchargée (529), erreurs serveur
+STATUTS_RELANCABLES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+class DelaiDepasse(TimeoutError):
+    """Échéance de l'analyse atteinte : l'appel n'est ni poursuivi ni relancé"""
+
+
+class PolitiqueRelance:
+    """Paramètres de relance d'une étape"""
+
+    def __init__(
+        self,
+        max_tentatives: int = 4,
+        delai_base: float = 1.0,
+        delai_max: float = 20.0,
+        budget_attente: float = 45.0
+    ):
+        """
+        Args:
+            max_tentatives: Nombre maximum d'appels (premier appel compris)
+            delai_base: Délai de la première relance en secondes (doublé ensuite)
+            delai_max: Plafond d'un délai de relance
+            budget_attente: Temps d'attente cumulé maximal pour un appel
+        """
+        self.max_tentatives = max_tentatives
+        self.delai_base = delai_base
+        self.delai_max = delai_max
+        self.budget_attente = budget_attente
+
+    def delai(self, tentative: int, retry_after: Optional[float] = None) -> float:
+        """Délai avant la relance numéro `tentative` (1 pour la première)"""
+        if retry_after is not None:
+            # Le serveur indique quand revenir : on attend au moins ce délai
+            return retry_after + random.uniform(0, self.delai_base / 2)
+        # Backoff exponentiel avec "full jitter"
+        return random.uniform(0, min(self.delai_max, self.delai_base * 2 ** (tentative - 1)))
+
+
+def est_relancable(erreur: Exception) -> bool:
+    """Indique si une erreur d'appel est transitoire"""
+    if isinstance(erreur, DelaiDepasse):
+        return False
+    if isinstance(erreur, (anthropic.APIConnectionError, TimeoutError)):  # inclut les timeouts
+        return True
+    return getattr(erreur, "status_code", None) in STATUTS_RELANCABLES
+
+
+def lire_retry_after(erreur: Exception) -> Optional[float]:
+    """Extrait le délai demandé par le serveur (retry-after-ms ou retry-after), en secondes"""
+    reponse = getattr(erreur, "response", None)
+    if reponse is None:
+        return None
+    entetes = reponse.headers
+
+    if entetes.get("retry-after-ms"):
+        try:
+            return float(entetes["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    valeur = entetes.get("retry-after")
+    if not valeur:
+        return None
+    try:
+        return max(float(valeur), 0.0)
+    except ValueError:
+        pass
+    try:
+        # Format date HTTP
+        return max(parsedate_to_datetime(valeur).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class MetriquesRelances:
+    """Compteurs de relances par étape (partagés entre threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._etapes = {}
+
+    def enregistrer(self, etape: str, nom: str, valeur: float = 1):
+        with self._lock:
+            compteurs = self._etapes.setdefault(etape, {
+                "appels": 0,
+                "relances": 0,
+                "attente_totale": 0.0,
+                "succes_apres_relance": 0,
+                "echecs_definitifs": 0
+            })
+            compteurs[nom] += valeur
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Retourne une copie des compteurs par étape"""
+        with self._lock:
+            return {etape: dict(compteurs) for etape, compteurs in self._etapes.items()}
+
+
+def executer_avec_relances(
+    fonction: Callable[[], Any],
+    politique: PolitiqueRelance,
+    etape: str,
+    metriques: MetriquesRelances,
+    relancable: Callable[[Exception], bool] = est_relancable,
+    attendre: Callable[[float], None] = time.sleep,
+    echeance: Optional[float] = None
+) -> Any:
+    """
+    Exécute un appel en le relançant sur les erreurs transitoires
+
+    Args:
+        fonction: Appel à exécuter (sans argument)
+        politique: Politique de relance de l'étape
+        etape: Nom de l'étape (pour les métriques)
+        metriques: Compteurs à mettre à jour
+        relancable: Prédicat indiquant si une erreur peut être relancée
+        attendre: Fonction d'attente (remplaçable pour les tests)
+        echeance: Instant limite (time.monotonic) au-delà duquel on ne relance plus
+
+    Returns:
+        Le résultat de `fonction`
+
+    Raises:
+        La dernière erreur si elle n'est pas relançable ou si la politique est épuisée
+    """
+    attente_cumulee = 0.0
+    metriques.enregistrer(etape, "appels")
+
+    for tentative in range(1, politique.max_tentatives + 1):
+        try:
+            resultat = fonction()
+            if tentative > 1:
+                metriques.enregistrer(etape, "succes_apres_relance")
+            return resultat
+        except Exception as e:
+            if not relancable(e) or tentative == politique.max_tentatives:
+                metriques.enregistrer(etape, "echecs_definitifs")
+                raise
+
+            delai = politique.delai(tentative, lire_retry_after(e))
+            if attente_cumulee + delai > politique.budget_attente or (
+                echeance is not None and time.monotonic() + delai >= echeance
+            ):
+                metriques.enregistrer(etape, "echecs_definitifs")
+                raise
+
+            metriques.enregistrer(etape, "relances")
+            metriques.enregistrer(etape, "attente_totale", delai)
+            attente_cumulee += delai
+            attendre(delai)
+
+
+_metriques_globales = MetriquesRelances()
+
+
+def get_metriques_relances() -> MetriquesRelances:
+    """Retourne les compteurs de relances partagés par le processus"""
+    return _metriques_globales
@@ -0,0 +1,271 @@
+"""
+Routage des étapes vers les modèles Claude et statistiques de latence/coût par étape
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Optional, Dict, Any
+
+MODELE_ECONOMIQUE = "claude-3-haiku-20240307"  # Claude 3 Haiku - Rapide et économique
+MODELE_PUISSANT = "claude-3-5-sonnet-20241022"
+
+# Tarifs en dollars par million de tokens (entrée, sortie)
+TARIFS = {
+    "claude-3-haiku-20240307": {"entree": 0.25, "sortie": 1.25},
+    "claude-3-5-haiku-20241022": {"entree": 0.80, "sortie": 4.00},
+    "claude-3-5-sonnet-20241022": {"entree": 3.00, "sortie": 15.00},
+}
+# Multiplicateurs du tarif d'entrée pour le cache de prompt
+FACTEUR_ECRITURE_CACHE = 1.25
+FACTEUR_LECTURE_CACHE = 0.1
+
+# Modèle et paramètres de chaque étape. "timeout" borne chaque tentative
+# (secondes) ; "escalade" désigne le modèle relancé quand la réponse du premier
+# ne donne pas une structure exploitable (si l'escalade est activée sur le service).
+ROUTAGE_ETAPES = {
+    "analysis": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 4096, "temperature": 0.3,  # Température basse pour cohérence
+        "timeout": 60.0,
+        "escalade": MODELE_PUISSANT
+    },
+    "ameliorations": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 4096, "temperature": 0.1,
+        "timeout": 60.0,
+        "escalade": MODELE_PUISSANT
+    },
+    "checklist": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 3072, "temperature": 0.1,
+        "timeout": 45.0,
+        "escalade": MODELE_PUISSANT
+    },
+    "analyse_ats": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 2048, "temperature": 0.1,
+        "timeout": 40.0,
+        "escalade": MODELE_PUISSANT
+    },
+    "reecriture": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 4096, "temperature": 0.7,  # Plus élevée pour créativité
+        "timeout": 90.0,
+        "escalade": None
+    },
+    "suggestions": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 3072, "temperature": 0.5,
+        "timeout": 60.0,
+        "escalade": None
+    },
+    "rapport": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 4096, "temperature": 0.1,
+        "timeout": 120.0,
+        "escalade": MODELE_PUISSANT
+    },
+    # Note courte par niche (balayage) : quelques lignes de sortie
+    "score_niche": {
+        "model": MODELE_ECONOMIQUE, "max_tokens": 300, "temperature": 0.1,
+        "timeout": 30.0,
+        "escalade": None
+    },
+}
+
+
+def calculer_cout(modele: str, tokens_detail: Dict[str, int]) -> float:
+    """
+    Calcule le coût d'un appel en dollars
+
+    Args:
+        modele: Identifiant du modèle (voir TARIFS)
+        tokens_detail: Détail des tokens (voir backends.detail_tokens)
+
+    Returns:
+        float: Coût estimé (0 pour un modèle sans tarif connu)
+    """
+    tarif = TARIFS.get(modele)
+    if not tarif:
+        return 0.0
+    entree = (
+        tokens_detail.get("input_tokens", 0)
+        + tokens_detail.get("cache_creation_input_tokens", 0) * FACTEUR_ECRITURE_CACHE
+        + tokens_detail.get("cache_read_input_tokens", 0) * FACTEUR_LECTURE_CACHE
+    )
+    return (entree * tarif["entree"] + tokens_detail.get("output_tokens", 0) * tarif["sortie"]) / 1_000_000
+
+
+# Bornes des histogrammes de latence (secondes, exportés par metriques.py)
+BORNES_LATENCE = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TYPES_TOKENS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+# Provenance d'une réponse qui n'a pas donné lieu à un appel facturé
+SOURCES_SANS_APPEL = ("cache", "regroupe")
+
+
+def percentile(valeurs, p: float) -> float:
+    """Percentile p (0-1) d'une liste de valeurs, par rang (0 si vide)"""
+    if not valeurs:
+        return 0.0
+    triees = sorted(valeurs)
+    return triees[min(len(triees) - 1, math.ceil(p * len(triees)) - 1)]
+
+
+class StatsEtapes:
+    """
+    Latence, tokens et coût des appels par étape et par modèle (partagés entre threads)
+
+    Seule source de ces mesures : la barre latérale, le bilan de batch_cli,
+    le seuil de couverture et l'export Prometheus (metriques.py) les lisent ici.
+    """
+
+    def __init__(self, taille_fenetre: int = 500):
+        """
+        Args:
+            taille_fenetre: Nombre de latences conservées par étape/modèle
+                pour le calcul des percentiles
+        """
+        self._lock = threading.Lock()
+        self._taille_fenetre = taille_fenetre
+        self._compteurs = {}
+
+    def _compteurs_de(self, etape: str, modele: str) -> Dict[str, Any]:
+        return self._compteurs.setdefault((etape, modele), {
+            "appels": 0,
+            "cache_hits": 0,
+            "erreurs": 0,
+            "escalades": 0,
+            "couvertures": 0,
+            "couvertures_gagnantes": 0,
+            "delais_depasses": 0,
+            "cout_total": 0.0,
+            "cout_couvertures": 0.0,
+            "tokens": {type_tokens: 0 for type_tokens in TYPES_TOKENS},
+            "issues": {},
+            "histogramme": [0] * len(BORNES_LATENCE),
+            "latence_somme": 0.0,
+            "latences": deque(maxlen=self._taille_fenetre)
+        })
+
+    def enregistrer(
+        self,
+        etape: str,
+        modele: str,
+        duree: float,
+        tokens_detail: Dict[str, int],
+        source: str = "api",
+        issue: str = "ok",
+        escalade: bool = False
+    ):
+        """
+        Enregistre un appel
+
+        Args:
+            duree: Durée de l'appel (secondes)
+            tokens_detail: Détail des tokens (voir backends.detail_tokens)
+            source: "api", "cache" (cache des réponses), "regroupe" (appel
+                identique en cours, voir coalescence.py) ou "erreur" ; seuls
+                les appels réels entrent dans les latences et le coût
+            issue: Issue du parsing : "ok", "structure_invalide",
+                "non_verifie" (étape sans contrôle) ou "echec_appel"
+            escalade: Appel relancé sur le modèle d'escalade
+        """
+        with self._lock:
+            compteurs = self._compteurs_de(etape, modele)
+            compteurs["issues"][(source, issue)] = compteurs["issues"].get((source, issue), 0) + 1
+            if escalade:
+                compteurs["escalades"] += 1
+            if source == "erreur":
+                compteurs["erreurs"] += 1
+                return
+            compteurs["appels"] += 1
+            if source in SOURCES_SANS_APPEL:
+                compteurs["cache_hits"] += 1
+                return
+            compteurs["cout_total"] += calculer_cout(modele, tokens_detail)
+            for type_tokens in TYPES_TOKENS:
+                compteurs["tokens"][type_tokens] += tokens_detail.get(type_tokens, 0)
+            compteurs["latences"].append(duree)
+            compteurs["latence_somme"] += duree
+            for indice, borne in enumerate(BORNES_LATENCE):
+                if duree <= borne:
+                    compteurs["histogramme"][indice] += 1
+
+    def enregistrer_couverture(self, etape: str, modele: str, tokens_detail: Dict[str, int]):
+        """
+        Enregistre la requête perdante d'une couverture (voir
+        ClaudeService._envoyer_couvert) : ses tokens et son coût entrent dans
+        les totaux et dans le coût des couvertures, pas dans les latences
+
+        Args:
+            tokens_detail: Usage de la requête, estimé si son flux a été interrompu
+        """
+        cout = calculer_cout(modele, tokens_detail)
+        with self._lock:
+            compteurs = self._compteurs_de(etape, modele)
+            compteurs["cout_total"] += cout
+            compteurs["cout_couvertures"] += cout
+            for type_tokens in TYPES_TOKENS:
+                compteurs["tokens"][type_tokens] += tokens_detail.get(type_tokens, 0)
+
+    def compter(self, etape: str, modele: str, nom: str):
+        """Incrémente un compteur d'événement (couvertures, couvertures_gagnantes, delais_depasses)"""
+        with self._lock:
+            self._compteurs_de(etape, modele)[nom] += 1
+
+    def latence(
+        self,
+        etape: str,
+        p: float = 0.95,
+        modele: Optional[str] = None,
+        min_echantillons: int = 1
+    ) -> Optional[float]:
+        """Percentile de latence d'une étape (None si moins de `min_echantillons` mesures)"""
+        with self._lock:
+            latences = [
+                duree
+                for (nom, mod), compteurs in self._compteurs.items()
+                if nom == etape and (modele is None or mod == modele)
+                for duree in compteurs["latences"]
+            ]
+        return percentile(latences, p) if latences and len(latences) >= min_echantillons else None
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Retourne les statistiques par étape puis par modèle : nombre
+        d'appels, erreurs, escalades, couvertures, délais
+        dépassés, latence moyenne/p50/p95/p99/max, histogramme des latences
+        (cumulatif, voir BORNES_LATENCE), tokens par type, appels par
+        "source/issue", coût total (couvertures comprises) et coût des
+        requêtes de couverture perdantes
+        """
+        with self._lock:
+            resultat = {}
+            for (etape, modele), compteurs in self._compteurs.items():
+                latences = list(compteurs["latences"])
+                appels_reels = compteurs["appels"] - compteurs["cache_hits"]
+                resultat.setdefault(etape, {})[modele] = {
+                    "appels": compteurs["appels"],
+                    "cache_hits": compteurs["cache_hits"],
+                    "erreurs": compteurs["erreurs"],
+                    "escalades": compteurs["escalades"],
+                    "couvertures": compteurs["couvertures"],
+                    "couvertures_gagnantes": compteurs["couvertures_gagnantes"],
+                    "delais_depasses": compteurs["delais_depasses"],
+                    "latence_moyenne": sum(latences) / len(latences) if latences else 0.0,
+                    "latence_p50": percentile(latences, 0.5),
+                    "latence_p95": percentile(latences, 0.95),
+                    "latence_p99": percentile(latences, 0.99),
+                    "latence_max": max(latences) if latences else 0.0,
+                    "histogramme": list(compteurs["histogramme"]),
+                    "latence_somme": compteurs["latence_somme"],
+                    "appels_reels": appels_reels,
+                    "tokens": dict(compteurs["tokens"]),
+                    "issues": {f"{source}/{issue}": nombre for (source, issue), nombre in compteurs["issues"].items()},
+                    "cout_total": compteurs["cout_total"],
+                    "cout_couvertures": compteurs["cout_couvertures"],
+                    "cout_moyen": compteurs["cout_total"] / appels_reels if appels_reels else 0.0
+                }
+            return resultat
+
+
+_stats_globales = StatsEtapes()
+
+
+def get_stats_etapes() -> StatsEtapes:
+    """Retourne les statistiques d'étapes partagées par le processus"""
+    return _stats_globales
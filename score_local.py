@@ -0,0 +1,296 @@
+"""
+Score provisoire calculé localement, affiché dès l'upload du CV
+
+Le score combine la pertinence BM25 du CV pour l'offre et le focus de la
+niche (prompts.NICHES), la présence des sections attendues et la
+quantification des réalisations. Les compétences du lexique de la niche
+(lexiques.py) comptent comme un seul terme sous toutes leurs formes : "ML"
+dans le CV couvre "Machine Learning" dans l'offre. Les CV sont représentés par des vecteurs
+creux (indices des termes de la requête, comptés avec numpy.bincount) : un
+CV se note en quelques millisecondes et un lot de CV en une opération
+matricielle. Le score de l'analyse (score_global) le remplace dès qu'il arrive.
+"""
+
+import re
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+
+import numpy as np
+
+from ats_local import normaliser_texte
+from lexiques import IndexLexique, get_index_lexique, raciniser, LEXIQUE_COMMUN, LEXIQUES_NICHES
+from prompts import NICHES
+from sections_cv import decouper_sections
+
+# Mots sans valeur discriminante (forme normalisée, sans accents)
+MOTS_VIDES = {
+    "a", "au", "aux", "avec", "ce", "ces", "dans", "de", "des", "du", "elle", "en", "et", "eux", "il", "je",
+    "la", "le", "les", "leur", "lui", "ma", "mais", "me", "mes", "moi", "mon", "ne", "nos", "notre", "nous",
+    "on", "ou", "par", "pas", "pour", "qu", "que", "qui", "sa", "se", "ses", "son", "sur", "ta", "te", "tes",
+    "ton", "tu", "un", "une", "vos", "votre", "vous", "d", "l", "j", "n", "s", "c", "y", "est", "sont", "etre",
+    "avoir", "plus", "tres", "afin", "ainsi", "the", "and", "of", "to", "in", "for", "with", "on", "at", "an",
+    "is", "are", "as", "by", "or", "h", "f",
+    # Formules d'offre d'emploi
+    "recherchons", "recherche", "requis", "requise", "requises", "apprecie", "appreciee", "appreciees", "souhaite",
+    "souhaitee", "souhaitees", "indispensable", "serait",
+    "atout", "bonus", "maitrise", "connaissance", "connaissances", "poste", "profil", "missions", "mission",
+}
+
+# Paramètres BM25
+K1 = 1.2
+B = 0.75
+LONGUEUR_MOYENNE_CV = 450  # termes, pour la normalisation de longueur BM25
+
+# Sections dont la présence compte dans le score de structure
+SECTIONS_ATTENDUES = ("profil", "experiences", "formation", "competences")
+
+# Chiffres, pourcentages et montants : réalisations quantifiées
+QUANTIFICATION_RE = re.compile(r"\d+(?:[.,]\d+)?\s*(?:%|k€|m€|€|\$|k\b|\+)|\b\d{2,}\b")
+QUANTIFICATIONS_CIBLE = 8
+
+# Poids des composantes et bornes du score sur 100
+POIDS_SCORE = {"pertinence": 0.5, "structure": 0.25, "quantification": 0.25}
+SCORE_MIN = 30
+SCORE_MAX = 90
+
+
+def tokeniser(texte: str) -> List[str]:
+    """Découpe un texte en termes normalisés, sans mots vides"""
+    return [mot for mot in normaliser_texte(texte).split() if mot not in MOTS_VIDES and len(mot) > 1]
+
+
+def _termes(index: IndexLexique, texte: str) -> List[str]:
+    """Termes d'un texte : mots normalisés et termes canoniques du lexique (une fois par occurrence)"""
+    return tokeniser(texte) + list(index.rechercher(texte).elements())
+
+
+def _preparer_requetes(
+    index: IndexLexique, niche: str, offres: Sequence[Optional[str]]
+) -> Tuple[Dict[str, int], np.ndarray]:
+    """
+    Prépare une requête par offre sur un vocabulaire et des IDF communs
+
+    Args:
+        index: Lexique compilé de la niche
+        niche: Clé de la niche cible
+        offres: Textes des offres (None : focus de la niche seul)
+
+    Returns:
+        tuple: (terme -> indice, matrice (offres x termes) des poids)
+    """
+    focus = NICHES.get(niche, {}).get("focus", "")
+    termes_focus = _termes(index, focus)
+    documents = [_termes(index, niche_info["focus"]) for niche_info in NICHES.values()]
+    documents += [list(LEXIQUE_COMMUN) + list(lexique) for lexique in LEXIQUES_NICHES.values()]
+
+    # Un mot d'une forme du lexique ("machine", "ml", "tests") est compté
+    # par le terme canonique : il sort de la requête
+    couverts = index.mots_des_formes(index.termes)
+    requetes = []
+    for offre in offres:
+        lignes_offre = [_termes(index, ligne) for ligne in (offre or "").splitlines()]
+        documents += [ligne for ligne in lignes_offre if ligne]
+        requete = termes_focus + [terme for ligne in lignes_offre for terme in ligne]
+        requetes.append([terme for terme in requete if raciniser(terme) not in couverts])
+
+    vocabulaire = {
+        terme: indice for indice, terme in enumerate(dict.fromkeys(terme for requete in requetes for terme in requete))
+    }
+    frequences = np.zeros(len(vocabulaire))
+    for document in documents:
+        for terme in set(document):
+            if terme in vocabulaire:
+                frequences[vocabulaire[terme]] += 1
+    n = len(documents)
+    idf = np.log(1 + (n - frequences + 0.5) / (frequences + 0.5))
+    # Un terme répété dans l'offre pèse davantage dans la requête
+    occurrences = np.zeros((len(requetes), len(vocabulaire)))
+    for ligne, requete in enumerate(requetes):
+        occurrences[ligne] = np.bincount(
+            np.array([vocabulaire[terme] for terme in requete], dtype=np.int64), minlength=len(vocabulaire)
+        )
+    return vocabulaire, idf * np.sqrt(occurrences)
+
+
+class ScoreurLocal:
+    """
+    Note des CV pour une niche et une offre données
+
+    La requête (termes de l'offre et du focus de la niche) est préparée une
+    fois ; chaque terme est pondéré par son IDF sur le corpus de référence
+    formé par les focus et lexiques de toutes les niches et les lignes de
+    l'offre. Les mots du lexique sont remplacés par leur terme canonique
+    (avec majuscules, il ne se confond pas avec un mot normalisé).
+    """
+
+    def __init__(self, niche: str, offre: Optional[str] = None):
+        """
+        Args:
+            niche: Clé de la niche cible (voir prompts.NICHES)
+            offre: Texte de l'offre d'emploi (optionnel)
+        """
+        self.index = get_index_lexique(niche)
+        self.vocabulaire, poids = _preparer_requetes(self.index, niche, [offre])
+        self.termes = list(self.vocabulaire)
+        self.poids = poids[0]
+        self.poids_total = float(self.poids.sum())
+
+    def _indices(self, termes: List[str]) -> np.ndarray:
+        """Vecteur creux du CV : indices des termes de la requête qu'il contient"""
+        return np.array([self.vocabulaire[terme] for terme in termes if terme in self.vocabulaire], dtype=np.int64)
+
+    def _comptes(self, indices: Sequence[np.ndarray]) -> np.ndarray:
+        """Matrice (CV x termes de la requête) des comptes, en un seul bincount"""
+        taille = len(self.termes)
+        lignes = np.repeat(np.arange(len(indices)), [len(indices_cv) for indices_cv in indices])
+        plats = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        comptes = np.bincount(lignes * taille + plats, minlength=len(indices) * taille)
+        return comptes.reshape(len(indices), taille).astype(float)
+
+    def _pertinence(self, comptes: np.ndarray, longueurs: np.ndarray) -> np.ndarray:
+        """BM25 normalisé entre 0 et 1 (1 : tous les termes de la requête bien présents)"""
+        if not self.poids_total:
+            return np.zeros(comptes.shape[0])
+        normalisation = K1 * (1 - B + B * longueurs / LONGUEUR_MOYENNE_CV)
+        saturation = comptes * (K1 + 1) / (comptes + normalisation[:, None])
+        return (saturation / (K1 + 1)) @ self.poids / self.poids_total
+
+    @staticmethod
+    def _structure(cv_text: str) -> float:
+        trouvees = {section["cle"] for section in decouper_sections(cv_text)}
+        return sum(cle in trouvees for cle in SECTIONS_ATTENDUES) / len(SECTIONS_ATTENDUES)
+
+    @staticmethod
+    def _quantification(cv_text: str) -> float:
+        return min(1.0, len(QUANTIFICATION_RE.findall(cv_text)) / QUANTIFICATIONS_CIBLE)
+
+    def scorer_lot(self, cv_texts: Sequence[str]) -> np.ndarray:
+        """
+        Note un lot de CV en une seule opération matricielle
+
+        Args:
+            cv_texts: Textes des CV extraits
+
+        Returns:
+            np.ndarray des scores provisoires sur 100 (entiers)
+        """
+        tokens = [_termes(self.index, cv_text) for cv_text in cv_texts]
+        comptes = self._comptes([self._indices(termes) for termes in tokens])
+        longueurs = np.array([len(termes) for termes in tokens], dtype=float)
+
+        composantes = (
+            POIDS_SCORE["pertinence"] * self._pertinence(comptes, longueurs)
+            + POIDS_SCORE["structure"] * np.array([self._structure(cv_text) for cv_text in cv_texts])
+            + POIDS_SCORE["quantification"] * np.array([self._quantification(cv_text) for cv_text in cv_texts])
+        )
+        return np.rint(SCORE_MIN + (SCORE_MAX - SCORE_MIN) * composantes).astype(int)
+
+    def scorer(self, cv_text: str) -> Dict[str, Any]:
+        """
+        Note un CV et détaille les composantes du score
+
+        Args:
+            cv_text: Texte du CV extrait
+
+        Returns:
+            Dict {"score", "pertinence", "structure", "quantification",
+            "termes_presents", "termes_absents"} ; les termes sont ceux de
+            la requête, les plus pondérés d'abord
+        """
+        termes = _termes(self.index, cv_text)
+        comptes = self._comptes([self._indices(termes)])
+        pertinence = float(self._pertinence(comptes, np.array([len(termes)], dtype=float))[0])
+        comptes = comptes[0]
+        structure = self._structure(cv_text)
+        quantification = self._quantification(cv_text)
+        combine = (
+            POIDS_SCORE["pertinence"] * pertinence
+            + POIDS_SCORE["structure"] * structure
+            + POIDS_SCORE["quantification"] * quantification
+        )
+
+        ordre = np.argsort(-self.poids, kind="stable")
+        return {
+            "score": int(round(SCORE_MIN + (SCORE_MAX - SCORE_MIN) * combine)),
+            "pertinence": pertinence,
+            "structure": structure,
+            "quantification": quantification,
+            "termes_presents": [self.termes[i] for i in ordre if comptes[i] > 0],
+            "termes_absents": [self.termes[i] for i in ordre if comptes[i] == 0]
+        }
+
+
+class ScoreurOffres:
+    """
+    Note un CV pour plusieurs offres d'une même niche en une opération matricielle
+
+    Une requête par offre (ligne de la matrice des poids), sur un vocabulaire
+    et des IDF communs à toutes les offres : les scores se comparent d'une
+    offre à l'autre.
+    """
+
+    def __init__(self, niche: str, offres: Sequence[str]):
+        """
+        Args:
+            niche: Clé de la niche cible (voir prompts.NICHES)
+            offres: Textes des offres d'emploi
+        """
+        self.index = get_index_lexique(niche)
+        self.vocabulaire, self.poids = _preparer_requetes(self.index, niche, list(offres))
+        self.poids_total = self.poids.sum(axis=1)
+
+    def scorer(self, cv_text: str) -> Dict[str, Any]:
+        """
+        Note un CV pour chaque offre
+
+        Args:
+            cv_text: Texte du CV extrait
+
+        Returns:
+            Dict {"scores", "pertinences"} (np.ndarray, une valeur par offre,
+            dans l'ordre des offres), "structure" et "quantification" (communes)
+        """
+        termes = _termes(self.index, cv_text)
+        indices = np.array([self.vocabulaire[terme] for terme in termes if terme in self.vocabulaire], dtype=np.int64)
+        comptes = np.bincount(indices, minlength=len(self.vocabulaire)).astype(float)
+        normalisation = K1 * (1 - B + B * len(termes) / LONGUEUR_MOYENNE_CV)
+        saturation = comptes / (comptes + normalisation)
+        pertinences = np.divide(
+            self.poids @ saturation, self.poids_total,
+            out=np.zeros(len(self.poids_total)), where=self.poids_total > 0
+        )
+
+        structure = ScoreurLocal._structure(cv_text)
+        quantification = ScoreurLocal._quantification(cv_text)
+        combine = (
+            POIDS_SCORE["pertinence"] * pertinences
+            + POIDS_SCORE["structure"] * structure
+            + POIDS_SCORE["quantification"] * quantification
+        )
+        return {
+            "scores": np.rint(SCORE_MIN + (SCORE_MAX - SCORE_MIN) * combine).astype(int),
+            "pertinences": pertinences,
+            "structure": structure,
+            "quantification": quantification
+        }
+
+
+@lru_cache(maxsize=64)
+def get_scoreur(niche: str, offre: Optional[str] = None) -> ScoreurLocal:
+    """Retourne le scoreur d'une niche et d'une offre (préparé une seule fois par couple)"""
+    return ScoreurLocal(niche, offre)
+
+
+def score_provisoire(cv_text: str, niche: str, offre: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Calcule le score provisoire d'un CV (voir ScoreurLocal.scorer)
+
+    Args:
+        cv_text: Texte du CV extrait
+        niche: Clé de la niche cible
+        offre: Texte de l'offre d'emploi (optionnel)
+
+    Returns:
+        Dict du score et de ses composantes
+    """
+    return get_scoreur(niche, offre or None).scorer(cv_text)
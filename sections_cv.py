@@ -0,0 +1,140 @@
+"""
+Découpage d'un CV en sections (Profil, Expériences, Formation, Compétences...)
+
+Le découpage s'appuie sur les lignes du texte extrait par
+pdf_utils.extract_text_from_pdf : une ligne courte qui correspond à un titre
+de section connu ouvre une nouvelle section. Chaque section porte
+l'empreinte de son contenu, ce qui permet de ne retraiter que les sections
+modifiées d'un CV.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Optional, Dict, Any, List
+
+# Titres reconnus (sans accents, en minuscules) par section
+TITRES_SECTIONS = {
+    "profil": [
+        "profil", "profil professionnel", "resume", "a propos", "a propos de moi",
+        "presentation", "objectif", "objectif professionnel", "summary", "about me"
+    ],
+    "experiences": [
+        "experience", "experiences", "experience professionnelle", "experiences professionnelles",
+        "parcours professionnel", "emplois", "work experience", "professional experience"
+    ],
+    "formation": [
+        "formation", "formations", "education", "diplomes", "etudes", "cursus",
+        "parcours academique", "formation academique"
+    ],
+    "competences": [
+        "competences", "competences techniques", "competences cles", "savoir-faire",
+        "outils", "technologies", "stack technique", "skills", "hard skills", "soft skills"
+    ],
+    "projets": ["projets", "projets personnels", "realisations", "projects"],
+    "certifications": ["certifications", "certificats", "certifications et formations"],
+    "benevolat": ["benevolat", "engagement associatif", "vie associative", "engagements"],
+    "langues": ["langues", "languages"],
+    "interets": [
+        "centres d'interet", "centres d interet", "loisirs", "interets", "hobbies",
+        "activites extra-professionnelles"
+    ],
+}
+
+NOMS_SECTIONS = {
+    "entete": "En-tête",
+    "profil": "Profil",
+    "experiences": "Expériences",
+    "formation": "Formation",
+    "competences": "Compétences",
+    "projets": "Projets",
+    "certifications": "Certifications",
+    "benevolat": "Bénévolat",
+    "langues": "Langues",
+    "interets": "Centres d'intérêt",
+}
+
+# Sections pour lesquelles des améliorations avant/après ont un sens
+SECTIONS_AMELIORABLES = ("profil", "experiences", "formation", "competences", "projets", "certifications", "benevolat")
+
+LONGUEUR_MAX_TITRE = 50
+
+PONCTUATION_TITRE_RE = re.compile(r'^[\s#*•·\-–—=_|]+|[\s:*•·\-–—=_|]+$')
+
+
+def normaliser_titre(ligne: str) -> str:
+    """Met une ligne sous la forme des TITRES_SECTIONS (minuscules, sans accents ni ponctuation d'encadrement)"""
+    texte = unicodedata.normalize("NFKD", ligne)
+    texte = "".join(c for c in texte if not unicodedata.combining(c))
+    texte = PONCTUATION_TITRE_RE.sub("", texte.lower().replace("’", "'"))
+    return re.sub(r'\s+', ' ', texte)
+
+
+def detecter_titre(ligne: str) -> Optional[str]:
+    """
+    Reconnaît un titre de section
+
+    Args:
+        ligne: Ligne du texte extrait
+
+    Returns:
+        Clé de la section (voir TITRES_SECTIONS), ou None si la ligne n'est pas un titre
+    """
+    ligne = ligne.strip()
+    if not ligne or len(ligne) > LONGUEUR_MAX_TITRE:
+        return None
+
+    titre = normaliser_titre(ligne)
+    # Un titre peut être prolongé ("EXPÉRIENCES PROFESSIONNELLES RÉCENTES") s'il
+    # est en majuscules ou se termine par ':' ; sinon la ligne doit être exacte
+    prolongeable = ligne.isupper() or ligne.endswith(":")
+    for cle, variantes in TITRES_SECTIONS.items():
+        for variante in variantes:
+            if titre == variante or (prolongeable and titre.startswith(variante + " ")):
+                return cle
+    return None
+
+
+def empreinte_section(texte: str) -> str:
+    """Empreinte SHA-256 du contenu d'une section, indépendante des espaces"""
+    return hashlib.sha256(re.sub(r'\s+', ' ', texte).strip().encode("utf-8")).hexdigest()
+
+
+def decouper_sections(cv_text: str) -> List[Dict[str, Any]]:
+    """
+    Découpe un CV en sections
+
+    Le texte qui précède le premier titre (nom, coordonnées) forme la section
+    "entete". Les sections de même nature (un titre répété sur la deuxième
+    page, par exemple) sont regroupées à la position de la première.
+
+    Args:
+        cv_text: Texte du CV, avec ses retours à la ligne
+
+    Returns:
+        Liste de dicts {"cle", "nom", "titre", "texte", "empreinte"} dans
+        l'ordre du CV ; le texte inclut la ligne de titre
+    """
+    sections = {}
+    cle, titre, lignes = "entete", "", []
+
+    def cloturer():
+        texte = "\n".join(lignes).strip()
+        if not texte:
+            return
+        if cle in sections:
+            sections[cle]["texte"] += "\n\n" + texte
+        else:
+            sections[cle] = {"cle": cle, "nom": NOMS_SECTIONS[cle], "titre": titre, "texte": texte}
+
+    for ligne in cv_text.splitlines():
+        nouvelle = detecter_titre(ligne)
+        if nouvelle:
+            cloturer()
+            cle, titre, lignes = nouvelle, ligne.strip(), []
+        lignes.append(ligne)
+    cloturer()
+
+    for section in sections.values():
+        section["empreinte"] = empreinte_section(section["texte"])
+    return list(sections.values())
@@ -3,9 +3,16 @@ Application Streamlit pour l'optimisation de CV avec Claude API
 """
 
 import streamlit as st
-from claude_service import ClaudeService
+from claude_service import ClaudeService, ETAPES_ANALYSE, classer_offres_localement, etapes_reutilisables
+from cache_resultats import get_cache
+from coalescence import get_coalescence
+from routage import get_stats_etapes
+from metriques import demarrer_serveur_metriques
 from pdf_utils import extract_text_from_pdf, validate_pdf, markdown_to_pdf, clean_text
 from prompts import NICHES
+from score_local import score_provisoire
+from tracing import get_traceur, nouvel_id_trace
+import re
 import traceback
 
 # Configuration de la page
@@ -368,6 +375,19 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+@st.cache_resource
+def get_service() -> ClaudeService:
+    """
+    Service partagé par toutes les sessions (client HTTP et clé API vérifiés une fois)
+    
+    Une clé absente lève ValueError, qui n'est pas mise en cache : la
+    vérification est refaite au prochain rerun.
+    """
+    # Endpoint /metrics démarré une seule fois par processus si CV_METRIQUES_PORT est défini
+    demarrer_serveur_metriques()
+    return ClaudeService()
+
+
 def init_session_state():
     """Initialise les variables de session"""
     if 'analysis_done' not in st.session_state:
@@ -379,6 +399,28 @@ def init_session_state():
     # Compteur d'essais gratuits
     if 'free_trials' not in st.session_state:
         st.session_state.free_trials = 3
+    # Étapes à relancer après une analyse partielle, et ses paramètres
+    if 'etapes_en_echec' not in st.session_state:
+        st.session_state.etapes_en_echec = []
+    if 'parametres_analyse' not in st.session_state:
+        st.session_state.parametres_analyse = None
+    # Empreinte des entrées de chaque étape obtenue (réanalyse incrémentale)
+    if 'empreintes' not in st.session_state:
+        st.session_state.empreintes = {}
+    # Score local affiché en attendant le score de l'analyse
+    if 'score_provisoire' not in st.session_state:
+        st.session_state.score_provisoire = None
+    # Dernier balayage de toutes les niches pour le CV
+    if 'balayage_niches' not in st.session_state:
+        st.session_state.balayage_niches = None
+    # Dernière comparaison de plusieurs offres (avec analyse ATS des meilleures)
+    if 'comparaison_offres' not in st.session_state:
+        st.session_state.comparaison_offres = None
+    # Trace du CV importé : import, analyses et relances partagent son identifiant
+    if 'trace_id' not in st.session_state:
+        st.session_state.trace_id = None
+    if 'trace_fichier' not in st.session_state:
+        st.session_state.trace_fichier = None
 
 
 def display_header():
@@ -416,6 +458,214 @@ def display_score(score: int):
     """, unsafe_allow_html=True)
 
 
+def display_provisional_score(score_local: dict):
+    """Affiche le score provisoire calculé localement, en attendant celui de l'analyse"""
+    display_score(score_local["score"])
+    st.caption(
+        "⚡ Score provisoire calculé localement (mots-clés, structure, chiffres) : "
+        "il sera remplacé par le score de l'analyse complète"
+    )
+    if score_local.get("termes_absents"):
+        st.caption("🔍 Termes attendus absents du CV : " + ", ".join(score_local["termes_absents"][:8]))
+
+
+def display_niche_sweep(balayage: dict):
+    """Affiche la note du CV pour chaque niche, la plus adaptée d'abord"""
+    lignes = [
+        {
+            "Niche": ligne["nom"],
+            "Score": ligne["score"],
+            "Score local": ligne["score_local"],
+            "Verdict": ligne["verdict"] or ligne["error"] or "",
+            "Manques": ", ".join(ligne["manques"])
+        }
+        for ligne in balayage["niches"]
+    ]
+    st.dataframe(lignes, hide_index=True, use_container_width=True)
+    meilleure = balayage["niches"][0]
+    if meilleure["score"] is not None:
+        st.success(f"🎯 Niche la plus adaptée : **{meilleure['nom']}** ({meilleure['score']}/100)")
+    st.caption(f"💰 {balayage['tokens_used']} tokens (${balayage['cout']:.4f}) pour {len(lignes)} niches")
+
+
+def split_offers(texte: str) -> list:
+    """Sépare les offres collées les unes à la suite des autres (ligne '---' entre deux offres)"""
+    return [offre.strip() for offre in re.split(r'^\s*-{3,}\s*$', texte, flags=re.MULTILINE) if offre.strip()]
+
+
+def display_offer_ranking(classement: list, offres: list):
+    """Affiche le classement des offres, avec le détail ATS des offres analysées"""
+    lignes = []
+    for rang, ligne in enumerate(classement, 1):
+        analyse_ats = ligne.get("analyse_ats")
+        lignes.append({
+            "Rang": rang,
+            "Offre": offres[ligne["indice"]].splitlines()[0][:60],
+            "Score local": ligne["score_local"],
+            "Couverture": ligne["taux_couverture"],
+            "Score ATS": analyse_ats.get("score_ats") if analyse_ats else None,
+            "Mots-clés requis absents": ", ".join(ligne["mots_cles_absents"][:5])
+        })
+    st.dataframe(lignes, hide_index=True, use_container_width=True)
+    
+    for rang, ligne in enumerate(classement, 1):
+        if ligne.get("analyse_ats"):
+            titre = offres[ligne["indice"]].splitlines()[0][:60]
+            with st.expander(f"🤖 {rang}. {titre} - ATS {ligne['analyse_ats'].get('score_ats', 0)}/100"):
+                for reco in ligne["analyse_ats"].get("recommandations", []):
+                    st.markdown(f"- {reco}")
+        elif ligne.get("error"):
+            st.caption(f"⚠️ Offre {rang} : {ligne['error']}")
+
+
+# Libellés de progression par étape : (en cours, terminée)
+# Durée maximale d'une analyse : une étape plus lente est rendue en échec
+DELAI_MAX_ANALYSE = 90.0  # secondes
+
+PROGRESS_LABELS = {
+    "analysis": ("Analyse du CV", "Analyse terminée"),
+    "ameliorations": ("Améliorations section par section", "Améliorations générées"),
+    "checklist": ("Checklist d'actions", "Checklist créée"),
+    "analyse_ats": ("Analyse ATS", "Analyse ATS terminée"),
+}
+
+
+def display_progress(placeholder, etats: dict):
+    """Affiche l'état d'avancement de chaque étape (active, completed ou failed)"""
+    steps_html = ""
+    for cle, etat in etats.items():
+        en_cours, terminee = PROGRESS_LABELS[cle]
+        if etat == "completed":
+            steps_html += f'<div class="progress-step completed">✅ {terminee}</div>'
+        elif etat == "failed":
+            steps_html += f'<div class="progress-step">❌ {en_cours} : échec</div>'
+        else:
+            steps_html += f'<div class="progress-step active">⏳ {en_cours}...</div>'
+    placeholder.markdown(f'<div class="progress-container">{steps_html}</div>', unsafe_allow_html=True)
+
+
+def update_live_preview(apercu: dict, cle: str, type_bloc: str, donnees: dict):
+    """Ajoute à l'aperçu un en-tête ou un bloc reçu pendant le streaming"""
+    if cle == "analysis":
+        if type_bloc == "entete":
+            apercu["score_global"] = donnees.get("score_global")
+        else:
+            apercu["criteres"].append(donnees)
+    elif cle == "checklist":
+        if type_bloc == "entete":
+            apercu["checklist"] = donnees
+        else:
+            apercu["actions"].append(donnees)
+    elif cle == "ameliorations":
+        apercu["ameliorations"].append(donnees)
+
+
+def sections_to_blocks(cle: str, donnees: dict) -> list:
+    """Découpe une section complète (mode rapport unique) en blocs d'aperçu"""
+    if cle == "analysis":
+        return [("entete", donnees)] + [("bloc", critere) for critere in donnees.get("criteres", [])]
+    if cle == "checklist":
+        return [("entete", donnees)] + [("bloc", action) for action in donnees.get("actions", [])]
+    if cle == "ameliorations":
+        return [("bloc", amelioration) for amelioration in donnees.get("ameliorations", [])]
+    return []
+
+
+def display_live_preview(placeholder, apercu: dict):
+    """Affiche les résultats partiels reçus pendant que la génération continue"""
+    with placeholder.container():
+        st.caption("⏳ Aperçu en direct - l'analyse continue...")
+        if apercu["score_global"]:
+            display_score(apercu["score_global"])
+        elif st.session_state.score_provisoire:
+            display_provisional_score(st.session_state.score_provisoire)
+        
+        tab1, tab2, tab3 = st.tabs(["📊 Score & Analyse", "✅ Plan d'Action", "📝 Améliorations"])
+        
+        with tab1:
+            for criterion in apercu["criteres"]:
+                st.markdown(f"**{criterion['nom']}** - {criterion.get('score', '?')}/20")
+                for point in criterion.get("ameliorations", []):
+                    st.markdown(f"- 🔸 {point}")
+        
+        with tab2:
+            checklist = apercu["checklist"]
+            if checklist.get("score_potentiel"):
+                st.markdown(f"🎯 **{checklist.get('score_actuel', 0)} → {checklist.get('score_potentiel', 0)}** "
+                            f"(⏱️ {checklist.get('temps_total_estime', 'N/A')})")
+            for idx, action in enumerate(apercu["actions"], 1):
+                st.markdown(f"**Action {idx} : {action.get('titre', 'Action')}** (+{action.get('impact_points', 0)} pts)")
+                if action.get("action_concrete"):
+                    st.success(action["action_concrete"])
+        
+        with tab3:
+            for amelioration in apercu["ameliorations"]:
+                st.markdown(f"📌 **{amelioration.get('section', 'Section')}** : {amelioration.get('titre', '')}")
+
+
+def display_stage_errors(echecs: dict):
+    """Affiche l'erreur de chaque étape en échec (une seule fois par réponse partagée)"""
+    groupes = []
+    for cle, resultat in echecs.items():
+        groupe = next((g for g in groupes if g[1] is resultat), None)
+        if groupe:
+            groupe[0].append(cle)
+        else:
+            groupes.append(([cle], resultat))
+    for cles, resultat in groupes:
+        libelles = ", ".join(PROGRESS_LABELS[cle][0] for cle in cles)
+        st.error(f"❌ {libelles} : {resultat.get('error', 'Erreur inconnue')}")
+        if resultat.get('raw_response'):
+            with st.expander("🔍 Réponse brute (debug)"):
+                st.code(resultat['raw_response'], language="text")
+
+
+def retry_failed_stages(live_placeholder):
+    """Relance uniquement les étapes en échec de la dernière analyse et fusionne leurs résultats"""
+    parametres = st.session_state.parametres_analyse
+    etapes = list(st.session_state.etapes_en_echec)
+    progress_placeholder = st.empty()
+    
+    service = get_service()
+    etats = {cle: "active" for cle in etapes}
+    display_progress(progress_placeholder, etats)
+    apercu = {"score_global": None, "criteres": [], "checklist": {}, "actions": [], "ameliorations": []}
+    echecs_etapes = {}
+    
+    def on_etape_terminee(cle, resultat):
+        etats[cle] = "completed" if resultat.get("success", True) else "failed"
+        display_progress(progress_placeholder, etats)
+        if not resultat.get("success", True):
+            echecs_etapes[cle] = resultat
+    
+    def on_bloc(cle, type_bloc, donnees):
+        update_live_preview(apercu, cle, type_bloc, donnees)
+        display_live_preview(live_placeholder, apercu)
+    
+    # Les étapes réussies ont les empreintes des mêmes entrées : seules celles en échec sont relancées
+    with get_traceur().span("cv.relance", trace_id=st.session_state.trace_id):
+        analyse = service.reanalyser(
+            cv_text=parametres["cv_text"],
+            niche=parametres["niche"],
+            offre=parametres["offre"],
+            precedent={"results": st.session_state.results, "empreintes": st.session_state.empreintes},
+            prechauffer_cache=True,
+            delai_max=DELAI_MAX_ANALYSE,
+            on_etape_terminee=on_etape_terminee,
+            on_bloc=on_bloc
+        )
+    live_placeholder.empty()
+    
+    st.session_state.results = dict(analyse["results"])
+    st.session_state.empreintes = dict(analyse["empreintes"])
+    echecs = {cle: echecs_etapes.get(cle, analyse) for cle in analyse.get("etapes_en_echec", [])}
+    st.session_state.etapes_en_echec = list(echecs)
+    st.session_state.analysis_done = bool(st.session_state.results)
+    
+    if echecs:
+        display_stage_errors(echecs)
+    else:
+        st.success(f"🎉 Étapes relancées avec succès en {analyse['duree_totale']:.1f}s !")
 
 
 def display_example_before_after():
@@ -528,7 +778,7 @@ def main():
         # Vérification de la clé API
         api_configured = False
         try:
-            service = ClaudeService()
+            service = get_service()
             api_configured = True
             st.markdown("""
             <div style='background: rgba(46, 213, 115, 0.2); padding: 0.8rem; border-radius: 8px; margin: 1rem 0;'>
@@ -562,6 +812,40 @@ def main():
                 """)
             # Ne pas return, continuer l'affichage de l'interface
         
+        # Cache des réponses partagé entre les sessions
+        cache_stats = get_cache().stats()
+        regroupes = get_coalescence().stats()["regroupes"]
+        st.caption(
+            f"♻️ Cache des analyses : {cache_stats['hits_memoire'] + cache_stats['hits_disque']} réutilisées, "
+            f"{cache_stats['misses']} calculées"
+            + (f", {regroupes} requêtes identiques regroupées" if regroupes else "")
+        )
+        
+        # Latence et coût par étape (pour ajuster ROUTAGE_ETAPES)
+        stats_etapes = get_stats_etapes().stats()
+        if stats_etapes:
+            with st.expander("📊 Latence et coût par étape"):
+                for etape, modeles in stats_etapes.items():
+                    for modele, stats in modeles.items():
+                        st.caption(
+                            f"**{etape}** ({modele}) : {stats['appels']} appels, "
+                            f"p50 {stats['latence_p50']:.1f}s, p95 {stats['latence_p95']:.1f}s, "
+                            f"p99 {stats['latence_p99']:.1f}s, ${stats['cout_total']:.4f}"
+                            + (f", {stats['erreurs']} erreurs" if stats['erreurs'] else "")
+                            + (f", {stats['escalades']} escalades" if stats['escalades'] else "")
+                            + (f", {stats['couvertures']} couvertures (${stats['cout_couvertures']:.4f})" if stats['couvertures'] else "")
+                            + (f", {stats['delais_depasses']} délais dépassés" if stats['delais_depasses'] else "")
+                        )
+                # Mêmes mesures que l'export Prometheus (/metrics, voir metriques.py)
+                modeles = [stats for modeles in stats_etapes.values() for stats in modeles.values()]
+                tokens_total = sum(sum(stats["tokens"].values()) for stats in modeles)
+                cout_total = sum(stats["cout_total"] for stats in modeles)
+                cout_couvertures = sum(stats["cout_couvertures"] for stats in modeles)
+                st.caption(
+                    f"💰 Total : {tokens_total} tokens, ${cout_total:.4f}"
+                    + (f" dont ${cout_couvertures:.4f} de couvertures" if cout_couvertures else "")
+                )
+        
         st.markdown("---")
         st.markdown("### 🛠️ Stack Technique")
         st.markdown("""
@@ -584,6 +868,11 @@ def main():
     # Zone principale
     col1, col2 = st.columns([1, 1])
     
+    # Titre des résultats et aperçu progressif pendant l'analyse
+    with col2:
+        st.markdown('<div class="card-title">📊 Résultats de l\'analyse</div>', unsafe_allow_html=True)
+        live_placeholder = st.empty()
+    
     with col1:
         st.markdown('<div class="card-title">📤 Étape 1 : Import du CV</div>', unsafe_allow_html=True)
         
@@ -594,27 +883,36 @@ def main():
         )
         
         if uploaded_file:
-            # Validation du PDF
-            is_valid, error_message = validate_pdf(uploaded_file)
+            # Nouvelle trace à chaque nouveau fichier
+            fichier = (uploaded_file.name, uploaded_file.size)
+            if st.session_state.trace_fichier != fichier:
+                st.session_state.trace_fichier = fichier
+                st.session_state.trace_id = nouvel_id_trace()
             
-            if not is_valid:
-                st.error(f"❌ {error_message}")
-                return
-            
-            st.success(f"✅ CV chargé : {uploaded_file.name}")
-            
-            # Extraction du texte
-            try:
-                cv_text = extract_text_from_pdf(uploaded_file)
-                cv_text = clean_text(cv_text)
-                st.session_state.cv_text = cv_text
+            with get_traceur().span(
+                "cv.import", trace_id=st.session_state.trace_id, **{"cv.fichier": uploaded_file.name}
+            ):
+                # Validation du PDF
+                is_valid, error_message = validate_pdf(uploaded_file)
                 
-                with st.expander("👁️ Aperçu du texte extrait"):
-                    st.text_area("Texte du CV", cv_text, height=200, disabled=True)
-            
-            except Exception as e:
-                st.error(f"❌ Erreur d'extraction : {str(e)}")
-                return
+                if not is_valid:
+                    st.error(f"❌ {error_message}")
+                    return
+                
+                st.success(f"✅ CV chargé : {uploaded_file.name}")
+                
+                # Extraction du texte
+                try:
+                    cv_text = extract_text_from_pdf(uploaded_file)
+                    cv_text = clean_text(cv_text)
+                    st.session_state.cv_text = cv_text
+                    
+                    with st.expander("👁️ Aperçu du texte extrait"):
+                        st.text_area("Texte du CV", cv_text, height=200, disabled=True)
+                
+                except Exception as e:
+                    st.error(f"❌ Erreur d'extraction : {str(e)}")
+                    return
         
         st.markdown("<br>", unsafe_allow_html=True)
         st.markdown('<div class="card-title">🎯 Étape 2 : Configuration</div>', unsafe_allow_html=True)
@@ -641,6 +939,63 @@ def main():
             help="Plus l'offre est détaillée, plus l'optimisation sera précise"
         )
         
+        # Aide au choix de la niche : note courte du CV pour chacune
+        if st.session_state.cv_text and api_configured:
+            balayage = st.session_state.balayage_niches
+            offre_balayage = job_offer.strip() or None
+            a_jour = (
+                balayage
+                and balayage["cv_text"] == st.session_state.cv_text
+                and balayage["offre"] == offre_balayage
+            )
+            if not a_jour and st.session_state.free_trials > 0 and st.button(
+                "🧭 Quelle niche me correspond ? (toutes les niches comparées)", type="secondary"
+            ):
+                st.session_state.free_trials -= 1
+                try:
+                    with st.spinner("Évaluation du CV pour chaque niche..."), get_traceur().span(
+                        "cv.balayage_niches", trace_id=st.session_state.trace_id
+                    ):
+                        resultat = get_service().balayer_niches(
+                            st.session_state.cv_text, offre_balayage, delai_max=DELAI_MAX_ANALYSE
+                        )
+                    if not resultat["success"]:
+                        raise RuntimeError(resultat["error"])
+                    st.session_state.balayage_niches = {
+                        **resultat, "cv_text": st.session_state.cv_text, "offre": offre_balayage
+                    }
+                    a_jour = True
+                except Exception as e:
+                    st.session_state.free_trials += 1
+                    st.error(f"❌ Erreur : {str(e)}")
+                    st.info("ℹ️ Votre essai a été remboursé suite à l'erreur")
+            if a_jour:
+                display_niche_sweep(st.session_state.balayage_niches)
+        
+        # Mode d'analyse (comparaison des deux stratégies d'appel)
+        with st.expander("⚙️ Options avancées"):
+            analysis_mode = st.radio(
+                "Mode d'analyse",
+                options=["etapes", "rapport_unique"],
+                format_func=lambda x: {
+                    "etapes": "4 appels en parallèle",
+                    "rapport_unique": "Rapport unique (1 appel)"
+                }[x],
+                horizontal=True,
+                help="Le rapport unique envoie le CV une seule fois : moins de tokens, mais une seule réponse plus longue"
+            )
+            reuse_stages = st.checkbox(
+                "♻️ Ne relancer que les étapes dont les entrées ont changé",
+                value=True,
+                help="Pour le même CV, un changement d'offre ou de niche ne recalcule que les étapes concernées"
+            )
+        
+        # Score provisoire local, affiché dès l'upload (quelques millisecondes)
+        if st.session_state.cv_text:
+            st.session_state.score_provisoire = score_provisoire(
+                st.session_state.cv_text, selected_niche_key, job_offer.strip() or None
+            )
+        
         st.markdown("<br>", unsafe_allow_html=True)
         
         # Bouton d'analyse
@@ -659,7 +1014,21 @@ def main():
                     st.session_state.free_trials = 3
                     st.rerun()
             else:
-                if st.button("🚀 Analyser et Optimiser Mon CV", type="primary"):
+                offre = job_offer if job_offer.strip() else None
+                
+                # Analyse précédente, dont reanalyser reprend les étapes aux entrées inchangées
+                precedent = None
+                if reuse_stages and st.session_state.results:
+                    precedent = {"results": st.session_state.results, "empreintes": st.session_state.empreintes}
+                reutilisables = etapes_reutilisables(st.session_state.cv_text, selected_niche_key, offre, precedent)
+                
+                lancer_analyse = st.button("🚀 Analyser et Optimiser Mon CV", type="primary")
+                if lancer_analyse and len(reutilisables) == len(ETAPES_ANALYSE):
+                    # Rien à recalculer : aucun essai consommé
+                    st.info("♻️ CV, niche et offre inchangés : les résultats affichés sont à jour")
+                    lancer_analyse = False
+                
+                if lancer_analyse:
                     # Décrémente le compteur
                     st.session_state.free_trials -= 1
                     
@@ -668,124 +1037,105 @@ def main():
                     status_placeholder = st.empty()
                     
                     try:
-                        service = ClaudeService()
-                        
-                        # Étape 1 : Analyse
-                        progress_placeholder.markdown("""
-                        <div class="progress-container">
-                            <div class="progress-step active">⏳ Analyse du CV en cours...</div>
-                            <div class="progress-step">⏸️ Réécriture optimisée</div>
-                            <div class="progress-step">⏸️ Génération des suggestions</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        analysis_result = service.analyser_cv(
-                            cv_text=st.session_state.cv_text,
-                            niche=selected_niche_key,
-                            offre=job_offer if job_offer.strip() else None
-                        )
-                        
-                        if not analysis_result["success"]:
-                            st.error(f"❌ Erreur : {analysis_result.get('error', 'Erreur inconnue')}")
-                            return
-                        
-                        # Étape 2 : Améliorations sections
-                        progress_placeholder.markdown("""
-                        <div class="progress-container">
-                            <div class="progress-step completed">✅ Analyse terminée</div>
-                            <div class="progress-step active">⏳ Améliorations section par section...</div>
-                            <div class="progress-step">⏸️ Checklist d'actions</div>
-                            <div class="progress-step">⏸️ Analyse ATS</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        ameliorations_result = service.generer_ameliorations_sections(
-                            cv_text=st.session_state.cv_text,
-                            niche=selected_niche_key,
-                            offre=job_offer if job_offer.strip() else None
-                        )
+                        service = get_service()
                         
-                        if not ameliorations_result["success"]:
-                            st.error(f"❌ Erreur : {ameliorations_result.get('error', 'Erreur inconnue')}")
-                            if ameliorations_result.get('raw_response'):
-                                with st.expander("🔍 Réponse brute (debug)"):
-                                    st.code(ameliorations_result['raw_response'], language="text")
-                            return
+                        # Chaque étape réussie est conservée dès sa fin, même si une autre échoue
+                        st.session_state.results = dict(reutilisables)
+                        st.session_state.empreintes = {cle: precedent["empreintes"][cle] for cle in reutilisables}
+                        st.session_state.analysis_done = False
+                        st.session_state.etapes_en_echec = []
+                        st.session_state.parametres_analyse = {
+                            "cv_text": st.session_state.cv_text,
+                            "niche": selected_niche_key,
+                            "offre": offre
+                        }
                         
-                        # Étape 3 : Checklist
-                        progress_placeholder.markdown("""
-                        <div class="progress-container">
-                            <div class="progress-step completed">✅ Analyse terminée</div>
-                            <div class="progress-step completed">✅ Améliorations générées</div>
-                            <div class="progress-step active">⏳ Checklist d'actions...</div>
-                            <div class="progress-step">⏸️ Analyse ATS</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        etats = {cle: "completed" if cle in reutilisables else "active" for cle in ETAPES_ANALYSE}
+                        display_progress(progress_placeholder, etats)
+                        apercu = {"score_global": None, "criteres": [], "checklist": {}, "actions": [], "ameliorations": []}
+                        echecs_etapes = {}
                         
-                        checklist_result = service.generer_checklist_actions(
-                            cv_text=st.session_state.cv_text,
-                            niche=selected_niche_key,
-                            offre=job_offer if job_offer.strip() else None
-                        )
+                        def on_etape_terminee(cle, resultat):
+                            etats[cle] = "completed" if resultat.get("success", True) else "failed"
+                            display_progress(progress_placeholder, etats)
+                            if resultat.get("success") and cle in resultat:
+                                st.session_state.results[cle] = resultat[cle]
+                            elif not resultat.get("success", True):
+                                echecs_etapes[cle] = resultat
                         
-                        if not checklist_result["success"]:
-                            st.error(f"❌ Erreur : {checklist_result.get('error', 'Erreur inconnue')}")
-                            if checklist_result.get('raw_response'):
-                                with st.expander("🔍 Réponse brute (debug)"):
-                                    st.code(checklist_result['raw_response'], language="text")
-                            return
-                        
-                        # Étape 4 : Analyse ATS
-                        progress_placeholder.markdown("""
-                        <div class="progress-container">
-                            <div class="progress-step completed">✅ Analyse terminée</div>
-                            <div class="progress-step completed">✅ Améliorations générées</div>
-                            <div class="progress-step completed">✅ Checklist créée</div>
-                            <div class="progress-step active">⏳ Analyse ATS...</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        def on_bloc(cle, type_bloc, donnees):
+                            update_live_preview(apercu, cle, type_bloc, donnees)
+                            display_live_preview(live_placeholder, apercu)
                         
-                        ats_result = service.analyser_ats(
-                            cv_text=st.session_state.cv_text,
-                            niche=selected_niche_key,
-                            offre=job_offer if job_offer.strip() else None
-                        )
+                        def on_section_terminee(cle, donnees):
+                            st.session_state.results[cle] = donnees
+                            on_etape_terminee(cle, {"success": True})
+                            for type_bloc, bloc in sections_to_blocks(cle, donnees):
+                                on_bloc(cle, type_bloc, bloc)
                         
-                        if not ats_result["success"]:
-                            st.error(f"❌ Erreur : {ats_result.get('error', 'Erreur inconnue')}")
-                            if ats_result.get('raw_response'):
-                                with st.expander("🔍 Réponse brute (debug)"):
-                                    st.code(ats_result['raw_response'], language="text")
-                            return
+                        attributs_trace = {"cv.niche": selected_niche_key, "cv.mode": analysis_mode, "cv.offre": bool(offre)}
                         
-                        # Succès !
-                        progress_placeholder.markdown("""
-                        <div class="progress-container">
-                            <div class="progress-step completed">✅ Analyse terminée</div>
-                            <div class="progress-step completed">✅ Améliorations générées</div>
-                            <div class="progress-step completed">✅ Checklist créée</div>
-                            <div class="progress-step completed">✅ Analyse ATS terminée</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                        # En mode étapes, la première étape à recalculer écrit seule
+                        # le préfixe CV/offre dans le cache de prompt ; les suivantes
+                        # sont ensuite lancées simultanément et le relisent
+                        with get_traceur().span("cv.analyse", trace_id=st.session_state.trace_id, **attributs_trace):
+                            analyse = service.reanalyser(
+                                cv_text=st.session_state.cv_text,
+                                niche=selected_niche_key,
+                                offre=offre,
+                                precedent=precedent,
+                                prechauffer_cache=True,
+                                mode=analysis_mode,
+                                delai_max=DELAI_MAX_ANALYSE,
+                                on_etape_terminee=on_etape_terminee,
+                                on_bloc=on_bloc,
+                                on_section_terminee=on_section_terminee
+                            )
                         
-                        # Stockage des résultats
-                        total_tokens = (
-                            analysis_result.get("tokens_used", 0) +
-                            ameliorations_result.get("tokens_used", 0) +
-                            checklist_result.get("tokens_used", 0) +
-                            ats_result.get("tokens_used", 0)
-                        )
+                        # Sections reparsées en cas d'escalade : la réponse finale fait foi
+                        st.session_state.results = dict(analyse["results"])
+                        st.session_state.empreintes = dict(analyse["empreintes"])
+                        # Une erreur du rapport unique vaut pour toutes ses sections manquantes
+                        echecs = {cle: echecs_etapes.get(cle, analyse) for cle in analyse.get("etapes_en_echec", [])}
+                        st.session_state.etapes_en_echec = list(echecs)
+                        st.session_state.analysis_done = bool(st.session_state.results)
+                        live_placeholder.empty()
                         
-                        st.session_state.results = {
-                            "analysis": analysis_result["analysis"],
-                            "ameliorations": ameliorations_result["ameliorations"],
-                            "checklist": checklist_result["checklist"],
-                            "analyse_ats": ats_result["analyse_ats"]
-                        }
-                        st.session_state.analysis_done = True
+                        if not echecs:
+                            st.success("🎉 Analyse complète terminée avec succès !")
+                        else:
+                            display_stage_errors(echecs)
+                            if st.session_state.results:
+                                st.warning(
+                                    f"⚠️ Analyse partielle : {len(st.session_state.results)}/{len(ETAPES_ANALYSE)} étapes réussies. "
+                                    "Les résultats obtenus sont affichés ; relancez uniquement les étapes en échec ci-dessous."
+                                )
                         
-                        st.success("🎉 Analyse complète terminée avec succès !")
-                        st.info(f"💬 Tokens utilisés : {total_tokens} (~{total_tokens/1000:.2f}k)")
+                        total_tokens = analyse["total_tokens"]
+                        tokens_detail = analyse["tokens_detail"]
+                        st.info(f"💬 Tokens utilisés : {total_tokens} (~{total_tokens/1000:.2f}k) - Durée : {analyse['duree_totale']:.1f}s")
+                        # À communiquer en cas de lenteur : retrouve le détail par étape dans le fichier CV_TRACES
+                        st.caption(f"🔎 Trace : `{st.session_state.trace_id}`")
+                        if analyse["etapes_reutilisees"]:
+                            st.caption(
+                                "♻️ Entrées inchangées, résultats réutilisés : "
+                                + ", ".join(PROGRESS_LABELS[cle][0] for cle in analyse["etapes_reutilisees"])
+                            )
+                        if tokens_detail.get("cache_read_input_tokens") or tokens_detail.get("cache_creation_input_tokens"):
+                            st.caption(
+                                f"♻️ Cache : {tokens_detail.get('cache_read_input_tokens', 0)} tokens relus, "
+                                f"{tokens_detail.get('cache_creation_input_tokens', 0)} tokens écrits"
+                            )
+                        reductions = [
+                            reduction
+                            for budget in analyse["budgets_entree"].values()
+                            for reduction in budget.get("reductions", [])
+                        ]
+                        if reductions:
+                            st.caption(
+                                f"✂️ CV/offre trop longs : {sum(r['tokens_gagnes'] for r in reductions)} tokens retirés "
+                                f"({', '.join(sorted({r['reduction'] for r in reductions}))})"
+                            )
                         
                         # Message essais restants
                         trials_left = st.session_state.free_trials
@@ -794,7 +1144,8 @@ def main():
                         else:
                             st.warning("⚠️ C'était votre dernier essai gratuit ! Passez Premium pour continuer.")
                         
-                        st.balloons()
+                        if not echecs:
+                            st.balloons()
                         
                     except Exception as e:
                         # En cas d'erreur, on rembourse l'essai
@@ -803,71 +1154,145 @@ def main():
                         st.info("ℹ️ Votre essai a été remboursé suite à l'erreur")
                         with st.expander("🔍 Détails de l'erreur"):
                             st.code(traceback.format_exc())
+            
+            # Reprise d'une analyse partielle : sans nouvel essai ni appel pour les étapes déjà réussies
+            parametres = st.session_state.parametres_analyse
+            if (
+                api_configured
+                and st.session_state.etapes_en_echec
+                and parametres
+                and parametres["cv_text"] == st.session_state.cv_text
+            ):
+                etapes_libelles = ", ".join(PROGRESS_LABELS[cle][0] for cle in st.session_state.etapes_en_echec)
+                st.caption(f"Étapes en échec : {etapes_libelles}")
+                if st.button("🔁 Relancer les étapes en échec", type="secondary"):
+                    try:
+                        retry_failed_stages(live_placeholder)
+                    except Exception as e:
+                        st.error(f"❌ Erreur : {str(e)}")
+                        with st.expander("🔍 Détails de l'erreur"):
+                            st.code(traceback.format_exc())
+            
+            # Plusieurs offres sauvegardées : classement local immédiat, analyse ATS des meilleures
+            if st.checkbox("📚 Comparer plusieurs offres", key="compare_offers"):
+                offers_text = st.text_area(
+                    "Collez vos offres, séparées par une ligne ---",
+                    height=200,
+                    placeholder="Offre 1...\n---\nOffre 2...",
+                    key="offers_text"
+                )
+                offres_comparees = split_offers(offers_text)
+                if len(offres_comparees) >= 2:
+                    if api_configured and st.session_state.free_trials > 0 and st.button(
+                        "🤖 Analyser les 3 meilleures offres (ATS)", type="secondary"
+                    ):
+                        st.session_state.free_trials -= 1
+                        try:
+                            with st.spinner("Analyse ATS des meilleures offres..."), get_traceur().span(
+                                "cv.comparaison_offres", trace_id=st.session_state.trace_id
+                            ):
+                                resultat = get_service().comparer_offres(
+                                    st.session_state.cv_text, selected_niche_key, offres_comparees,
+                                    delai_max=DELAI_MAX_ANALYSE
+                                )
+                            st.session_state.comparaison_offres = {
+                                "offres": offres_comparees,
+                                "cv_text": st.session_state.cv_text,
+                                "niche": selected_niche_key,
+                                "classement": resultat["offres"]
+                            }
+                        except Exception as e:
+                            st.session_state.free_trials += 1
+                            st.error(f"❌ Erreur : {str(e)}")
+                            st.info("ℹ️ Votre essai a été remboursé suite à l'erreur")
+                            with st.expander("🔍 Détails de l'erreur"):
+                                st.code(traceback.format_exc())
+                    
+                    comparaison = st.session_state.comparaison_offres
+                    if (
+                        comparaison
+                        and comparaison["offres"] == offres_comparees
+                        and comparaison["cv_text"] == st.session_state.cv_text
+                        and comparaison["niche"] == selected_niche_key
+                    ):
+                        classement = comparaison["classement"]
+                    else:
+                        # Classement local immédiat, sans appel ni essai consommé
+                        classement = classer_offres_localement(
+                            st.session_state.cv_text, selected_niche_key, offres_comparees
+                        )
+                    display_offer_ranking(classement, offres_comparees)
+                elif offers_text.strip():
+                    st.caption("Ajoutez au moins deux offres, séparées par une ligne ---")
     
     with col2:
-        st.markdown('<div class="card-title">📊 Résultats de l\'analyse</div>', unsafe_allow_html=True)
-        
         if st.session_state.analysis_done and st.session_state.results:
             results = st.session_state.results
-            analysis = results["analysis"]
+            analysis = results.get("analysis")
             
             # Affichage du score
-            display_score(analysis["score_global"])
+            if analysis:
+                display_score(analysis["score_global"])
+            elif st.session_state.score_provisoire:
+                display_provisional_score(st.session_state.score_provisoire)
             
             # Nouveaux onglets axés sur l'amélioration
             tab1, tab2, tab3, tab4 = st.tabs(["📊 Score & Analyse", "✅ Plan d'Action", "📝 Améliorations Détaillées", "🤖 Optimisation ATS"])
             
             with tab1:
-                st.markdown("### 📈 Vue d'ensemble")
+                if not analysis:
+                    st.warning("⚠️ L'analyse du CV a échoué : relancez les étapes en échec pour obtenir le score détaillé.")
+                else:
+                    st.markdown("### 📈 Vue d'ensemble")
                 
-                # Métriques en ligne
-                metrics_cols = st.columns(len(analysis["criteres"]))
-                for idx, criterion in enumerate(analysis["criteres"]):
-                    with metrics_cols[idx]:
-                        st.markdown(f"""
-                        <div class="metric-card">
-                            <div class="metric-value">{criterion['score']}</div>
-                            <div class="metric-label">{criterion['nom'].split()[0]}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
+                    # Métriques en ligne
+                    metrics_cols = st.columns(len(analysis["criteres"]))
+                    for idx, criterion in enumerate(analysis["criteres"]):
+                        with metrics_cols[idx]:
+                            st.markdown(f"""
+                            <div class="metric-card">
+                                <div class="metric-value">{criterion['score']}</div>
+                                <div class="metric-label">{criterion['nom'].split()[0]}</div>
+                            </div>
+                            """, unsafe_allow_html=True)
                 
-                st.markdown("<br>", unsafe_allow_html=True)
-                st.markdown("### 🔍 Analyse détaillée par critère")
+                    st.markdown("<br>", unsafe_allow_html=True)
+                    st.markdown("### 🔍 Analyse détaillée par critère")
                 
-                # Critères avec accordéon visuel
-                for idx, criterion in enumerate(analysis["criteres"]):
-                    with st.expander(f"{'🟢' if criterion['score'] >= 16 else '🟡' if criterion['score'] >= 12 else '🔴'} {criterion['nom']} - {criterion['score']}/20", expanded=idx==0):
+                    # Critères avec accordéon visuel
+                    for idx, criterion in enumerate(analysis["criteres"]):
+                        with st.expander(f"{'🟢' if criterion['score'] >= 16 else '🟡' if criterion['score'] >= 12 else '🔴'} {criterion['nom']} - {criterion['score']}/20", expanded=idx==0):
                         
-                        col_a, col_b = st.columns(2)
+                            col_a, col_b = st.columns(2)
                         
-                        with col_a:
-                            if criterion.get('points_forts'):
-                                st.markdown("**✅ Points forts**")
-                                for point in criterion['points_forts']:
-                                    st.markdown(f"- {point}")
+                            with col_a:
+                                if criterion.get('points_forts'):
+                                    st.markdown("**✅ Points forts**")
+                                    for point in criterion['points_forts']:
+                                        st.markdown(f"- {point}")
                         
-                        with col_b:
-                            if criterion.get('ameliorations'):
-                                st.markdown("**🔸 À améliorer**")
-                                for point in criterion['ameliorations']:
-                                    st.markdown(f"- {point}")
+                            with col_b:
+                                if criterion.get('ameliorations'):
+                                    st.markdown("**🔸 À améliorer**")
+                                    for point in criterion['ameliorations']:
+                                        st.markdown(f"- {point}")
                 
-                # Adéquation avec l'offre
-                if analysis.get("adequation_offre"):
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    st.markdown("### 🎯 Adéquation avec l'offre")
-                    st.info(analysis["adequation_offre"])
+                    # Adéquation avec l'offre
+                    if analysis.get("adequation_offre"):
+                        st.markdown("<br>", unsafe_allow_html=True)
+                        st.markdown("### 🎯 Adéquation avec l'offre")
+                        st.info(analysis["adequation_offre"])
                 
-                # Recommandations générales
-                if analysis.get("recommandations_generales"):
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    st.markdown("### 💡 Recommandations clés")
-                    for idx, reco in enumerate(analysis["recommandations_generales"], 1):
-                        st.markdown(f"""
-                        <div style='background: white; padding: 1rem; border-radius: 10px; margin: 0.5rem 0; border-left: 4px solid #667eea;'>
-                        <b>{idx}.</b> {reco}
-                        </div>
-                        """, unsafe_allow_html=True)
+                    # Recommandations générales
+                    if analysis.get("recommandations_generales"):
+                        st.markdown("<br>", unsafe_allow_html=True)
+                        st.markdown("### 💡 Recommandations clés")
+                        for idx, reco in enumerate(analysis["recommandations_generales"], 1):
+                            st.markdown(f"""
+                            <div style='background: white; padding: 1rem; border-radius: 10px; margin: 0.5rem 0; border-left: 4px solid #667eea;'>
+                            <b>{idx}.</b> {reco}
+                            </div>
+                            """, unsafe_allow_html=True)
             
             with tab2:
                 st.markdown("### ✅ Votre Plan d'Action Personnalisé")
@@ -1050,6 +1475,9 @@ def main():
                     st.warning("Aucune analyse ATS disponible")
         
         else:
+            if st.session_state.score_provisoire:
+                display_provisional_score(st.session_state.score_provisoire)
+            
             st.markdown("""
             <div class="custom-card" style='text-align: center; padding: 3rem;'>
                 <h2 style='color: #667eea; margin-bottom: 1rem;'>👈 Commencez l'analyse</h2>
@@ -0,0 +1,97 @@
+"""
+Extraction des mots-clés d'une offre et couverture locale par le CV (ats_local.py)
+"""
+
+from ats_local import analyser_couverture, analyser_couverture_offres, extraire_mots_cles
+from lexiques import get_index_lexique
+
+
+def mots(offre):
+    return [mot["mot"] for mot in extraire_mots_cles(offre)]
+
+
+def couverture(cv_text, offre):
+    return {mot["mot"]: mot for mot in analyser_couverture(cv_text, offre)["mots_cles_offre"]}
+
+
+def test_chaque_outil_cite_est_un_mot_cle():
+    assert mots("Stack : AWS, Azure, GCP, PostgreSQL, MongoDB, Django, Flask requis") == [
+        "AWS", "Azure", "GCP", "PostgreSQL", "MongoDB", "Django", "Flask"
+    ]
+
+
+def test_django_reste_distinct_de_python():
+    mots_cles = extraire_mots_cles("Python, Django, Kubernetes, AWS, CI/CD")
+    assert [mot["mot"] for mot in mots_cles] == ["Python", "Django", "Kubernetes", "AWS", "CI/CD"]
+    assert all(mot["occurrences_offre"] == 1 for mot in mots_cles)
+
+
+def test_synonymes_fusionnes_en_un_mot_cle():
+    assert extraire_mots_cles("Machine Learning requis\nExpérience en ML appréciée") == [
+        {"mot": "Machine Learning", "priorite": "HAUTE", "occurrences_offre": 2}
+    ]
+
+
+def test_villes_et_entreprises_ne_sont_pas_des_mots_cles():
+    offre = (
+        "Capgemini recrute un Data Engineer pour son agence de Bordeaux.\n"
+        "Au sein de l'équipe data de notre client Airbus, basé à Toulouse, vous industrialiserez des modèles.\n"
+        "Maîtrise de Python, Spark et Snowflake requise.\n"
+        "Économétrie appréciée."
+    )
+    assert mots(offre) == ["Python", "Spark", "Snowflake", "Économétrie"]
+
+
+def test_priorites_selon_la_ligne():
+    priorites = {mot["mot"]: mot["priorite"] for mot in extraire_mots_cles(
+        "Maîtrise de Python indispensable\nDocker\nKubernetes serait un plus"
+    )}
+    assert priorites == {"Python": "HAUTE", "Docker": "MOYENNE", "Kubernetes": "BASSE"}
+
+
+def test_azure_ne_couvre_pas_aws():
+    assert not couverture("Déploiements sur Azure", "AWS requis")["AWS"]["present"]
+
+
+def test_outil_ou_terme_voisin_ne_couvre_pas_le_mot_cle():
+    resultat = couverture("MongoDB, Pandas, API Google", "PostgreSQL, Python, API REST requis")
+    assert [mot for mot, detail in resultat.items() if detail["present"]] == []
+
+
+def test_synonymes_stricts_couvrent_le_mot_cle():
+    resultat = couverture(
+        "K8s en production, Postgres, JS et apprentissage automatique",
+        "Kubernetes, PostgreSQL, JavaScript, Machine Learning"
+    )
+    assert all(detail["present"] for detail in resultat.values())
+
+
+def test_formes_imbriquees_comptees_une_fois():
+    assert couverture("Je parle anglais courant", "Anglais requis")["Anglais"]["occurrences"] == 1
+
+
+def test_taux_de_couverture():
+    resultat = analyser_couverture("Python et Docker au quotidien", "Python, Docker, Kubernetes, AWS")
+    assert resultat["taux_couverture"] == "50%"
+
+
+def test_plusieurs_offres_comme_une_par_une():
+    cv_text = "Développeur Python Django, PostgreSQL, Docker, API REST"
+    offres = ["Python, Django et PostgreSQL requis", "Data Scientist : Pandas, NumPy, Machine Learning"]
+    assert analyser_couverture_offres(cv_text, offres) == [analyser_couverture(cv_text, offre) for offre in offres]
+
+
+def test_mots_courants_ne_couvrent_pas_les_acronymes():
+    assert not get_index_lexique("data_ai").rechercher("J'ai piloté la migration")
+    assert not get_index_lexique("tech_dev").rechercher("Le reste du temps je reste disponible")
+    assert not get_index_lexique("alternance").rechercher("Formation interne ; associé fondateur")
+
+
+def test_acronyme_reconnu_tel_quel():
+    assert get_index_lexique("data_ai").rechercher("Projets d'IA générative") == {"Intelligence artificielle": 1}
+    assert get_index_lexique("tech_dev").rechercher("Conception d'une API REST") == {"API REST": 1}
+
+
+def test_couverture_sans_faux_positif():
+    resultat = analyser_couverture("Le reste du temps, j'ai piloté une association de quartier", "API REST et IA requis")
+    assert resultat["taux_couverture"] == "0%"
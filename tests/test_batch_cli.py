@@ -0,0 +1,40 @@
+"""
+Lecture du manifeste et traitement d'un lot (batch_cli.py)
+"""
+
+import json
+
+import pytest
+
+from backends import BackendLocal
+from batch_cli import lire_entrees, traiter_lot
+from claude_service import ClaudeService
+from pdf_utils import markdown_to_pdf
+
+
+def ecrire_manifeste(dossier, lignes):
+    chemin = dossier / "manifeste.jsonl"
+    chemin.write_text("".join(json.dumps(ligne) + "\n" for ligne in lignes), encoding="utf-8")
+    return str(chemin)
+
+
+def test_niche_inconnue_refusee(tmp_path):
+    manifeste = ecrire_manifeste(tmp_path, [{"pdf": "cv.pdf"}, {"pdf": "cv.pdf", "niche": "devops"}])
+    with pytest.raises(ValueError, match="ligne 2"):
+        lire_entrees(manifeste, "tech_dev", None)
+
+
+def test_meme_pdf_analyse_pour_chaque_entree(tmp_path):
+    (tmp_path / "cv.pdf").write_bytes(markdown_to_pdf("# Jean Dupont\n\nDéveloppeur Python, Docker, AWS."))
+    manifeste = ecrire_manifeste(tmp_path, [
+        {"pdf": "cv.pdf", "niche": "tech_dev"},
+        {"pdf": "cv.pdf", "niche": "alternance"}
+    ])
+    sortie = tmp_path / "resultats.jsonl"
+    service = ClaudeService(backend=BackendLocal(), utiliser_cache=False)
+
+    bilan = traiter_lot(lire_entrees(manifeste, "tech_dev", None), str(sortie), service, workers_extraction=1)
+
+    lignes = sorted((json.loads(ligne) for ligne in sortie.read_text(encoding="utf-8").splitlines()), key=lambda l: l["entree"])
+    assert bilan["succes"] == 2
+    assert [(ligne["entree"], ligne["niche"]) for ligne in lignes] == [(0, "tech_dev"), (1, "alternance")]
@@ -0,0 +1,41 @@
+"""
+Cache des réponses partagé entre services (cache_resultats.py, ClaudeService._envoyer)
+"""
+
+from backends import BackendLocal
+from cache_resultats import CacheResultats
+from claude_service import ClaudeService
+
+CV = "Jean Dupont\nDéveloppeur Python, Docker, AWS\nExpérience : 5 ans chez Capgemini"
+
+
+class BackendEnPanne:
+    """Backend réel indisponible : chaque appel échoue"""
+
+    nom = "anthropic"
+
+    def __init__(self):
+        self.appels = 0
+
+    def envoyer(self, *args, **kwargs):
+        self.appels += 1
+        raise ConnectionError("API indisponible")
+
+
+def test_reponse_locale_jamais_servie_au_backend_reel():
+    cache = CacheResultats()
+    assert ClaudeService(backend=BackendLocal(), cache=cache).analyser_cv(CV, "tech_dev")["success"]
+
+    backend = BackendEnPanne()
+    resultat = ClaudeService(backend=backend, cache=cache).analyser_cv(CV, "tech_dev")
+
+    assert not resultat["success"]
+    assert backend.appels >= 1
+
+
+def test_reponse_servie_depuis_le_cache_au_meme_backend():
+    cache = CacheResultats()
+    premier = ClaudeService(backend=BackendLocal(), cache=cache).analyser_cv(CV, "tech_dev")
+    second = ClaudeService(backend=BackendLocal(), cache=cache).analyser_cv(CV, "tech_dev")
+    assert second["analysis"]["score_global"] == premier["analysis"]["score_global"]
+    assert second["tokens_used"] == 0
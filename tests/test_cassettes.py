@@ -0,0 +1,92 @@
+"""
+Enregistrement et relecture des cassettes (cassettes.py)
+"""
+
+import zlib
+
+import pytest
+
+from backends import BackendLocal
+from cassettes import BackendCassette, CassetteManquante
+
+SYSTEM = [{"type": "text", "text": "CV du candidat :\n\nDéveloppeur Python"}, {"type": "text", "text": "Prompt v1"}]
+MESSAGES = [{"role": "user", "content": "Analyse ce CV."}]
+CONTEXTE = {"etape": "analysis", "cv": "Développeur Python", "offre": None, "niche": "tech_dev"}
+
+
+def envoyer(backend, system=SYSTEM, contexte=CONTEXTE):
+    return backend.envoyer("claude-3-haiku-20240307", system, MESSAGES, 1000, 0.1, contexte=contexte)
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    chemin = str(tmp_path / "trafic.jsonl.gz")
+    enregistreur = BackendCassette(chemin, "enregistrement", BackendLocal(), vitesse=0)
+    reponse = envoyer(enregistreur)
+    envoyer(enregistreur, contexte={**CONTEXTE, "etape": "checklist"})
+    enregistreur.fermer()
+    return chemin, reponse
+
+
+def test_relecture_apres_modification_du_prompt(cassette):
+    chemin, reponse = cassette
+    relecture = BackendCassette(chemin, "relecture", vitesse=0)
+    assert envoyer(relecture, system=SYSTEM[:1] + [{"type": "text", "text": "Prompt v2"}]) == reponse
+
+
+def test_mode_strict_detecte_la_modification_du_prompt(cassette):
+    chemin, reponse = cassette
+    relecture = BackendCassette(chemin, "relecture", vitesse=0, stricte=True)
+    assert envoyer(relecture) == reponse
+    with pytest.raises(CassetteManquante):
+        envoyer(relecture, system=SYSTEM[:1] + [{"type": "text", "text": "Prompt v2"}])
+
+
+def test_autre_entree_absente_de_la_cassette(cassette):
+    chemin, _ = cassette
+    relecture = BackendCassette(chemin, "relecture", vitesse=0)
+    with pytest.raises(CassetteManquante):
+        envoyer(relecture, contexte={**CONTEXTE, "niche": "data_science"})
+
+
+def test_un_flux_gzip_par_session(cassette):
+    chemin, _ = cassette
+    with open(chemin, "rb") as f:
+        contenu = f.read()
+    # Un seul membre gzip : sa décompression consomme tout le fichier et donne toutes les lignes
+    flux = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    assert flux.decompress(contenu).count(b"\n") == 2
+    assert flux.eof and flux.unused_data == b""
+
+
+def test_session_interrompue_reste_lisible(tmp_path):
+    chemin = str(tmp_path / "trafic.jsonl.gz")
+    envoyer(BackendCassette(chemin, "enregistrement", BackendLocal(), vitesse=0))
+    entrees, complete = BackendCassette.charger(chemin)
+    assert len(entrees) == 1 and not complete
+
+    reprise = BackendCassette(chemin, "enregistrement", BackendLocal(), vitesse=0)
+    envoyer(reprise, contexte={**CONTEXTE, "etape": "checklist"})
+    reprise.fermer()
+    entrees, complete = BackendCassette.charger(chemin)
+    assert [entree["etape"] for entree in entrees] == ["analysis", "checklist"] and complete
+
+
+def test_enregistrement_puis_relecture_avec_cache_chaud(tmp_path):
+    from cache_resultats import CacheResultats
+    from claude_service import ClaudeService
+
+    cache = CacheResultats()
+    cv = "Jean Dupont\nDéveloppeur Python, Docker, AWS"
+    attendu = ClaudeService(backend=BackendLocal(), cache=cache).analyser_cv(cv, "tech_dev")
+
+    chemin = str(tmp_path / "trafic.jsonl.gz")
+    enregistreur = BackendCassette(chemin, "enregistrement", BackendLocal(), vitesse=0)
+    enregistre = ClaudeService(backend=enregistreur, cache=cache).analyser_cv(cv, "tech_dev")
+    enregistreur.fermer()
+    assert enregistre["tokens_used"] > 0
+
+    relecture = BackendCassette(chemin, "relecture", vitesse=0)
+    rejoue = ClaudeService(backend=relecture, cache=cache).analyser_cv(cv, "tech_dev")
+    assert rejoue["success"]
+    assert rejoue["analysis"]["score_global"] == attendu["analysis"]["score_global"]
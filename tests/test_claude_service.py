@@ -0,0 +1,29 @@
+"""
+Parsing et contrôle de structure des réponses (claude_service.py)
+"""
+
+import json
+
+import tracing
+from backends import BackendLocal
+from claude_service import ClaudeService
+from tracing import ExportateurFichier, Traceur
+
+CV = "Jean Dupont\nDéveloppeur Python, Django, Docker, AWS\n5 ans d'expérience"
+OFFRE = "Développeur Python : Django et AWS requis"
+
+
+def test_reponse_ats_parsee_une_seule_fois(tmp_path, monkeypatch):
+    chemin = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "_traceur_global", Traceur(ExportateurFichier(str(chemin))))
+    service = ClaudeService(backend=BackendLocal(), utiliser_cache=False)
+
+    resultat = service.analyser_ats(CV, "tech_dev", OFFRE)
+
+    assert resultat["success"] and resultat["analyse_ats"]["recommandations"]
+    noms = [
+        span["name"]
+        for ligne in chemin.read_text(encoding="utf-8").splitlines()
+        for span in json.loads(ligne)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    ]
+    assert noms.count("parse.analyse_ats") == 1
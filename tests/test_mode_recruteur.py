@@ -0,0 +1,36 @@
+"""
+Classement de candidats pour une offre (mode_recruteur.py)
+"""
+
+import json
+
+import tracing
+from backends import BackendLocal
+from claude_service import ClaudeService
+from mode_recruteur import classer_candidats
+from tracing import ExportateurFichier, Traceur
+
+OFFRE = "Développeur Python confirmé : Django, Docker et AWS requis"
+CV_TEXTES = {
+    "alice": "Alice Martin\nDéveloppeuse Python, Django, Docker, AWS\n6 ans d'expérience",
+    "bruno": "Bruno Petit\nDéveloppeur Java, Spring\n3 ans d'expérience"
+}
+
+
+def test_analyses_rattachees_a_la_trace_du_classement(tmp_path, monkeypatch):
+    chemin = tmp_path / "traces.jsonl"
+    traceur = Traceur(ExportateurFichier(str(chemin)))
+    monkeypatch.setattr(tracing, "_traceur_global", traceur)
+    service = ClaudeService(backend=BackendLocal(), utiliser_cache=False)
+
+    with traceur.span("recruteur.classement") as racine:
+        resultat = classer_candidats(CV_TEXTES, OFFRE, "tech_dev", service, top_k=2)
+
+    assert all(ligne["affine"] for ligne in resultat["classement"])
+    spans = [
+        span
+        for ligne in chemin.read_text(encoding="utf-8").splitlines()
+        for span in json.loads(ligne)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    ]
+    assert len(spans) > 1
+    assert {span["traceId"] for span in spans} == {racine.trace_id}
@@ -0,0 +1,32 @@
+"""
+Réutilisation des étapes dont les entrées n'ont pas changé (ClaudeService.reanalyser)
+"""
+
+from backends import BackendLocal
+from claude_service import ETAPES_ANALYSE, ClaudeService, etapes_reutilisables
+
+CV = "Jean Dupont\nDéveloppeur Python, Django, Docker, AWS\n5 ans d'expérience"
+OFFRE = "Développeur Python : Django et AWS requis"
+
+
+def test_changement_de_niche_conserve_l_analyse_ats():
+    service = ClaudeService(backend=BackendLocal(), utiliser_cache=False)
+    precedent = service.optimiser_cv_complet(CV, "tech_dev", OFFRE)
+    terminees = []
+
+    resultat = service.reanalyser(
+        CV, "alternance", OFFRE, precedent, on_etape_terminee=lambda cle, _: terminees.append(cle)
+    )
+
+    assert resultat["success"]
+    assert resultat["etapes_reutilisees"] == ["analyse_ats"]
+    assert sorted(terminees) == sorted(cle for cle in ETAPES_ANALYSE if cle != "analyse_ats")
+    assert resultat["results"]["analyse_ats"] == precedent["results"]["analyse_ats"]
+
+
+def test_entrees_inchangees_tout_est_reutilisable():
+    service = ClaudeService(backend=BackendLocal(), utiliser_cache=False)
+    precedent = service.optimiser_cv_complet(CV, "tech_dev", OFFRE, mode="rapport_unique")
+
+    assert list(etapes_reutilisables(CV, "tech_dev", OFFRE, precedent)) == list(precedent["results"])
+    assert etapes_reutilisables(CV, "tech_dev", "Data Engineer", precedent) == {}
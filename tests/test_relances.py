@@ -0,0 +1,176 @@
+"""
+Relances sur les erreurs transitoires (relances.py), face à un faux serveur
+de l'API Messages qui répond 429/529 avant de répondre normalement
+"""
+
+import json
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import anthropic
+import pytest
+
+import claude_service
+from backends import BackendAnthropic
+from claude_service import ClaudeService, get_client
+from relances import MetriquesRelances, PolitiqueRelance, executer_avec_relances
+
+MODELE = "claude-3-haiku-20240307"
+MESSAGE = {
+    "id": "msg_test",
+    "type": "message",
+    "role": "assistant",
+    "model": MODELE,
+    "content": [{"type": "text", "text": "Réponse"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 12, "output_tokens": 3}
+}
+ERREURS = {429: "rate_limit_error", 529: "overloaded_error"}
+
+
+class FauxServeur:
+    """Serveur HTTP local : rejoue une suite de (statut, en-têtes), puis répond 200"""
+
+    def __init__(self, reponses):
+        self.reponses = list(reponses)
+        self.requetes = 0
+        serveur = self
+
+        class Gestionnaire(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                serveur.requetes += 1
+                statut, entetes = serveur.reponses.pop(0) if serveur.reponses else (200, {})
+                corps = json.dumps(MESSAGE if statut == 200 else {
+                    "type": "error", "error": {"type": ERREURS.get(statut, "api_error"), "message": "Réessayez"}
+                }).encode("utf-8")
+                self.send_response(statut)
+                for nom, valeur in entetes.items():
+                    self.send_header(nom, valeur)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(corps)))
+                self.end_headers()
+                self.wfile.write(corps)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(("127.0.0.1", 0), Gestionnaire)
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}"
+        threading.Thread(target=self.http.serve_forever, args=(0.05,), daemon=True).start()
+
+
+@pytest.fixture
+def faux_serveur():
+    serveurs = []
+
+    def demarrer(*reponses):
+        serveurs.append(FauxServeur(reponses))
+        return serveurs[-1]
+
+    yield demarrer
+    for serveur in serveurs:
+        serveur.http.shutdown()
+        serveur.http.server_close()
+
+
+def appeler(serveur, politique, metriques=None):
+    """Appelle le faux serveur via BackendAnthropic ; retourne (réponse ou erreur, délais attendus)"""
+    backend = BackendAnthropic(get_client("cle-de-test", serveur.url))
+    attentes = []
+    try:
+        reponse = executer_avec_relances(
+            lambda: backend.envoyer(MODELE, [{"type": "text", "text": "CV"}], [{"role": "user", "content": "Analyse"}], 100, 0.1),
+            politique,
+            "analysis",
+            metriques or MetriquesRelances(),
+            attendre=attentes.append
+        )
+    except anthropic.APIStatusError as e:
+        return e, attentes
+    return reponse, attentes
+
+
+def test_retry_after_respecte(faux_serveur):
+    serveur = faux_serveur((429, {"retry-after": "3"}), (529, {"retry-after-ms": "1500"}))
+    politique = PolitiqueRelance(max_tentatives=4, delai_base=1.0, budget_attente=45.0)
+
+    reponse, attentes = appeler(serveur, politique)
+
+    assert reponse["texte"] == "Réponse"
+    assert serveur.requetes == 3
+    # Au moins le délai demandé, plus un jitter borné par delai_base / 2
+    assert 3.0 <= attentes[0] <= 3.5
+    assert 1.5 <= attentes[1] <= 2.0
+
+
+def test_retry_after_en_date_http(faux_serveur):
+    serveur = faux_serveur((429, {"retry-after": formatdate(time.time() + 10, usegmt=True)}))
+
+    reponse, attentes = appeler(serveur, PolitiqueRelance(delai_base=1.0))
+
+    assert reponse["texte"] == "Réponse"
+    assert 8.0 <= attentes[0] <= 10.5
+
+
+def test_jitter_dans_les_bornes_du_backoff(faux_serveur):
+    random.seed(7)
+    politique = PolitiqueRelance(max_tentatives=6, delai_base=1.0, delai_max=5.0, budget_attente=100.0)
+    for _ in range(20):
+        serveur = faux_serveur(*[(529, {})] * 5)
+
+        reponse, attentes = appeler(serveur, politique)
+
+        assert reponse["texte"] == "Réponse"
+        # Full jitter : relance n dans [0, min(delai_max, delai_base * 2^(n-1))]
+        assert all(0.0 <= attente <= min(5.0, 2 ** indice) for indice, attente in enumerate(attentes))
+
+
+def test_max_tentatives(faux_serveur):
+    serveur = faux_serveur(*[(529, {})] * 10)
+    metriques = MetriquesRelances()
+
+    erreur, attentes = appeler(serveur, PolitiqueRelance(max_tentatives=3, delai_base=0.5), metriques)
+
+    assert isinstance(erreur, anthropic.APIStatusError) and erreur.status_code == 529
+    assert serveur.requetes == 3
+    assert len(attentes) == 2
+    assert metriques.stats()["analysis"]["relances"] == 2
+    assert metriques.stats()["analysis"]["echecs_definitifs"] == 1
+
+
+def test_retry_after_au_dela_du_budget_non_relance(faux_serveur):
+    serveur = faux_serveur((429, {"retry-after": "60"}))
+
+    erreur, attentes = appeler(serveur, PolitiqueRelance(budget_attente=30.0))
+
+    assert erreur.status_code == 429
+    assert serveur.requetes == 1
+    assert attentes == []
+
+
+def test_erreur_non_transitoire_non_relancee(faux_serveur):
+    serveur = faux_serveur((400, {}))
+
+    erreur, attentes = appeler(serveur, PolitiqueRelance())
+
+    assert erreur.status_code == 400
+    assert serveur.requetes == 1
+    assert attentes == []
+
+
+def test_service_relance_puis_repond(faux_serveur, monkeypatch):
+    serveur = faux_serveur((429, {"retry-after-ms": "10"}), (529, {"retry-after-ms": "10"}))
+    monkeypatch.setitem(claude_service.POLITIQUES_RELANCE, "suggestions", PolitiqueRelance(delai_base=0.02))
+    metriques = MetriquesRelances()
+    service = ClaudeService(api_key="cle-de-test", base_url=serveur.url, utiliser_cache=False, metriques_relances=metriques)
+
+    resultat = service.generer_suggestions("Développeur Python", "tech_dev")
+
+    assert resultat["success"]
+    assert serveur.requetes == 3
+    assert metriques.stats()["suggestions"]["succes_apres_relance"] == 1
@@ -0,0 +1,258 @@
+"""
+Traces des analyses : spans imbriqués (import du PDF, extraction, étapes du
+modèle, parsing, rendu) rattachés à un identifiant de trace par analyse
+
+Le span courant est porté par une variable de contexte : un span ouvert dans
+un autre span devient son enfant. Les threads d'un pool ne héritent pas du
+contexte : les tâches soumises passent par `propager`.
+
+Quand un span racine se termine, lui et ses descendants sont écrits sur une
+ligne du fichier de traces, au format OTLP/JSON d'OpenTelemetry (celui de
+l'exportateur fichier du Collector : relisible par son récepteur
+`otlpjsonfile`, ou par Jaeger/Tempo via le Collector).
+"""
+
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, List, Callable, Iterator
+
+NOM_SERVICE = "cv_booster_ai"
+NOM_INSTRUMENTATION = "cv_booster_ai.tracing"
+
+# Codes OTLP : type de span (interne) et statut
+SPAN_KIND_INTERNAL = 1
+STATUT_NON_DEFINI = 0
+STATUT_OK = 1
+STATUT_ERREUR = 2
+
+_span_courant: ContextVar[Optional["Span"]] = ContextVar("span_courant", default=None)
+
+
+def nouvel_id_trace() -> str:
+    """Identifiant de trace OpenTelemetry (16 octets en hexadécimal)"""
+    return secrets.token_hex(16)
+
+
+def _valeur_otlp(valeur: Any) -> Dict[str, Any]:
+    """Convertit une valeur d'attribut en AnyValue OTLP/JSON"""
+    if isinstance(valeur, bool):
+        return {"boolValue": valeur}
+    if isinstance(valeur, int):
+        # Entiers 64 bits sérialisés en chaîne (mapping JSON de protobuf)
+        return {"intValue": str(valeur)}
+    if isinstance(valeur, float):
+        return {"doubleValue": valeur}
+    return {"stringValue": str(valeur)}
+
+
+class Span:
+    """Opération chronométrée d'une trace"""
+
+    def __init__(self, nom: str, trace_id: str, parent: Optional["Span"] = None, attributs: Optional[Dict[str, Any]] = None):
+        self.nom = nom
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent = parent
+        self.attributs = dict(attributs or {})
+        self.debut_ns = time.time_ns()
+        self.fin_ns: Optional[int] = None
+        self.statut = STATUT_NON_DEFINI
+        self.message_statut = ""
+        # Descendants terminés, exportés avec le span racine
+        self.enfants_termines: List["Span"] = []
+        self.exporte = False
+
+    @property
+    def racine(self) -> "Span":
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    @property
+    def duree(self) -> Optional[float]:
+        """Durée en secondes (None tant que le span est ouvert)"""
+        return (self.fin_ns - self.debut_ns) / 1e9 if self.fin_ns is not None else None
+
+    def definir(self, cle: str, valeur: Any):
+        """Ajoute ou remplace un attribut (None ignoré)"""
+        if valeur is not None:
+            self.attributs[cle] = valeur
+
+    def en_erreur(self, message: str):
+        self.statut = STATUT_ERREUR
+        self.message_statut = message
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Span au format OTLP/JSON"""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.nom,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.debut_ns),
+            "endTimeUnixNano": str(self.fin_ns or self.debut_ns),
+            "attributes": [{"key": cle, "value": _valeur_otlp(valeur)} for cle, valeur in self.attributs.items()],
+            "status": {"code": self.statut}
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        if self.message_statut:
+            span["status"]["message"] = self.message_statut
+        return span
+
+
+class ExportateurFichier:
+    """Ajoute les spans terminés à un fichier JSONL, une ligne OTLP par lot"""
+
+    def __init__(self, chemin: str):
+        self.chemin = chemin
+        self._lock = threading.Lock()
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+
+    def exporter(self, spans: List[Span]):
+        if not spans:
+            return
+        ligne = json.dumps({
+            "resourceSpans": [{
+                "resource": {
+                    "attributes": [
+                        {"key": "service.name", "value": _valeur_otlp(NOM_SERVICE)},
+                        {"key": "process.pid", "value": _valeur_otlp(os.getpid())}
+                    ]
+                },
+                "scopeSpans": [{
+                    "scope": {"name": NOM_INSTRUMENTATION},
+                    "spans": [span.to_otlp() for span in spans]
+                }]
+            }]
+        }, ensure_ascii=False)
+        # Une seule écriture en mode ajout : les lignes de plusieurs processus
+        # (pool d'extraction) ne s'entremêlent pas
+        with self._lock, open(self.chemin, "a", encoding="utf-8") as f:
+            f.write(ligne + "\n")
+
+
+class Traceur:
+    """Crée les spans et exporte chaque trace quand son span racine se termine"""
+
+    def __init__(self, exportateur: Optional[ExportateurFichier] = None):
+        self.exportateur = exportateur
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, nom: str, trace_id: Optional[str] = None, **attributs) -> Iterator[Span]:
+        """
+        Ouvre un span, enfant du span courant s'il y en a un
+
+        Args:
+            nom: Nom de l'opération (ex. "llm.analysis", "pdf.extraction")
+            trace_id: Trace à rejoindre pour un span racine (ex. l'identifiant
+                conservé depuis l'import du CV) ; nouvelle trace par défaut
+            **attributs: Attributs du span (None ignorés)
+
+        Yields:
+            Le span, pour y ajouter des attributs (span.definir)
+        """
+        parent = _span_courant.get()
+        span = Span(
+            nom,
+            parent.trace_id if parent else trace_id or nouvel_id_trace(),
+            parent,
+            {cle: valeur for cle, valeur in attributs.items() if valeur is not None}
+        )
+        jeton = _span_courant.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.en_erreur(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _span_courant.reset(jeton)
+            span.fin_ns = time.time_ns()
+            self._terminer(span)
+
+    def _terminer(self, span: Span):
+        if self.exportateur is None:
+            return
+        racine = span.racine
+        with self._lock:
+            if span is racine:
+                a_exporter = racine.enfants_termines + [racine]
+                racine.enfants_termines = []
+                racine.exporte = True
+            elif racine.exporte:
+                # Descendant terminé après sa racine (ex. requête de couverture abandonnée)
+                a_exporter = [span]
+            else:
+                racine.enfants_termines.append(span)
+                return
+        self.exportateur.exporter(a_exporter)
+
+
+def span_courant() -> Optional[Span]:
+    return _span_courant.get()
+
+
+def trace_courante() -> Optional[str]:
+    """Identifiant de la trace en cours (None hors de tout span)"""
+    span = _span_courant.get()
+    return span.trace_id if span else None
+
+
+def propager(fonction: Callable) -> Callable:
+    """
+    Rattache une tâche exécutée dans un autre thread au span courant
+
+    Usage : executor.submit(propager(fonction), *args)
+    """
+    parent = _span_courant.get()
+
+    @functools.wraps(fonction)
+    def executer(*args, **kwargs):
+        jeton = _span_courant.set(parent)
+        try:
+            return fonction(*args, **kwargs)
+        finally:
+            _span_courant.reset(jeton)
+
+    return executer
+
+
+def trace(nom: str) -> Callable:
+    """Décorateur : chaque appel de la fonction est un span du traceur partagé"""
+    def decorer(fonction: Callable) -> Callable:
+        @functools.wraps(fonction)
+        def executer(*args, **kwargs):
+            with get_traceur().span(nom):
+                return fonction(*args, **kwargs)
+        return executer
+    return decorer
+
+
+_traceur_global: Optional[Traceur] = None
+_traceur_lock = threading.Lock()
+
+
+def get_traceur() -> Traceur:
+    """
+    Retourne le traceur partagé par toutes les sessions du processus
+
+    Les traces sont écrites dans le fichier de la variable d'environnement
+    CV_TRACES ; sans elle, les spans sont mesurés mais pas exportés.
+    """
+    global _traceur_global
+    if _traceur_global is None:
+        with _traceur_lock:
+            if _traceur_global is None:
+                chemin = os.getenv("CV_TRACES")
+                _traceur_global = Traceur(ExportateurFichier(chemin) if chemin else None)
+    return _traceur_global